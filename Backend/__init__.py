@@ -0,0 +1,6 @@
+# Backend modules read their settings from the environment when they are imported, so .env is
+# loaded here first, whichever entry point imports the package (main.py, gunicorn.conf.py or
+# python -m Backend.<module>). Variables already set in the environment take precedence.
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -1,33 +1,68 @@
+import asyncio
 import os
-import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from typing import List, Dict
-from groq import Groq
+from groq import AsyncGroq, Groq
 from datetime import datetime
+from Backend import metrics
+from Backend.context_builder import CHAT_SUMMARY_MODE, ContextBuilder, llm_summarizer
+from Backend.fish_answers import answer_locally, record_turn, stats as fast_path_stats
+from Backend.groq_client import get_async_groq_client, get_groq_client
+from Backend.history_store import SUMMARY_ROLE, HistoryStore, get_history_store
+from Backend.response_cache import ResponseCache, response_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Sessions kept in memory; idle or least recently used ones are dropped and reloaded from the store on demand
+SESSION_CACHE_SIZE = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+
+SESSION_EVICTIONS = metrics.counter(
+    'fishai_chat_session_evictions_total',
+    "Chat sessions dropped from memory, by reason ('lru' or 'idle')",
+    labelnames=('reason',),
+)
+
+# Answers shared across sessions for repeated questions (see Backend/response_cache.py)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+# Preceding exchanges fingerprinted into the key of context-dependent questions; 0 = don't cache those
+RESPONSE_CACHE_CONTEXT_TURNS = int(os.getenv("RESPONSE_CACHE_CONTEXT_TURNS", "1"))
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+    db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+)
+metrics.gauge('fishai_response_cache_hit_rate', 'Fraction of response cache lookups served without a Groq call',
+              lambda: response_cache.stats()['hit_rate'])
 
 class CachedChatHistory:
-    def __init__(self, session_id: str = "default"):
-        api_key = os.getenv("GROQ_API_KEY")
-        print(f"[Backend] Initializing CachedChatHistory for session: {session_id}")
-        print(f"[Backend] API Key present: {bool(api_key)}")
-        print(f"[Backend] API Key length: {len(api_key) if api_key else 0}")
+    def __init__(self, session_id: str = "default", store: HistoryStore = None, client: Groq = None,
+                 async_client: AsyncGroq = None):
+        logger.debug("Initializing CachedChatHistory for session %s", session_id)
         
-        try:
-            self.client = Groq(api_key=api_key)
-            print(f"[Backend] Groq client initialized successfully")
-        except Exception as e:
-            print(f"[Backend] ERROR initializing Groq client: {e}")
-            raise
+        # Sessions share one pooled client (see Backend/groq_client.py)
+        self.client = client or get_groq_client()
+        # The async client is only needed under the ASGI server; created on first use
+        self._async_client = async_client
             
         self.model = "llama-3.1-8b-instant"
         self.session_id = session_id
         
-        # Create chat directory if it doesn't exist
-        self.chat_dir = "chat"
-        if not os.path.exists(self.chat_dir):
-            os.makedirs(self.chat_dir)
-            print(f"[Backend] Created chat directory: {self.chat_dir}")
-        
-        self.cache_file = os.path.join(self.chat_dir, f"chat_history_{session_id}.json")
+        # Messages are persisted by the history store (see Backend/history_store.py)
+        self.store = store or get_history_store()
+        # Guards conversation_history: appends, snapshots and clears are atomic, but whole turns are
+        # not serialized, so concurrent turns of one session may interleave their messages
+        self._lock = threading.RLock()
+        # Fits the prompt to a token budget and keeps the rolling summary of older turns
+        self.context = ContextBuilder(
+            refine=llm_summarizer(self.client, self.model) if CHAT_SUMMARY_MODE == 'llm' else None,
+            on_change=self._save_summary,
+        )
         
         # STRICT SYSTEM PROMPT
         self.system_prompt = """You are an expert on small fishes in Bangladesh. 
@@ -53,82 +88,136 @@ Examples of unacceptable questions (you must politely refuse):
         self.conversation_history: List[Dict] = self._load_history()
         
     def _load_history(self) -> List[Dict]:
-        """Load chat history from file"""
-        try:
-            with open(self.cache_file, 'r') as f:
-                data = json.load(f)
-                return data.get("messages", [])
-        except (FileNotFoundError, json.JSONDecodeError):
+        """Load chat history from the history store"""
+        messages = self.store.load(self.session_id) or []
+        # The summary of messages older than the prompt window is saved with them and resumed from
+        summaries = [msg for msg in messages if msg["role"] == SUMMARY_ROLE]
+        if summaries:
+            self.context.restore(summaries[-1]["content"], summaries[-1].get("timestamp", ""))
+            messages = [msg for msg in messages if msg["role"] != SUMMARY_ROLE]
+        if not messages:
             # Initialize with system prompt
             return [{"role": "system", "content": self.system_prompt}]
+        if messages[0]["role"] != "system":
+            messages.insert(0, {"role": "system", "content": self.system_prompt})
+        return messages
     
     def _save_history(self):
-        """Save chat history to file"""
-        history_data = {
-            "session_id": self.session_id,
-            "last_updated": datetime.now().isoformat(),
-            "messages": self.conversation_history
-        }
-        with open(self.cache_file, 'w') as f:
-            json.dump(history_data, f, indent=2)
+        """Replace the stored history with the in-memory one"""
+        self.store.replace(self.session_id, self.conversation_history)
+    
+    def _save_summary(self, summary: str, cursor: str):
+        """Store the rolling summary with the history, so it survives the session being evicted"""
+        self.store.append(self.session_id, {"role": SUMMARY_ROLE, "content": summary, "timestamp": cursor})
     
     def add_to_history(self, role: str, content: str):
         """Add a message to conversation history"""
-        self.conversation_history.append({
+        message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
-        })
-        # Keep last 15 messages + system prompt to avoid context overflow
-        if len(self.conversation_history) > 16:  # 1 system + 15 conversation
-            # Keep system prompt and recent messages
-            system_msg = self.conversation_history[0]
-            recent_msgs = self.conversation_history[-15:]
-            self.conversation_history = [system_msg] + recent_msgs
-        self._save_history()
+        }
+        with self._lock:
+            self.conversation_history.append(message)
+            # Keep last 15 messages + system prompt to avoid context overflow
+            if len(self.conversation_history) > 16:  # 1 system + 15 conversation
+                # Keep system prompt and recent messages
+                system_msg = self.conversation_history[0]
+                recent_msgs = self.conversation_history[-15:]
+                self.conversation_history = [system_msg] + recent_msgs
+            # Only the new message is written; the store applies the same retention window
+            self.store.append(self.session_id, message)
+    
+    def _api_messages(self) -> List[Dict]:
+        """Messages to send to the API: system prompt, summary of older turns and the newest messages within the token budget"""
+        with self._lock:
+            history = list(self.conversation_history)
+        api_messages, info = self.context.build(history)
+        logger.info("Session %s prompt: %d tokens (%d messages, %d summarized into %d tokens; last-10 window would be %d)",
+                    self.session_id, info['prompt_tokens'], info['messages'], info['dropped'],
+                    info['summary_tokens'], info['legacy_tokens'])
+        return api_messages
+    
+    @property
+    def async_client(self) -> AsyncGroq:
+        if self._async_client is None:
+            self._async_client = get_async_groq_client()
+        return self._async_client
+    
+    def _completion_options(self, api_messages: List[Dict], stream: bool) -> Dict:
+        return dict(
+            model=self.model,
+            messages=api_messages,
+            temperature=0.3,  # Lower temperature for more consistent responses
+            max_tokens=512,
+            top_p=0.9,
+            stream=stream
+        )
+    
+    def _create_completion(self, api_messages: List[Dict], stream: bool = False):
+        return self.client.chat.completions.create(**self._completion_options(api_messages, stream))
+    
+    def _create_completion_async(self, api_messages: List[Dict], stream: bool = False):
+        return self.async_client.chat.completions.create(**self._completion_options(api_messages, stream))
+    
+    def _answer_locally(self, user_message: str):
+        """Answer known-fish questions from FISH_DATA, recording the turn in history"""
+        local_answer = answer_locally(user_message)
+        if local_answer is None:
+            return None
+        self.add_to_history("user", user_message)
+        self.add_to_history("assistant", local_answer)
+        record_turn('local')
+        logger.debug("Session %s: answered from FISH_DATA without an LLM call", self.session_id)
+        return local_answer
+    
+    def _cache_key(self, user_message: str):
+        """Response cache key for a message about to be added, or None to bypass the cache"""
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        with self._lock:
+            history = list(self.conversation_history)
+        return response_cache_key(user_message, history, f"{self.model}\x1f{self.system_prompt}",
+                                  RESPONSE_CACHE_CONTEXT_TURNS)
+    
+    def _complete(self) -> str:
+        """Call the API with system prompt + recent conversation"""
+        api_messages = self._api_messages()
+        with metrics.stage_timer('groq_request'):
+            completion = self._create_completion(api_messages)
+        return completion.choices[0].message.content
+    
+    async def _complete_async(self) -> str:
+        # Building the prompt may regenerate the summary with a blocking call; keep it off the event loop
+        api_messages = await asyncio.to_thread(self._api_messages)
+        with metrics.stage_timer('groq_request'):
+            completion = await self._create_completion_async(api_messages)
+        return completion.choices[0].message.content
     
     def get_response(self, user_message: str) -> str:
         """Get response using full chat history"""
-        print(f"[Backend] get_response called with message: {user_message[:50]}...")
+        local_answer = self._answer_locally(user_message)
+        if local_answer is not None:
+            return local_answer
         
+        cache_key = self._cache_key(user_message)
         # Add user message to history
         self.add_to_history("user", user_message)
-        print(f"[Backend] User message added to history. Total messages: {len(self.conversation_history)}")
         
         try:
-            print(f"[Backend] Calling Groq API with model: {self.model}")
-            
-            # Prepare messages for API - system prompt + last 10 conversation messages
-            system_msg = [msg for msg in self.conversation_history if msg["role"] == "system"]
-            conversation_msgs = [msg for msg in self.conversation_history if msg["role"] != "system"]
-            
-            # Take only last 10 conversation messages (5 exchanges)
-            recent_conversation = conversation_msgs[-10:] if len(conversation_msgs) > 10 else conversation_msgs
-            
-            # Combine system prompt with recent conversation
-            messages_to_send = system_msg + recent_conversation
-            
-            # Remove timestamp field for API
-            api_messages = [
-                {"role": msg["role"], "content": msg["content"]}
-                for msg in messages_to_send
-            ]
-            
-            print(f"[Backend] Total messages in full history: {len(self.conversation_history)}")
-            print(f"[Backend] Sending to API: 1 system + {len(recent_conversation)} conversation messages = {len(api_messages)} total")
-            
-            # Call API with system prompt + recent conversation
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=api_messages,
-                temperature=0.3,  # Lower temperature for more consistent responses
-                max_tokens=512,
-                top_p=0.9
-            )
-            
-            print(f"[Backend] API call successful")
-            assistant_response = completion.choices[0].message.content
-            print(f"[Backend] Assistant response received: {assistant_response[:50]}...")
+            if RESPONSE_CACHE_ENABLED:
+                # Repeated questions are answered from the cache; concurrent ones share one call
+                upstream_calls = []
+                
+                def complete():
+                    upstream_calls.append(1)
+                    return self._complete()
+                
+                assistant_response = response_cache.get_or_compute(cache_key, complete)
+                record_turn('llm' if upstream_calls else 'cache')
+            else:
+                assistant_response = self._complete()
+                record_turn('llm')
             
             # Add assistant response to history
             self.add_to_history("assistant", assistant_response)
@@ -136,20 +225,163 @@ Examples of unacceptable questions (you must politely refuse):
             return assistant_response
             
         except Exception as e:
+            metrics.ERRORS.inc(source='groq')
             error_msg = f"Error: {str(e)}"
-            print(f"[Backend] ERROR in get_response: {error_msg}")
-            print(f"[Backend] Exception type: {type(e).__name__}")
-            print(f"[Backend] Full error: {repr(e)}")
+            logger.error("Groq request for session %s failed: %r", self.session_id, e)
             return error_msg
     
+    async def get_response_async(self, user_message: str) -> str:
+        """get_response on the async client, for the ASGI server"""
+        local_answer = self._answer_locally(user_message)
+        if local_answer is not None:
+            return local_answer
+        
+        cache_key = self._cache_key(user_message)
+        self.add_to_history("user", user_message)
+        
+        try:
+            if RESPONSE_CACHE_ENABLED:
+                upstream_calls = []
+                
+                async def complete():
+                    upstream_calls.append(1)
+                    return await self._complete_async()
+                
+                assistant_response = await response_cache.get_or_compute_async(cache_key, complete)
+                record_turn('llm' if upstream_calls else 'cache')
+            else:
+                assistant_response = await self._complete_async()
+                record_turn('llm')
+            
+            self.add_to_history("assistant", assistant_response)
+            return assistant_response
+        
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            error_msg = f"Error: {str(e)}"
+            logger.error("Groq request for session %s failed: %r", self.session_id, e)
+            return error_msg
+    
+    def _start_stream(self, user_message: str):
+        """Shared start of a streamed turn: (answer to send as one piece or None, cache key)"""
+        local_answer = self._answer_locally(user_message)
+        if local_answer is not None:
+            return local_answer, None
+        
+        cache_key = self._cache_key(user_message)
+        cached = response_cache.get(cache_key) if RESPONSE_CACHE_ENABLED else None
+        self.add_to_history("user", user_message)
+        if cached is not None:
+            self.add_to_history("assistant", cached)
+            record_turn('cache')
+            return cached, None
+        record_turn('llm')
+        return None, cache_key
+    
+    def _finish_stream(self, parts: List[str], completed: bool, started: float, cache_key):
+        """Record a streamed turn once the stream has been closed"""
+        if completed:
+            metrics.observe_stage('groq_request', time.perf_counter() - started)
+            assistant_response = "".join(parts)
+            self.add_to_history("assistant", assistant_response)
+            if cache_key is not None:
+                response_cache.put(cache_key, assistant_response)
+        else:
+            logger.info("Stream for session %s ended early after %d chunk(s)", self.session_id, len(parts))
+    
+    def stream_response(self, user_message: str):
+        """Yield the response text in pieces as the API streams it.
+        
+        The full response is added to history once the stream completes. If the
+        caller stops iterating early (e.g. the browser disconnected), the
+        upstream request is closed and nothing is added. API errors are raised
+        to the caller. Questions answered from FISH_DATA come back as one piece.
+        """
+        answer, cache_key = self._start_stream(user_message)
+        if answer is not None:
+            yield answer
+            return
+        
+        api_messages = self._api_messages()
+        
+        started = time.perf_counter()
+        try:
+            stream = self._create_completion(api_messages, stream=True)
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            logger.error("Groq stream for session %s failed: %r", self.session_id, e)
+            raise
+        parts = []
+        completed = False
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    metrics.observe_stage('groq_first_token', time.perf_counter() - started)
+                parts.append(delta)
+                yield delta
+            completed = True
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            logger.error("Groq stream for session %s failed: %r", self.session_id, e)
+            raise
+        finally:
+            # Stops the upstream generation when the consumer goes away mid-stream
+            stream.close()
+            self._finish_stream(parts, completed, started, cache_key)
+    
+    async def stream_response_async(self, user_message: str):
+        """stream_response on the async client, for the ASGI server"""
+        answer, cache_key = self._start_stream(user_message)
+        if answer is not None:
+            yield answer
+            return
+        
+        api_messages = await asyncio.to_thread(self._api_messages)
+        
+        started = time.perf_counter()
+        try:
+            stream = await self._create_completion_async(api_messages, stream=True)
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            logger.error("Groq stream for session %s failed: %r", self.session_id, e)
+            raise
+        parts = []
+        completed = False
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    metrics.observe_stage('groq_first_token', time.perf_counter() - started)
+                parts.append(delta)
+                yield delta
+            completed = True
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            logger.error("Groq stream for session %s failed: %r", self.session_id, e)
+            raise
+        finally:
+            await stream.close()
+            self._finish_stream(parts, completed, started, cache_key)
+    
     def clear_history(self):
         """Clear conversation history (keep system prompt)"""
-        system_prompt = [msg for msg in self.conversation_history if msg["role"] == "system"]
-        if not system_prompt:
-            system_prompt = [{"role": "system", "content": self.system_prompt}]
-        self.conversation_history = system_prompt
-        self._save_history()
-        print(f"Chat history cleared for session: {self.session_id} (kept system prompt)")
+        with self._lock:
+            system_prompt = [msg for msg in self.conversation_history if msg["role"] == "system"]
+            if not system_prompt:
+                system_prompt = [{"role": "system", "content": self.system_prompt}]
+            self.conversation_history = system_prompt
+            self.context.restore('', '')
+            self._save_history()
+        logger.info("Chat history cleared for session %s (kept system prompt)", self.session_id)
     
     def show_history(self):
         """Display conversation history"""
@@ -171,14 +403,142 @@ Examples of unacceptable questions (you must politely refuse):
 
 # Multi-session manager
 class ChatSessionManager:
-    def __init__(self):
-        self.sessions: Dict[str, CachedChatHistory] = {}
+    """Bounded LRU cache of chat sessions with idle expiry.
+
+    Every message is queued to the history store as it is added, so an
+    evicted session has nothing left to write back; the next request for
+    it reloads it from the store (which flushes pending writes first).
+    Sessions held by a request (acquire/release, or use_session) are
+    never evicted, so a request arriving mid-turn gets the same object
+    instead of a reloaded copy writing an interleaved history; the cache
+    may go over max_sessions until they are released.
+    """
+
+    def __init__(self, store: HistoryStore = None, max_sessions: int = SESSION_CACHE_SIZE,
+                 idle_ttl: float = SESSION_IDLE_TTL, client: Groq = None):
+        self.store = store or get_history_store()
+        # Injected into every session; None means the shared client, created on first use
+        self.client = client
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        # session_id -> (session, last access time), least recently used first
+        self.sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Sessions being constructed, so concurrent first requests share one
+        self._pending: Dict[str, Future] = {}
+        # session_id -> number of requests holding it
+        self._holds: Dict[str, int] = {}
+        self.created = 0
+        self.reloaded = 0
+        self.evictions = {'lru': 0, 'idle': 0}
     
     def get_session(self, session_id: str) -> CachedChatHistory:
         """Get or create a chat session"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = CachedChatHistory(session_id)
-        return self.sessions[session_id]
+        return self._get(session_id, hold=False)
+    
+    def acquire(self, session_id: str) -> CachedChatHistory:
+        """Get or create a chat session and keep it cached until release()"""
+        return self._get(session_id, hold=True)
+    
+    def release(self, session_id: str):
+        """Drop a hold taken by acquire()"""
+        with self._lock:
+            holds = self._holds[session_id] - 1
+            if holds:
+                self._holds[session_id] = holds
+                return
+            del self._holds[session_id]
+            # Idle time counts from the end of the request
+            session, _ = self.sessions[session_id]
+            self.sessions[session_id] = (session, time.monotonic())
+            self.sessions.move_to_end(session_id)
+            self._shrink()
+    
+    @contextmanager
+    def use_session(self, session_id: str):
+        """Hold a chat session for the duration of a request"""
+        session = self.acquire(session_id)
+        try:
+            yield session
+        finally:
+            self.release(session_id)
+    
+    def _get(self, session_id, hold):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                self._expire(now)
+                entry = self.sessions.get(session_id)
+                if entry is not None:
+                    self.sessions[session_id] = (entry[0], now)
+                    self.sessions.move_to_end(session_id)
+                    if hold:
+                        self._holds[session_id] = self._holds.get(session_id, 0) + 1
+                    return entry[0]
+                future = self._pending.get(session_id)
+                if future is None:
+                    future = self._pending[session_id] = Future()
+                    break
+            # Another request is loading it; look it up again once it is cached
+            future.result()
+        
+        # Construct outside the lock: loading history may wait on the store
+        try:
+            session = CachedChatHistory(session_id, store=self.store, client=self.client)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[session_id]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[session_id]
+            self.sessions[session_id] = (session, time.monotonic())
+            if hold:
+                self._holds[session_id] = self._holds.get(session_id, 0) + 1
+            self.created += 1
+            if len(session.conversation_history) > 1:
+                self.reloaded += 1
+            self._shrink()
+        future.set_result(session)
+        return session
+    
+    def _shrink(self):
+        """Evict least recently used sessions that nobody holds down to max_sessions (caller holds the lock)"""
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if session_id not in self._holds:
+                self._evict(session_id, 'lru')
+    
+    def _expire(self, now):
+        """Drop sessions idle for longer than idle_ttl that nobody holds (caller holds the lock)"""
+        if self.idle_ttl <= 0:
+            return
+        for session_id, (_, last_used) in list(self.sessions.items()):
+            if now - last_used <= self.idle_ttl:
+                break
+            if session_id not in self._holds:
+                self._evict(session_id, 'idle')
+    
+    def _evict(self, session_id, reason):
+        del self.sessions[session_id]
+        self.evictions[reason] += 1
+        SESSION_EVICTIONS.inc(reason=reason)
+        logger.debug("Evicted chat session %s (%s)", session_id, reason)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'in_use': len(self._holds),
+                'idle_ttl_seconds': self.idle_ttl,
+                'created': self.created,
+                'reloaded': self.reloaded,
+                'evictions': dict(self.evictions),
+                'fast_path': fast_path_stats(),
+                'response_cache': {'enabled': RESPONSE_CACHE_ENABLED, **response_cache.stats()},
+            }
 
 # Usage example
 if __name__ == "__main__":
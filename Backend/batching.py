@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collect concurrent single-image requests into one batched forward pass.
+
+    Callers submit a preprocessed array with a leading batch dimension of 1.
+    A background worker waits for the first item, keeps collecting until either
+    ``max_batch_size`` items are queued or ``max_wait_ms`` has elapsed, runs
+    ``predict_fn`` once on the stacked batch and hands each row back to the
+    future of the request that submitted it.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = 8, max_wait_ms: float = 10.0, name: str = "classify"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopped = False
+
+        # Statistics
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._largest_batch = 0
+        self._batch_size_counts: dict = {}
+        self._total_wait_ms = 0.0
+        self._total_batch_ms = 0.0
+        self._last_batch_ms = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(
+                    target=self._run, name=f"MicroBatcher-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, item) -> Future:
+        """Queue one item (shape ``(1, ...)``) and return a future for its row of output"""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout: float = None):
+        """Submit an item and block until its prediction is available"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch window closes"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._stopped = True
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            started = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            futures = [entry[1] for entry in batch]
+            try:
+                outputs = self.predict_fn(np.concatenate(items, axis=0))
+                for i, future in enumerate(futures):
+                    future.set_result(outputs[i])
+            except Exception as e:
+                self._errors += 1
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                size = len(batch)
+                self._batches += 1
+                self._items += size
+                self._largest_batch = max(self._largest_batch, size)
+                self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+                self._total_wait_ms += sum((started - entry[2]) * 1000.0 for entry in batch)
+                self._total_batch_ms += elapsed_ms
+                self._last_batch_ms = elapsed_ms
+
+    def shutdown(self):
+        """Stop the worker after it finishes the batch in flight"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def stats(self) -> dict:
+        """Return queue depth and batch-size statistics"""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'avg_batch_size': round(self._items / self._batches, 3) if self._batches else 0.0,
+                'largest_batch': self._largest_batch,
+                'batch_size_counts': {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+                'avg_queue_wait_ms': round(self._total_wait_ms / self._items, 3) if self._items else 0.0,
+                'avg_batch_ms': round(self._total_batch_ms / self._batches, 3) if self._batches else 0.0,
+                'last_batch_ms': round(self._last_batch_ms, 3),
+            }
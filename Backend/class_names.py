@@ -0,0 +1,35 @@
+"""Class labels of the fish model and the filename-based fallback classifier.
+
+Kept free of TensorFlow so processes that do not load the model (web
+workers under INFERENCE_MODE=server) can still fall back to file names.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Define class names (must match training order)
+CLASS_NAMES = [
+    'Bele',
+    'Chela',
+    'Guchi',
+    'Kachki',
+    'Kata Phasa',
+    'Mola',
+    'Nama Chanda',
+    'Pabda',
+    'Puti',
+    'Tengra'
+]
+
+
+def fallback_classify(filename):
+    """Fallback classifier: look for a known class name in the file name"""
+    basename = os.path.basename(filename or '')
+    for class_name in CLASS_NAMES:
+        if class_name.lower() in basename.lower():
+            logger.debug("Fallback detected '%s' in filename", class_name)
+            return class_name, 0.5, 'fallback'
+
+    logger.debug("Fallback: no class name found in filename %s", basename)
+    return "Unknown", 0.0, 'fallback'
@@ -0,0 +1,260 @@
+"""Fit the chat prompt to a token budget.
+
+The system prompt and the newest messages that fit are sent verbatim.
+Older messages are folded into a rolling summary kept with the session
+as soon as they fall out of the window. The summary is extractive by
+default, so a turn never waits on a model call; with
+``CHAT_SUMMARY_MODE=llm`` the model rewrites it on a background thread
+and later turns use the rewritten summary. Token counts use tiktoken when
+it is installed and a character based estimate otherwise.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+from Backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget (system prompt + summary + recent messages), in tokens
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+# Upper bound on the rolling summary, in tokens
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "200"))
+# Messages folded into the summary before the model rewrites it (CHAT_SUMMARY_MODE=llm)
+CHAT_SUMMARY_MIN_NEW = int(os.getenv("CHAT_SUMMARY_MIN_NEW", "4"))
+# 'extractive' keeps the first sentence of each message; 'llm' also has the model rewrite the
+# summary off the request path (keeping the extractive one on errors)
+CHAT_SUMMARY_MODE = os.getenv("CHAT_SUMMARY_MODE", "extractive")
+
+# Role and separator tokens added to every chat message
+MESSAGE_OVERHEAD = 4
+# What the prompt used to be: system prompt + last 10 messages
+LEGACY_WINDOW = 10
+
+PROMPT_TOKENS = metrics.histogram(
+    'fishai_prompt_tokens',
+    'Estimated prompt tokens sent to Groq per chat turn',
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+
+_refine_executor = None
+_refine_executor_lock = threading.Lock()
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of a conversation between a user and an assistant about small fishes "
+    "in Bangladesh. Keep the fish names, facts and user preferences needed to answer follow-up "
+    "questions. Reply with the summary only, in at most {words} words."
+)
+
+
+def _load_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or the encoding cannot be downloaded
+        return None
+
+
+_encoding = _load_encoding()
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (estimated when tiktoken is unavailable)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # ~4 characters per token for Latin text; Bengali and other scripts split much finer
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def message_tokens(message: Dict) -> int:
+    return MESSAGE_OVERHEAD + count_tokens(message["content"])
+
+
+def _first_sentence(text: str, limit: int = 200) -> str:
+    text = ' '.join(text.split())
+    for end in ('. ', '? ', '! ', '। '):
+        index = text.find(end)
+        if 0 < index < limit:
+            return text[:index + 1]
+    return text if len(text) <= limit else text[:limit].rsplit(' ', 1)[0] + '...'
+
+
+def extractive_summary(previous: str, messages: List[Dict], max_tokens: int) -> str:
+    """Summary without a model call: the first sentence of each message, newest kept when over budget"""
+    lines = previous.splitlines() if previous else []
+    for msg in messages:
+        lines.append(f"{'User' if msg['role'] == 'user' else 'Assistant'}: {_first_sentence(msg['content'])}")
+    while len(lines) > 1 and count_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def llm_summarizer(client, model: str) -> Callable[[str, List[Dict], int], str]:
+    """Summarizer that asks the chat model, falling back to extractive_summary on errors"""
+    def summarize(previous: str, messages: List[Dict], max_tokens: int) -> str:
+        transcript = '\n'.join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = [
+            {"role": "system", "content": SUMMARY_PROMPT.format(words=int(max_tokens * 0.7))},
+            {"role": "user", "content": f"Summary so far:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+        ]
+        try:
+            with metrics.stage_timer('context_summary'):
+                completion = client.chat.completions.create(
+                    model=model, messages=prompt, temperature=0, max_tokens=max_tokens
+                )
+            return completion.choices[0].message.content.strip()
+        except Exception as e:
+            metrics.ERRORS.inc(source='groq')
+            logger.warning("Summary request failed, using extractive summary: %r", e)
+            return extractive_summary(previous, messages, max_tokens)
+    return summarize
+
+
+def _refine_pool() -> ThreadPoolExecutor:
+    """Threads shared by every session for summaries rewritten off the request path"""
+    global _refine_executor
+    with _refine_executor_lock:
+        if _refine_executor is None:
+            _refine_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='context-summary')
+    return _refine_executor
+
+
+class ContextBuilder:
+    """Build a session's API messages within a token budget.
+
+    Holds the session's rolling summary and the timestamp of the newest
+    message folded into it, so each turn only summarizes messages that
+    have newly fallen out of the window. ``summarize`` runs during the
+    turn, on every message that falls out, so it must be cheap;
+    ``refine``, if given, rewrites the summary in the background once
+    ``min_new`` messages have been folded in since the last rewrite.
+    ``on_change(summary, cursor)`` is called whenever the summary changes,
+    so it can be persisted and restored with ``restore``.
+    """
+
+    def __init__(self, budget: int = CHAT_CONTEXT_TOKENS, summary_tokens: int = CHAT_SUMMARY_TOKENS,
+                 min_new: int = CHAT_SUMMARY_MIN_NEW, summarize: Callable = None, refine: Callable = None,
+                 on_change: Callable[[str, str], None] = None):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.min_new = max(1, min_new)
+        self.summarize = summarize or extractive_summary
+        self.refine = refine
+        self.on_change = on_change
+        self.summary = ''
+        self.summary_cursor = ''
+        self.regenerations = 0
+        self.refinements = 0
+        self._refining = False
+        # The last rewritten summary and the messages folded in after it
+        self._refined = ''
+        self._unrefined: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def restore(self, summary: str, cursor: str):
+        """Resume from a summary saved through on_change (or start over with empty strings)"""
+        with self._lock:
+            self.summary = self._refined = summary
+            self.summary_cursor = cursor
+            self._unrefined = []
+
+    def _fit(self, conversation: List[Dict], available: int) -> int:
+        """Index of the oldest message kept; the newest message is always kept"""
+        start = len(conversation)
+        used = 0
+        while start > 0:
+            cost = message_tokens(conversation[start - 1])
+            if used + cost > available and start < len(conversation):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.summary, self.summary_cursor)
+
+    def _update_summary(self, dropped: List[Dict]):
+        new = [msg for msg in dropped if msg.get("timestamp", "") > self.summary_cursor]
+        if not new:
+            return
+        # Every message leaving the prompt is folded in at once, so none is missing from the context
+        self.summary = self.summarize(self.summary, new, self.summary_tokens)
+        self.summary_cursor = new[-1].get("timestamp", "")
+        self.regenerations += 1
+        self._changed()
+        if self.refine is None:
+            return
+        self._unrefined.extend(new)
+        self._start_refine()
+
+    def _start_refine(self):
+        # One rewrite per session at a time, once enough has been folded in since the last one
+        if self._refining or len(self._unrefined) < self.min_new:
+            return
+        self._refining = True
+        _refine_pool().submit(self._refine, self._refined, list(self._unrefined))
+
+    def _refine(self, previous: str, new: List[Dict]):
+        summary = None
+        try:
+            summary = self.refine(previous, new, self.summary_tokens)
+        except Exception:
+            logger.exception("Summary refinement failed")
+        with self._lock:
+            self._refining = False
+            # restore() may have replaced the state meanwhile
+            if not summary or self._unrefined[:len(new)] != new:
+                return
+            self.refinements += 1
+            self._refined = summary
+            later = self._unrefined = self._unrefined[len(new):]
+            self.summary = extractive_summary(summary, later, self.summary_tokens) if later else summary
+            self._changed()
+            self._start_refine()
+
+    def build(self, history: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """Return (api_messages, info) for a history that includes the system prompt"""
+        system_msgs = [msg for msg in history if msg["role"] == "system"]
+        conversation = [msg for msg in history if msg["role"] != "system"]
+        system_tokens = sum(message_tokens(msg) for msg in system_msgs)
+
+        start = self._fit(conversation, self.budget - system_tokens)
+        summary_msgs = []
+        if start > 0:
+            # Something is left out: make room for the summary and fold the dropped messages into it
+            start = max(start, self._fit(conversation, self.budget - system_tokens - self.summary_tokens - MESSAGE_OVERHEAD))
+            with self._lock:
+                self._update_summary(conversation[:start])
+                summary = self.summary
+            if summary:
+                summary_msgs = [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}]
+
+        kept = conversation[start:]
+        api_messages = [{"role": msg["role"], "content": msg["content"]} for msg in system_msgs + summary_msgs + kept]
+        prompt_tokens = sum(message_tokens(msg) for msg in api_messages)
+        PROMPT_TOKENS.observe(prompt_tokens)
+        return api_messages, {
+            'prompt_tokens': prompt_tokens,
+            'legacy_tokens': system_tokens + sum(message_tokens(msg) for msg in conversation[-LEGACY_WINDOW:]),
+            'messages': len(kept),
+            'dropped': start,
+            'summary_tokens': sum(message_tokens(msg) for msg in summary_msgs),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'budget': self.budget,
+                'summary_tokens': count_tokens(self.summary),
+                'summary_regenerations': self.regenerations,
+                'summary_refinements': self.refinements,
+            }
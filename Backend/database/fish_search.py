@@ -0,0 +1,267 @@
+"""Search over FISH_DATA with indexes built once at import.
+
+- Names: the dataset key, English, Bengali and scientific names and common
+  alternative spellings, normalized, for exact lookups
+- Prefixes of every name and of every word in a name, for search-as-you-type
+- Character trigrams of every name, for misspelled names
+- Words of the descriptive fields, and facets by river, habitat and diet
+
+Responses are serialized once (the listing at import, searches on first
+use) and carry an ETag derived from the body, so they are stable across
+worker processes and a client holding the current version gets a 304.
+"""
+import hashlib
+import json
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from Backend.database.fish_data import FISH_DATA
+
+# Common alternative spellings of the dataset's names
+ALIASES = {
+    'punti': 'puti',
+    'tangra': 'tengra',
+    'kechki': 'kachki',
+    'phasa': 'kata phasa',
+    'chanda': 'nama chanda',
+    'glassy perchlet': 'nama chanda',
+}
+
+# Searchable fields and the match type reported for them
+TEXT_FIELDS = {
+    'primary_rivers': 'river',
+    'river_habitat': 'habitat',
+    'diet': 'diet',
+    'description': 'description',
+    'culinary_note': 'culinary',
+}
+# Filters accepted by search() and the field each one applies to
+FACETS = {
+    'river': 'primary_rivers',
+    'habitat': 'river_habitat',
+    'diet': 'diet',
+}
+
+# Lowest trigram similarity (Dice coefficient) reported as a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.35
+# Prefixes shorter than this match too much to be useful
+MIN_PREFIX = 2
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+PUNCTUATION_RE = re.compile(r"[?!.,;:'\"()।“”‘’&/–-]")
+PARENTHETICAL_RE = re.compile(r'\s*\(.*?\)')
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    # Chandrabindu is often left out when typing Bengali names (পুঁটি / পুটি)
+    text = PUNCTUATION_RE.sub(' ', (text or '').lower().replace('ঁ', ''))
+    return ' '.join(text.split())
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    return 2.0 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _facet_values(field: str, value: str) -> List[str]:
+    """Display values of a field for facet counts ("Padma, Jamuna" -> ["Padma", "Jamuna"])"""
+    if field == 'diet':
+        return [PARENTHETICAL_RE.sub('', value).strip()]
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _add_prefixes(index: Dict[str, set], text: str, entry):
+    for end in range(MIN_PREFIX, len(text) + 1):
+        index[text[:end]].add(entry)
+
+
+def _build():
+    names = {}                               # normalized name -> key
+    name_grams = []                          # (key, trigrams) per name
+    prefixes = defaultdict(set)              # prefix of a name or name word -> keys
+    gram_index = defaultdict(set)            # trigram -> indexes into name_grams
+    words = defaultdict(set)                 # prefix of a field word -> (key, match type)
+    facets = {facet: defaultdict(set) for facet in FACETS}   # facet -> word prefix -> keys
+
+    def add_name(name, key):
+        name = normalize(name)
+        if not name:
+            return
+        names[name] = key
+        grams = trigrams(name)
+        for gram in grams:
+            gram_index[gram].add(len(name_grams))
+        name_grams.append((key, grams))
+        _add_prefixes(prefixes, name, key)
+        for word in name.split():
+            _add_prefixes(prefixes, word, key)
+
+    for key, fish in FISH_DATA.items():
+        for name in (key, fish['name_en'], fish['name_bn'], fish['scientific_name']):
+            add_name(name, key)
+        for field, match in TEXT_FIELDS.items():
+            for word in normalize(fish[field]).split():
+                _add_prefixes(words, word, (key, match))
+        for facet, field in FACETS.items():
+            for word in normalize(fish[field]).split():
+                _add_prefixes(facets[facet], word, key)
+    for alias, key in ALIASES.items():
+        add_name(alias, key)
+    return names, name_grams, dict(prefixes), dict(gram_index), dict(words), facets
+
+
+NAME_INDEX, _NAME_GRAMS, _PREFIXES, _GRAM_INDEX, _WORD_INDEX, _FACET_INDEX = _build()
+
+
+def _dumps(value) -> str:
+    # Compact and sorted like Flask's jsonify, but Bengali text stays UTF-8 instead of \\u escapes
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+def _etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+# Every fish serialized once; responses are assembled from these fragments
+FISH_JSON = {key: _dumps({'key': key, **fish}) for key, fish in FISH_DATA.items()}
+
+
+def facet_counts() -> Dict[str, List[Dict]]:
+    """Facet values with the number of fish having each, most common first"""
+    counts = {}
+    for facet, field in FACETS.items():
+        counter = Counter(value for fish in FISH_DATA.values() for value in _facet_values(field, fish[field]))
+        counts[facet] = [{'value': value, 'count': count}
+                         for value, count in sorted(counter.items(), key=lambda item: (-item[1], item[0]))]
+    return counts
+
+
+def _listing() -> bytes:
+    fish = ','.join(FISH_JSON[key] for key in sorted(FISH_JSON))
+    return (f'{{"count":{len(FISH_JSON)},"facets":{_dumps(facet_counts())},"fish":[{fish}],"success":true}}\n'
+            .encode('utf-8'))
+
+
+LISTING_BODY = _listing()
+LISTING_ETAG = _etag(LISTING_BODY)
+
+
+def listing() -> Tuple[bytes, str]:
+    """(body, etag) of GET /api/fish"""
+    return LISTING_BODY, LISTING_ETAG
+
+
+def find_key(name: str, fuzzy: bool = False) -> Optional[str]:
+    """Return the FISH_DATA key for a fish name, label or alias, or None.
+
+    With fuzzy, a misspelled name resolves to the closest fish if it is
+    clearly closer than any other.
+    """
+    name = normalize(name)
+    key = NAME_INDEX.get(name)
+    if key is not None or not fuzzy or len(name) < 3:
+        return key
+    scores = _fuzzy_scores(name)
+    if not scores:
+        return None
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    best_key, best = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return best_key if best >= 0.6 and best - runner_up >= 0.15 else None
+
+
+def _fuzzy_scores(query: str) -> Dict[str, float]:
+    """Best trigram similarity of the query to each fish's names"""
+    grams = trigrams(query)
+    candidates = set()
+    for gram in grams:
+        candidates.update(_GRAM_INDEX.get(gram, ()))
+    scores = {}
+    for i in candidates:
+        key, name_grams = _NAME_GRAMS[i]
+        similarity = _similarity(grams, name_grams)
+        if similarity > scores.get(key, 0.0):
+            scores[key] = similarity
+    return scores
+
+
+def _facet_keys(facet: str, value: str) -> set:
+    """Fish whose facet field has a word starting with each word of value"""
+    keys = set(FISH_DATA)
+    for word in normalize(value).split():
+        keys &= _FACET_INDEX[facet].get(word, set())
+    return keys
+
+
+def search(q: str = '', limit: int = DEFAULT_LIMIT, **filters) -> List[Tuple[str, float, str]]:
+    """Rank fish for a query; returns (key, score, match) with match 'name', 'prefix', 'fuzzy' or a field type.
+
+    filters: river, habitat and diet values every result must match. With
+    no query, every fish passing the filters is returned by name.
+    """
+    allowed = set(FISH_DATA)
+    for facet, value in filters.items():
+        if facet not in FACETS:
+            raise ValueError(f"Unknown filter '{facet}'; expected one of {', '.join(FACETS)}")
+        if value:
+            allowed &= _facet_keys(facet, value)
+
+    query = normalize(q)
+    if not query:
+        return [(key, 1.0, 'filter') for key in sorted(allowed)][:limit]
+
+    best: Dict[str, Tuple[float, str]] = {}
+
+    def offer(key, score, match):
+        if key in allowed and score > best.get(key, (0.0, ''))[0]:
+            best[key] = (score, match)
+
+    key = NAME_INDEX.get(query)
+    if key is not None:
+        offer(key, 1.0, 'name')
+    for key in _PREFIXES.get(query, ()):
+        offer(key, 0.9, 'prefix')
+    for key, similarity in _fuzzy_scores(query).items():
+        if similarity >= FUZZY_MIN_SIMILARITY:
+            offer(key, round(0.8 * similarity, 4), 'fuzzy')
+
+    # Every query word must start a word of the descriptive fields
+    matches = None
+    for word in query.split():
+        found = defaultdict(set)
+        for key, match in _WORD_INDEX.get(word, ()):
+            found[key].add(match)
+        matches = found if matches is None else {k: matches[k] | found[k] for k in matches if k in found}
+    for key, fields in (matches or {}).items():
+        # Report the most specific field that matched
+        match = next(m for m in TEXT_FIELDS.values() if m in fields)
+        offer(key, 0.5, match)
+
+    ranked = sorted(best.items(), key=lambda item: (-item[1][0], FISH_DATA[item[0]]['name_en']))
+    return [(key, score, match) for key, (score, match) in ranked[:limit]]
+
+
+@lru_cache(maxsize=1024)
+def _search_response(q: str, limit: int, river: str, habitat: str, diet: str) -> Tuple[bytes, str]:
+    results = search(q, limit=limit, river=river, habitat=habitat, diet=diet)
+    items = ','.join(f'{{"fish":{FISH_JSON[key]},"match":"{match}","score":{score}}}' for key, score, match in results)
+    filters = {facet: value for facet, value in (('river', river), ('habitat', habitat), ('diet', diet)) if value}
+    body = (f'{{"count":{len(results)},"filters":{_dumps(filters)},"query":{_dumps(q)},"results":[{items}],'
+            f'"success":true}}\n').encode('utf-8')
+    return body, _etag(body)
+
+
+def search_response(q: str = '', limit: int = DEFAULT_LIMIT, river: str = '', habitat: str = '',
+                    diet: str = '') -> Tuple[bytes, str]:
+    """(body, etag) of GET /api/fish/search, cached per distinct query"""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    return _search_response(' '.join((q or '').split()), limit, ' '.join((river or '').split()),
+                            ' '.join((habitat or '').split()), ' '.join((diet or '').split()))
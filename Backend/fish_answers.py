@@ -0,0 +1,120 @@
+"""Answer simple questions about known fish from FISH_DATA without an LLM call.
+
+Two kinds of chat turn are served locally: the message the chat widget
+sends after classifying an image ("The AI model identified it as ...")
+and short "tell me about <fish>" style questions in English. FISH_DATA is
+English only, so questions in Bengali, like anything else, return None
+and go to the LLM as before.
+"""
+import os
+import re
+from typing import Optional
+
+from Backend import metrics
+from Backend.database.fish_data import FISH_DATA
+from Backend.database.fish_search import find_key, normalize
+
+CHAT_FAST_PATH = os.getenv("CHAT_FAST_PATH", "1") == "1"
+
+TURNS = metrics.counter(
+    'fishai_chat_turns_total',
+    "Chat turns by where the answer came from ('local' template, response 'cache' or 'llm')",
+    labelnames=('served',),
+)
+
+# The message chatbot.js / index.html send after a classification
+IDENTIFIED_RE = re.compile(
+    r'^I uploaded an image of a fish\. The AI model identified it as "(?P<label>[^"]+)" '
+    r'with (?P<confidence>[\d.]+)% confidence(?P<fallback> \(using fallback classifier\))?\. '
+    r'Can you tell me more about this fish\?$'
+)
+
+# Explicit "tell me about <fish>" questions, where a misspelled name is still taken as a fish
+ASK_ABOUT_RES = (
+    re.compile(r'^(?:please )?(?:can you )?(?:tell me(?: more)? about|what is|whats|what s|describe|'
+               r'info(?:rmation)? (?:about|on)|about)(?: the| a)? (?P<name>.+?)(?: fish)?$'),
+)
+# Matched against normalized text; the name group must resolve to a known fish
+QUESTION_RES = ASK_ABOUT_RES + (
+    re.compile(r'^(?P<name>.+?)(?: fish)?$'),
+)
+
+BENGALI_RE = re.compile(r'[ঀ-৿]')
+
+# One paragraph: the chat widget shows replies as plain text, where line breaks collapse
+TEMPLATE = (
+    "{name_en} ({name_bn}, {scientific_name}): {description} Size: {size}. "
+    "Where it is found: {primary_rivers} ({river_habitat}). Diet: {diet}. "
+    "In the kitchen: {culinary_note} Feel free to ask more about {name_en}."
+)
+IDENTIFIED_TEMPLATE = "The model identified your fish as {name_en} with {confidence}% confidence."
+FALLBACK_NOTE = " This came from the fallback classifier, so please double-check the photo."
+
+
+def find_fish(name: str, fuzzy: bool = False) -> Optional[str]:
+    """Return the FISH_DATA key for a fish name, label or alias, or None"""
+    return find_key(name or '', fuzzy=fuzzy)
+
+
+def _sentence(text: str) -> str:
+    text = str(text).strip()
+    return text if text.rstrip('"\'').endswith(('.', '!', '?')) else f"{text}."
+
+
+def render_fish(key: str) -> str:
+    """Describe a fish from FISH_DATA in one paragraph"""
+    fish = FISH_DATA[key]
+    return TEMPLATE.format(**{**fish, 'description': _sentence(fish['description']),
+                              'culinary_note': _sentence(fish['culinary_note'])})
+
+
+def answer_locally(message: str) -> Optional[str]:
+    """Answer the message from FISH_DATA if it is a known-fish intent, else None"""
+    if not CHAT_FAST_PATH or not message:
+        return None
+    message = message.strip()
+
+    identified = IDENTIFIED_RE.match(message)
+    if identified:
+        key = find_fish(identified.group('label'))
+        if key is None:
+            return None
+        intro = IDENTIFIED_TEMPLATE.format(name_en=FISH_DATA[key]['name_en'],
+                                           confidence=identified.group('confidence'))
+        if identified.group('fallback'):
+            intro += FALLBACK_NOTE
+        return f"{intro} {render_fish(key)}"
+
+    # Only short questions can be a bare name or "tell me about X"; Bengali ones get a Bengali answer from the LLM
+    if len(message) > 80 or BENGALI_RE.search(message):
+        return None
+    normalized = normalize(message)
+    for pattern in QUESTION_RES:
+        match = pattern.match(normalized)
+        if match:
+            key = find_fish(match.group('name'), fuzzy=pattern in ASK_ABOUT_RES)
+            if key is not None:
+                return render_fish(key)
+    return None
+
+
+def record_turn(served: str):
+    TURNS.inc(served=served)
+
+
+def stats() -> dict:
+    local = TURNS.value(served='local')
+    cached = TURNS.value(served='cache')
+    llm = TURNS.value(served='llm')
+    total = local + cached + llm
+    return {
+        'enabled': CHAT_FAST_PATH,
+        'local_turns': int(local),
+        'cached_turns': int(cached),
+        'llm_turns': int(llm),
+        'local_fraction': round(local / total, 4) if total else 0.0,
+    }
+
+
+metrics.gauge('fishai_chat_local_fraction', 'Fraction of chat turns answered from FISH_DATA without an LLM call',
+              lambda: stats()['local_fraction'])
@@ -0,0 +1,128 @@
+"""Process-wide Groq client with a tuned, shared HTTP connection pool.
+
+All chat sessions share one client, so concurrent turns reuse kept-alive
+connections (and HTTP/2 streams when the ``h2`` package is installed)
+instead of each session opening its own pool and paying its own TLS
+handshakes. ``GROQ_BASE_URL`` is honoured by the Groq SDK itself. The
+ASGI server uses an ``AsyncGroq`` client configured the same way, on the
+aiohttp transport when it is installed: httpx's async connection pool costs
+several milliseconds of CPU per request once hundreds of requests are in
+flight, which caps throughput on a single event loop.
+"""
+import logging
+import os
+import threading
+
+import httpx
+from groq import AsyncGroq, DefaultAioHttpClient, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+
+logger = logging.getLogger(__name__)
+
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "32"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "16"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+# 'auto' uses HTTP/2 when the h2 package is installed; '1' requires it, '0' disables it
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "auto")
+# Transport of the async client: 'auto' uses aiohttp when installed (pip install 'groq[aiohttp]'), else httpx
+GROQ_ASYNC_TRANSPORT = os.getenv("GROQ_ASYNC_TRANSPORT", "auto")
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def use_http2() -> bool:
+    """Whether GROQ_HTTP2 asks for HTTP/2 and the h2 package is there to provide it"""
+    if GROQ_HTTP2 == '0':
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        if GROQ_HTTP2 == '1':
+            raise RuntimeError("GROQ_HTTP2=1 requires the h2 package (pip install 'httpx[http2]')")
+        return False
+
+
+def use_aiohttp() -> bool:
+    """Whether GROQ_ASYNC_TRANSPORT asks for aiohttp and the httpx_aiohttp package is there to provide it"""
+    if GROQ_ASYNC_TRANSPORT == 'httpx':
+        return False
+    try:
+        import httpx_aiohttp  # noqa: F401
+        return True
+    except ImportError:
+        if GROQ_ASYNC_TRANSPORT == 'aiohttp':
+            raise RuntimeError("GROQ_ASYNC_TRANSPORT=aiohttp requires the aiohttp extra (pip install 'groq[aiohttp]')")
+        return False
+
+
+def _pool_options(http2: bool) -> dict:
+    return {
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+        'timeout': httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+    }
+
+
+def create_groq_client(api_key: str = None, http2: bool = None) -> Groq:
+    """Build a Groq client on a pooled httpx client configured from the environment"""
+    if http2 is None:
+        http2 = use_http2()
+    http_client = DefaultHttpxClient(**_pool_options(http2))
+    return Groq(
+        api_key=api_key if api_key is not None else os.getenv("GROQ_API_KEY"),
+        max_retries=GROQ_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+def get_groq_client() -> Groq:
+    """Return the shared client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            http2 = use_http2()
+            _client = create_groq_client(http2=http2)
+            logger.info("Groq client created (max_connections=%d, max_keepalive=%d, http2=%s)",
+                        GROQ_MAX_CONNECTIONS, GROQ_MAX_KEEPALIVE, http2)
+    return _client
+
+
+def create_async_groq_client(api_key: str = None, http2: bool = None, aiohttp: bool = None) -> AsyncGroq:
+    """Build an AsyncGroq client with the same pool settings as create_groq_client"""
+    if aiohttp is None:
+        aiohttp = use_aiohttp()
+    if aiohttp:
+        # aiohttp speaks HTTP/1.1 only
+        http_client = DefaultAioHttpClient(**_pool_options(False))
+    else:
+        http_client = DefaultAsyncHttpxClient(**_pool_options(use_http2() if http2 is None else http2))
+    return AsyncGroq(
+        api_key=api_key if api_key is not None else os.getenv("GROQ_API_KEY"),
+        max_retries=GROQ_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+def get_async_groq_client() -> AsyncGroq:
+    """Return the shared async client, creating it on first use.
+
+    The client's connections belong to the event loop that first uses it,
+    so it is only shared within one ASGI server process.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            aiohttp = use_aiohttp()
+            _async_client = create_async_groq_client(aiohttp=aiohttp)
+            logger.info("Async Groq client created (max_connections=%d, transport=%s)",
+                        GROQ_MAX_CONNECTIONS, 'aiohttp' if aiohttp else 'httpx')
+    return _async_client
@@ -0,0 +1,450 @@
+"""Pluggable persistence for chat histories.
+
+Callers append messages and return immediately; a single writer thread
+drains the queue in batches (every ``flush_interval_ms`` or ``max_batch``
+operations), so writes for one session never interleave and several
+appends to the same session cost one write. Three backends:
+
+    json    one ``chat_history_<session>.json`` per session, rewritten once per batch
+            (the original format)
+    jsonl   one append-only ``chat_history_<session>.jsonl`` per session, compacted
+            when it grows well past the retention window
+    sqlite  one database in WAL mode shared by all sessions (and processes)
+
+The file backends take an exclusive lock on the history directory for
+each batch, so several worker processes can write to the same session
+without losing each other's appends (the lock needs ``fcntl``, so on
+Windows only one process may write to a directory).
+
+Sessions saved by the original JSON writer are imported the first time
+they are loaded through a jsonl or sqlite store; ``python -m
+Backend.history_store migrate`` imports all of them up front.
+"""
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from Backend import metrics
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "jsonl")
+HISTORY_DIR = os.getenv("CHAT_HISTORY_DIR", "chat")
+HISTORY_DB = os.getenv("CHAT_HISTORY_DB") or os.path.join(HISTORY_DIR, "history.sqlite3")
+FLUSH_INTERVAL_MS = float(os.getenv("CHAT_HISTORY_FLUSH_MS", "50"))
+# Conversation messages kept per session, besides the system prompt
+MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "15"))
+# Role of the entries holding a session's rolling prompt summary (timestamp: the newest message it covers);
+# only the newest is kept and it does not count towards MAX_MESSAGES
+SUMMARY_ROLE = 'summary'
+
+
+def _lock_file():
+    try:
+        import fcntl
+        return fcntl
+    except ImportError:
+        return None
+
+
+_fcntl = _lock_file()
+
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+_HASHED_NAME = re.compile(r'-[0-9a-f]{16}$')
+
+
+def safe_session_name(session_id: str) -> str:
+    """File-name-safe form of a session id, distinct for distinct ids.
+
+    Ids that are already safe keep their name, so existing files are found
+    again; any other id gets a hash suffix, so ``a/b`` and ``a_b`` do not
+    share a file.
+    """
+    if (session_id and len(session_id) <= 128 and not _UNSAFE_CHARS.search(session_id)
+            and not _HASHED_NAME.search(session_id)):
+        return session_id
+    digest = hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+    return f"{_UNSAFE_CHARS.sub('_', session_id)[:128]}-{digest}"
+
+
+def trim_messages(messages: List[Dict], max_messages: int) -> List[Dict]:
+    """Keep the leading system message, the newest summary and the last max_messages conversation messages"""
+    system = [m for m in messages if m.get('role') == 'system'][:1]
+    summary = [m for m in messages if m.get('role') == SUMMARY_ROLE][-1:]
+    conversation = [m for m in messages if m.get('role') not in ('system', SUMMARY_ROLE)]
+    return system + summary + conversation[-max_messages:]
+
+
+def legacy_json_path(directory: str, session_id: str) -> str:
+    return os.path.join(directory, f"chat_history_{session_id}.json")
+
+
+@contextmanager
+def directory_lock(directory: str):
+    """Exclusive lock shared by every process writing history files in directory"""
+    with open(os.path.join(directory, '.history.lock'), 'a') as lock:
+        if _fcntl is not None:
+            _fcntl.flock(lock, _fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        yield
+
+
+def read_legacy_json(path: str) -> Optional[List[Dict]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("messages", [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class HistoryStore:
+    """Base class: queueing, batching and flush bookkeeping shared by every backend"""
+    backend = 'base'
+
+    def __init__(self, directory: str = HISTORY_DIR, max_messages: int = MAX_MESSAGES,
+                 flush_interval_ms: float = FLUSH_INTERVAL_MS, max_batch: int = 512):
+        self.directory = directory
+        self.max_messages = max_messages
+        self.flush_interval = max(0.0, flush_interval_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.appends = 0
+        self.replaces = 0
+        self.batches = 0
+        self.batched_ops = 0
+        self.write_errors = 0
+        self.last_batch_ms = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'history-{self.backend}', daemon=True)
+        self._thread.start()
+
+    # Public API
+
+    def append(self, session_id: str, message: Dict):
+        """Queue one message for a session"""
+        with self._stats_lock:
+            self.appends += 1
+        self._queue.put(('append', session_id, dict(message)))
+
+    def replace(self, session_id: str, messages: List[Dict]):
+        """Queue a replacement of a session's whole history (e.g. after clearing it)"""
+        with self._stats_lock:
+            self.replaces += 1
+        self._queue.put(('replace', session_id, [dict(m) for m in messages]))
+
+    def load(self, session_id: str) -> Optional[List[Dict]]:
+        """Return a session's messages (trimmed to the retention window), or None if it has none"""
+        self.flush()
+        messages = self._load(session_id)
+        if messages is None and self.backend != 'json':
+            messages = self._import_legacy(session_id)
+        return trim_messages(messages, self.max_messages) if messages is not None else None
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far has been written"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', None, done))
+        return done.wait(timeout)
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'queue_depth': self._queue.qsize(),
+                'appends': self.appends,
+                'replaces': self.replaces,
+                'batches': self.batches,
+                'avg_ops_per_batch': round(self.batched_ops / self.batches, 2) if self.batches else 0.0,
+                'write_errors': self.write_errors,
+                'last_batch_ms': round(self.last_batch_ms, 3),
+            }
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            op = self._queue.get()
+            if op is None:
+                return
+            batch = [op]
+            deadline = time.monotonic() + self.flush_interval
+            while op[0] != 'flush' and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._queue.put(None)
+                    break
+                batch.append(op)
+            self._process(batch)
+
+    def _process(self, batch):
+        writes = [op for op in batch if op[0] != 'flush']
+        if writes:
+            started = time.perf_counter()
+            try:
+                self._write(self._group(writes))
+            except Exception:
+                with self._stats_lock:
+                    self.write_errors += 1
+                logger.exception("Writing %d chat history operation(s) failed", len(writes))
+            elapsed = time.perf_counter() - started
+            metrics.observe_stage('history_persist', elapsed)
+            with self._stats_lock:
+                self.batches += 1
+                self.batched_ops += len(writes)
+                self.last_batch_ms = elapsed * 1000.0
+        for op in batch:
+            if op[0] == 'flush':
+                op[2].set()
+
+    @staticmethod
+    def _group(ops):
+        """Collapse a batch into {session_id: (replacement or None, appended messages)} in arrival order"""
+        sessions = {}
+        for kind, session_id, payload in ops:
+            replacement, appended = sessions.get(session_id, (None, []))
+            if kind == 'replace':
+                sessions[session_id] = (payload, [])
+            else:
+                appended.append(payload)
+                sessions[session_id] = (replacement, appended)
+        return sessions
+
+    def _import_legacy(self, session_id):
+        if safe_session_name(session_id) != session_id:
+            return None
+        messages = read_legacy_json(legacy_json_path(self.directory, session_id))
+        if messages is not None:
+            self.replace(session_id, trim_messages(messages, self.max_messages))
+            logger.info("Imported legacy JSON chat history for session %s into %s store", session_id, self.backend)
+        return messages
+
+    # Backend hooks
+
+    def _load(self, session_id) -> Optional[List[Dict]]:
+        raise NotImplementedError
+
+    def _write(self, sessions):
+        raise NotImplementedError
+
+
+class JsonHistoryStore(HistoryStore):
+    """The original one-JSON-document-per-session layout, rewritten atomically once per batch"""
+    backend = 'json'
+
+    def _path(self, session_id):
+        return legacy_json_path(self.directory, safe_session_name(session_id))
+
+    def _load(self, session_id):
+        return read_legacy_json(self._path(session_id))
+
+    def _write(self, sessions):
+        # Other processes may be writing the same sessions
+        with directory_lock(self.directory):
+            for session_id, (replacement, appended) in sessions.items():
+                path = self._path(session_id)
+                messages = replacement if replacement is not None else (read_legacy_json(path) or [])
+                messages = trim_messages(messages + appended, self.max_messages)
+                tmp = f"{path}.tmp"
+                with open(tmp, 'w') as f:
+                    json.dump({
+                        "session_id": session_id,
+                        "last_updated": datetime.now().isoformat(),
+                        "messages": messages,
+                    }, f)
+                os.replace(tmp, path)
+
+
+class JsonlHistoryStore(HistoryStore):
+    """One append-only JSON-lines file per session"""
+    backend = 'jsonl'
+
+    def __init__(self, *args, compact_factor: int = 4, **kwargs):
+        # Rewrite a session file once it holds this many times the retention window
+        self.compact_factor = max(2, compact_factor)
+        self._line_counts = {}
+        super().__init__(*args, **kwargs)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"chat_history_{safe_session_name(session_id)}.jsonl")
+
+    def _read(self, path):
+        messages = []
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        messages.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write; everything before it is intact
+                        continue
+        except FileNotFoundError:
+            return None
+        return messages
+
+    def _load(self, session_id):
+        return self._read(self._path(session_id))
+
+    def _rewrite(self, path, messages):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.writelines(json.dumps(m) + '\n' for m in messages)
+        os.replace(tmp, path)
+        return len(messages)
+
+    def _write(self, sessions):
+        # Other processes may be writing the same sessions
+        with directory_lock(self.directory):
+            for session_id, (replacement, appended) in sessions.items():
+                path = self._path(session_id)
+                if replacement is not None:
+                    self._line_counts[path] = self._rewrite(path, trim_messages(replacement + appended, self.max_messages))
+                    continue
+                if path not in self._line_counts:
+                    existing = self._read(path)
+                    self._line_counts[path] = len(existing) if existing else 0
+                with open(path, 'a') as f:
+                    f.write(''.join(json.dumps(m) + '\n' for m in appended))
+                self._line_counts[path] += len(appended)
+                if self._line_counts[path] > self.compact_factor * (self.max_messages + 1):
+                    self._line_counts[path] = self._rewrite(path, trim_messages(self._read(path), self.max_messages))
+
+
+class SqliteHistoryStore(HistoryStore):
+    """All sessions in one SQLite database in WAL mode; safe to share between worker processes"""
+    backend = 'sqlite'
+
+    def __init__(self, *args, db_path: str = HISTORY_DB, **kwargs):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._write_db = self._connect()
+        self._write_db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+            " role TEXT NOT NULL, content TEXT NOT NULL, timestamp TEXT)"
+        )
+        self._write_db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self._write_db.commit()
+        self._read_db = self._connect()
+        self._read_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _load(self, session_id):
+        with self._read_lock:
+            rows = self._read_db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        if not rows:
+            return None
+        return [
+            {'role': role, 'content': content, **({'timestamp': ts} if ts else {})}
+            for role, content, ts in rows
+        ]
+
+    def _write(self, sessions):
+        with self._write_db:
+            for session_id, (replacement, appended) in sessions.items():
+                if replacement is not None:
+                    self._write_db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    appended = replacement + appended
+                self._write_db.executemany(
+                    "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                    [(session_id, m['role'], m['content'], m.get('timestamp')) for m in appended],
+                )
+                # Drop conversation messages that have fallen out of the retention window, and older summaries
+                self._write_db.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND role NOT IN ('system', ?) AND id < ("
+                    " SELECT MIN(id) FROM (SELECT id FROM messages WHERE session_id = ?"
+                    " AND role NOT IN ('system', ?) ORDER BY id DESC LIMIT ?))",
+                    (session_id, SUMMARY_ROLE, session_id, SUMMARY_ROLE, self.max_messages),
+                )
+                self._write_db.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND role = ? AND id < ("
+                    " SELECT MAX(id) FROM messages WHERE session_id = ? AND role = ?)",
+                    (session_id, SUMMARY_ROLE, session_id, SUMMARY_ROLE),
+                )
+
+
+BACKENDS = {'json': JsonHistoryStore, 'jsonl': JsonlHistoryStore, 'sqlite': SqliteHistoryStore}
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def create_history_store(backend: str = None, **kwargs) -> HistoryStore:
+    backend = backend or HISTORY_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CHAT_HISTORY_BACKEND '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](**kwargs)
+
+
+def get_history_store() -> HistoryStore:
+    """Return the process-wide store configured by CHAT_HISTORY_BACKEND"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = create_history_store()
+            logger.info("Chat history backend: %s", _default_store.backend)
+            # Write out whatever is still queued when the process exits
+            atexit.register(_default_store.close)
+            metrics.gauge('fishai_history_queue_depth', 'Chat history writes waiting to be flushed',
+                          lambda: _default_store._queue.qsize())
+    return _default_store
+
+
+def migrate_json_files(store: HistoryStore, directory: str = None) -> int:
+    """Import every legacy chat_history_<session>.json file into store; returns the number imported"""
+    directory = directory or store.directory
+    count = 0
+    for path in sorted(glob.glob(os.path.join(directory, "chat_history_*.json"))):
+        session_id = os.path.basename(path)[len("chat_history_"):-len(".json")]
+        messages = read_legacy_json(path)
+        if messages:
+            store.replace(session_id, trim_messages(messages, store.max_messages))
+            count += 1
+    store.flush()
+    return count
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ['migrate']:
+        sys.exit("Usage: python -m Backend.history_store migrate [json|jsonl|sqlite]")
+    target = create_history_store(sys.argv[2] if len(sys.argv) > 2 else None)
+    imported = migrate_json_files(target)
+    target.close()
+    print(f"Imported {imported} session(s) into the {target.backend} store")
@@ -5,10 +5,55 @@ from tensorflow.keras.layers import GlobalAveragePooling2D, Dense, Dropout
 from tensorflow.keras.regularizers import l2
 from tensorflow.keras.applications.convnext import ConvNeXtTiny
 import os
-from PIL import Image
+import threading
+import time
 import warnings
+import logging
+from Backend.batching import MicroBatcher
+from Backend.class_names import CLASS_NAMES, fallback_classify
+from Backend.inference import create_engine, InferenceEngine, INFERENCE_BACKEND, TFLITE_QUANTIZATION
+from Backend.preprocessing import (
+    PreprocessPipeline, StageTimer, ImageTooLargeError,
+    load_resized_image, decode_image,
+)
+from Backend.prediction_cache import PredictionCache, content_key, perceptual_hash, model_fingerprint
+from Backend import metrics
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
+# Micro-batching window for concurrent classify_image calls
+BATCHING_ENABLED = os.getenv("CLASSIFY_BATCHING", "1") != "0"
+MAX_BATCH_SIZE = int(os.getenv("CLASSIFY_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.getenv("CLASSIFY_MAX_WAIT_MS", "10"))
+
+# Batch sizes exercised by the start-up warm-up, defaulting to single requests and full micro-batches
+WARMUP_BATCH_SIZES = sorted({
+    int(size) for size in os.getenv("MODEL_WARMUP_BATCH_SIZES", f"1,{MAX_BATCH_SIZE}").split(',') if size.strip()
+})
+
+# Images per forward pass for bulk classification
+BULK_BATCH_SIZE = int(os.getenv("CLASSIFY_BULK_BATCH_SIZE", "32"))
+
+# Separate decode and inference timings across single and bulk paths, also exported on /metrics
+stage_timer = StageTimer(histogram=metrics.STAGE_SECONDS)
+
+MODEL_PATH = os.getenv("MODEL_PATH") or os.path.join(os.path.dirname(__file__), "model", "convnextnet_model.h5")
+
+# Calibration images for int8 TFLite export (see Backend/inference.py for backend selection)
+CALIBRATION_DIR = os.getenv(
+    "TFLITE_CALIBRATION_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "Frontend", "images")
+)
+
+# Content-addressed cache of predictions for repeat uploads
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE", "1") != "0"
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "86400")),
+    db_path=os.getenv("PREDICTION_CACHE_DB") or None,
+    phash_distance=int(os.getenv("PREDICTION_CACHE_PHASH_DISTANCE", "0")),
+)
+
 def lw(bottom_model, num_classes):
     """Function to create the top layers for the model (same as training)"""
     top_model = bottom_model.output
@@ -23,11 +68,10 @@ def load_custom_model(model_path):
     try:
         # Try to load the model directly first
         model = load_model(model_path)
-        print("Model loaded successfully!")
+        logger.info("Model loaded successfully")
         return model
     except Exception as e:
-        print(f"Direct loading failed: {e}")
-        print("Attempting to rebuild model architecture...")
+        logger.warning("Direct loading failed (%s); rebuilding model architecture", e)
         
         # Rebuild the model architecture
         convnextnet_base = ConvNeXtTiny(
@@ -49,32 +93,35 @@ def load_custom_model(model_path):
         
         # Load weights
         model.load_weights(model_path)
-        print("Model rebuilt and weights loaded!")
+        logger.info("Model rebuilt and weights loaded")
         return model
 
-def preprocess_image(image_path, target_size=(224, 224)):
-    """Preprocess image in the same way as training"""
-    # Load image
-    img = Image.open(image_path)
+def preprocess_image_array(image_path, target_size=(224, 224)):
+    """Preprocess image into a float32 NumPy array of shape (1, H, W, 3)"""
+    img = load_resized_image(image_path, target_size)
     
-    # Convert to RGB if necessary
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # Resize to target size
-    img = img.resize(target_size)
-    
-    # Convert to numpy array
-    img_array = np.array(img)
-    
-    # Convert to tensor and add batch dimension
-    img_array = tf.convert_to_tensor(img_array, dtype=tf.float32)
-    img_array = tf.expand_dims(img_array, axis=0)
+    # Convert to numpy array and add batch dimension
+    img_array = np.asarray(img, dtype=np.float32)[np.newaxis, ...]
     
     # Note: ConvNeXt models typically expect images in range [0, 255]
     # The model's preprocessing is usually handled internally
     return img_array, img
 
+def preprocess_image(image_path, target_size=(224, 224)):
+    """Preprocess image in the same way as training"""
+    img_array, img = preprocess_image_array(image_path, target_size)
+    
+    # Convert to tensor
+    img_array = tf.convert_to_tensor(img_array, dtype=tf.float32)
+    return img_array, img
+
+def predict_batch(model, batch):
+    """Run one forward pass over a (N, H, W, 3) batch and return class probabilities"""
+    started = time.perf_counter()
+    predictions = get_engine(model).predict(batch)
+    stage_timer.record('inference', (time.perf_counter() - started) * 1000.0, len(batch))
+    return predictions
+
 def predict_single_image(model, image_path, class_names=None):
     """Make prediction on a single image"""
     
@@ -82,7 +129,7 @@ def predict_single_image(model, image_path, class_names=None):
     img_array, original_img = preprocess_image(image_path)
     
     # Make prediction
-    predictions = model.predict(img_array, verbose=0)
+    predictions = predict_batch(model, img_array)
     
     # Get predicted class and confidence
     predicted_class_idx = np.argmax(predictions[0])
@@ -91,82 +138,160 @@ def predict_single_image(model, image_path, class_names=None):
     # Get top 3 predictions
     top_3_indices = np.argsort(predictions[0])[-3:][::-1]
     
-    # Print detailed results
-    print("\n" + "="*50)
-    print("PREDICTION RESULTS")
-    print("="*50)
-    
-    if class_names:
-        predicted_class_name = class_names[predicted_class_idx]
-        print(f"Predicted class: {predicted_class_name} (Class {predicted_class_idx})")
-    else:
-        print(f"Predicted class: Class {predicted_class_idx}")
-    
-    print(f"Confidence: {confidence:.4f}")
-    
-    # Print all class probabilities
-    print("\nAll class probabilities:")
-    for i, prob in enumerate(predictions[0]):
-        if class_names:
-            print(f"  {class_names[i]:20s}: {prob:.6f}")
-        else:
-            print(f"  Class {i:2d}: {prob:.6f}")
+    # Log detailed results; the probability table is only built when DEBUG is enabled
+    predicted_class_name = class_names[predicted_class_idx] if class_names else f"Class {predicted_class_idx}"
+    logger.info("Predicted class: %s (confidence %.4f)", predicted_class_name, confidence)
+    if logger.isEnabledFor(logging.DEBUG):
+        names = class_names or [f"Class {i}" for i in range(len(predictions[0]))]
+        table = ', '.join(f"{name}={prob:.6f}" for name, prob in zip(names, predictions[0]))
+        logger.debug("All class probabilities: %s", table)
     
     return predicted_class_idx, confidence
 
-# Define class names (must match training order)
-CLASS_NAMES = [
-    'Bele',
-    'Chela',
-    'Guchi',
-    'Kachki',
-    'Kata Phasa',
-    'Mola',
-    'Nama Chanda',
-    'Pabda',
-    'Puti',
-    'Tengra'
-]
-
 # Global model instance
 _model = None
 _model_loaded = False
 _model_error = None
+_model_lock = threading.Lock()
+_batcher = None
+_batcher_lock = threading.Lock()
+_engine = None
+_engine_lock = threading.Lock()
+
+# Lifecycle: idle -> loading -> warming -> ready, or failed if the model cannot be loaded
+_model_state = 'idle'
+_load_seconds = None
+_warmup_seconds = None
+_preload_thread = None
 
 def load_model_once():
     """Load the model once and cache it"""
-    global _model, _model_loaded, _model_error
+    global _model, _engine, _model_loaded, _model_error, _model_state, _load_seconds
     
-    if _model_loaded:
+    if _model_loaded or _model_state == 'failed':
         return _model
     
-    try:
-        model_path = os.path.join(os.path.dirname(__file__), "model", "convnextnet_model.h5")
-        print(f"[ImageClassification] Loading model from: {model_path}")
-        
-        if not os.path.exists(model_path):
-            _model_error = f"Model file not found at {model_path}"
-            print(f"[ImageClassification] ERROR: {_model_error}")
+    # Serialize loading so concurrent first requests wait for a single load
+    with _model_lock:
+        if _model_loaded or _model_state == 'failed':
+            return _model
+        _model_state = 'loading'
+        started = time.perf_counter()
+        try:
+            model_path = MODEL_PATH
+            logger.info("Loading model from %s", model_path)
+            
+            if not os.path.exists(model_path):
+                _model_error = f"Model file not found at {model_path}"
+                _model_state = 'failed'
+                logger.error(_model_error)
+                return None
+            
+            if INFERENCE_BACKEND == 'tflite':
+                # The engine stands in for the model: the Keras model is only loaded to export the
+                # TFLite artifact and is released afterwards instead of staying resident
+                _model = _engine = create_engine(None, model_path, representative_images=calibration_images(),
+                                                 load_model=lambda: load_custom_model(model_path))
+                logger.info("Inference engine created (backend=%s, buckets=%s)", _model.backend, list(_model.buckets))
+            else:
+                _model = load_custom_model(model_path)
+            _model_loaded = True
+            _model_state = 'warming' if _preload_thread is not None else 'ready'
+            _load_seconds = round(time.perf_counter() - started, 3)
+            # Quantized backends give slightly different probabilities, so they get their own cache entries
+            variant = INFERENCE_BACKEND if INFERENCE_BACKEND == 'keras' else f"{INFERENCE_BACKEND}-{TFLITE_QUANTIZATION}"
+            prediction_cache.set_model_fingerprint(model_fingerprint(model_path, variant))
+            logger.info("Model loaded in %ss", _load_seconds)
+            return _model
+            
+        except Exception as e:
+            _model_error = str(e)
+            _model_state = 'failed'
+            logger.exception("Loading model failed")
             return None
-        
-        _model = load_custom_model(model_path)
-        _model_loaded = True
-        print("[ImageClassification] Model loaded successfully!")
-        return _model
-        
+
+def warm_up_model(model, batch_sizes=WARMUP_BATCH_SIZES):
+    """Run dummy inferences at the batch sizes we serve so graph tracing happens before real traffic"""
+    global _warmup_seconds
+    started = time.perf_counter()
+    get_engine(model).warm_up(batch_sizes)
+    logger.info("Warm-up inference done for batch sizes %s", list(batch_sizes))
+    _warmup_seconds = round(time.perf_counter() - started, 3)
+
+def _preload():
+    global _model_state
+    model = load_model_once()
+    if model is None:
+        return
+    try:
+        warm_up_model(model)
     except Exception as e:
-        _model_error = str(e)
-        print(f"[ImageClassification] ERROR loading model: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        logger.warning("Warm-up failed: %s", e)
+    _model_state = 'ready'
+    logger.info("Model is ready")
+
+def start_model_preload():
+    """Load and warm up the model on a background thread; safe to call more than once"""
+    global _preload_thread
+    if _preload_thread is None:
+        _preload_thread = threading.Thread(target=_preload, name='model-preload', daemon=True)
+        _preload_thread.start()
+    return _preload_thread
+
+def model_state():
+    """Return 'idle', 'loading', 'warming', 'ready' or 'failed'"""
+    return _model_state
 
-def classify_image(image_path):
+def calibration_images():
+    """Images used to calibrate full-integer TFLite quantization"""
+    if not os.path.isdir(CALIBRATION_DIR):
+        return []
+    return sorted(
+        os.path.join(CALIBRATION_DIR, name) for name in os.listdir(CALIBRATION_DIR)
+        if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+
+def get_engine(model):
+    """Return the inference engine wrapping the loaded model"""
+    global _engine
+    if isinstance(model, InferenceEngine):
+        return model
+    with _engine_lock:
+        if _engine is None or _engine.model is not model:
+            _engine = create_engine(model, MODEL_PATH, representative_images=calibration_images())
+            logger.info("Inference engine created (backend=%s, buckets=%s)", _engine.backend, list(_engine.buckets))
+    return _engine
+
+def get_batcher(model):
+    """Return the shared micro-batcher that feeds the model"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                lambda batch: predict_batch(model, batch),
+                max_batch_size=MAX_BATCH_SIZE,
+                max_wait_ms=MAX_BATCH_WAIT_MS,
+            )
+            logger.info("Micro-batching enabled (max_batch_size=%d, max_wait_ms=%s)", MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS)
+    return _batcher
+
+def _cache_lookup(img_array):
+    """Return (key, phash, cached_prediction) for a preprocessed image"""
+    if not PREDICTION_CACHE_ENABLED:
+        return None, None, None
+    key = content_key(img_array)
+    phash = perceptual_hash(img_array) if prediction_cache.phash_distance > 0 else None
+    return key, phash, prediction_cache.get(key, phash)
+
+def classify_image(image_path, filename=None):
     """
     Classify an uploaded fish image
     
     Args:
-        image_path: Path to the uploaded image file
+        image_path: Path to the uploaded image file, or the upload itself as
+            bytes / a file-like object so it can be decoded without touching disk
+        filename: Original file name, used by the fallback classifier when
+            image_path is not a path
         
     Returns:
         tuple: (label, confidence, method) where:
@@ -174,43 +299,172 @@ def classify_image(image_path):
             - confidence: confidence score (0-1)
             - method: 'dl' for deep learning or 'fallback' for filename-based
     """
-    print(f"[ImageClassification] classify_image called with: {image_path}")
-    
+    if filename is None:
+        filename = image_path if isinstance(image_path, (str, os.PathLike)) else getattr(image_path, 'filename', None) or ''
+
     # Try to load model
     model = load_model_once()
     
     if model is None:
-        print("[ImageClassification] Model not available, using fallback")
-        # Fallback: try to extract from filename
-        basename = os.path.basename(image_path)
-        for class_name in CLASS_NAMES:
-            if class_name.lower() in basename.lower():
-                print(f"[ImageClassification] Fallback detected '{class_name}' in filename")
-                return class_name, 0.5, 'fallback'
-        
-        print("[ImageClassification] Fallback: no class name found in filename")
-        return "Unknown", 0.0, 'fallback'
+        logger.debug("Model not available, using fallback")
+        return fallback_classify(filename)
     
     # Use model for prediction
     try:
-        print("[ImageClassification] Running model prediction...")
-        predicted_class_idx, confidence = predict_single_image(model, image_path, CLASS_NAMES)
-        label = CLASS_NAMES[predicted_class_idx]
-        print(f"[ImageClassification] Prediction complete: {label} ({confidence:.4f})")
-        return label, float(confidence), 'dl'
+        started = time.perf_counter()
+        img_array, _ = preprocess_image_array(image_path)
+        stage_timer.record('decode', (time.perf_counter() - started) * 1000.0)
+        return _predict_array(model, img_array)
         
-    except Exception as e:
-        print(f"[ImageClassification] ERROR during prediction: {e}")
-        import traceback
-        traceback.print_exc()
+    except ImageTooLargeError:
+        raise
+    except Exception:
+        logger.exception("Prediction for %s failed", filename)
+        return "Error", 0.0, 'error'
+
+def _predict_array(model, img_array):
+    """Return (label, confidence, 'dl') for a preprocessed (1, H, W, 3) float32 array"""
+    key, phash, cached = _cache_lookup(img_array)
+    if cached is not None:
+        label, confidence = cached
+        logger.debug("Prediction cache hit: %s (%.4f)", label, confidence)
+        return label, float(confidence), 'dl'
+
+    if BATCHING_ENABLED:
+        probabilities = get_batcher(model).predict(img_array)
+    else:
+        probabilities = predict_batch(model, img_array)[0]
+    predicted_class_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_class_idx])
+    label = CLASS_NAMES[predicted_class_idx]
+    logger.debug("Prediction complete: %s (%.4f)", label, confidence)
+
+    if key is not None:
+        prediction_cache.put(key, label, confidence, phash)
+    return label, confidence, 'dl'
+
+def classify_array(img_array, filename=''):
+    """Like classify_image, for an image that is already decoded and resized to (1, H, W, 3)"""
+    model = load_model_once()
+    if model is None:
+        return fallback_classify(filename)
+    try:
+        return _predict_array(model, img_array)
+    except Exception:
+        logger.exception("Prediction for %s failed", filename)
         return "Error", 0.0, 'error'
 
+def classify_images(items, batch_size=BULK_BATCH_SIZE):
+    """
+    Classify many images using batched forward passes
+    
+    Decoding runs on a thread pool into reusable batch buffers, overlapping
+    with inference on the previous batch.
+    
+    Args:
+        items: iterable of (filename, source) pairs, where source is anything
+            classify_image accepts, or an exception to report for that item
+            without decoding; consumed lazily as the pipeline needs it
+        batch_size: number of images per forward pass
+        
+    Yields:
+        list of result dicts, one list per batch, each with 'filename',
+        'label', 'confidence', 'method' and, on failure, 'error'
+    """
+    model = load_model_once()
+    if model is None:
+        chunk = []
+        for filename, source in items:
+            chunk.append(_error_result(filename, str(source)) if isinstance(source, Exception)
+                         else _fallback_result(filename))
+            if len(chunk) >= batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    pipeline = PreprocessPipeline(decode_image, batch_size, timer=stage_timer)
+    for filenames, batch, errors in pipeline.run(items):
+        yield _classify_batch(model, filenames, batch, errors)
+
+def classify_decoded(filenames, batch, errors):
+    """Classify one batch decoded by the caller; rows whose entry in errors is set are reported as errors"""
+    model = load_model_once()
+    if model is None:
+        return [_fallback_result(name) for name in filenames]
+    return _classify_batch(model, filenames, batch, errors)
+
+def _fallback_result(filename):
+    label, confidence, method = fallback_classify(filename)
+    return {'filename': filename, 'label': label, 'confidence': confidence, 'method': method}
+
+def _error_result(filename, error):
+    return {'filename': filename, 'label': 'Error', 'confidence': 0.0, 'method': 'error', 'error': error}
+
+def _classify_batch(model, filenames, batch, errors):
+    """Classify one decoded batch, skipping rows that failed to decode or hit the cache"""
+    results = [None] * len(filenames)
+    pending = []
+    for i, filename in enumerate(filenames):
+        if errors[i] is not None:
+            results[i] = _error_result(filename, errors[i])
+            continue
+        key, phash, cached = _cache_lookup(batch[i:i + 1])
+        if cached is not None:
+            results[i] = {'filename': filename, 'label': cached[0], 'confidence': float(cached[1]), 'method': 'dl'}
+        else:
+            pending.append((i, key, phash))
+
+    if pending:
+        rows = [i for i, _, _ in pending]
+        try:
+            # Feed the buffer directly when every row needs inference
+            inputs = batch if len(rows) == len(batch) else batch[rows]
+            probabilities = predict_batch(model, inputs)
+        except Exception as e:
+            logger.exception("Batch prediction failed for %d image(s)", len(rows))
+            for i in rows:
+                results[i] = _error_result(filenames[i], str(e))
+            return results
+        for (i, key, phash), probs in zip(pending, probabilities):
+            predicted_class_idx = int(np.argmax(probs))
+            label = CLASS_NAMES[predicted_class_idx]
+            confidence = float(probs[predicted_class_idx])
+            results[i] = {'filename': filenames[i], 'label': label, 'confidence': confidence, 'method': 'dl'}
+            if key is not None:
+                prediction_cache.put(key, label, confidence, phash)
+    return results
+
+metrics.gauge('fishai_model_ready', 'Whether the model is loaded and warmed up', lambda: int(_model_state == 'ready'))
+metrics.gauge('fishai_batch_queue_depth', 'Images waiting for the micro-batcher',
+              lambda: _batcher.stats()['queue_depth'] if _batcher is not None else 0)
+metrics.gauge('fishai_prediction_cache_hit_rate', 'Fraction of prediction cache lookups that hit',
+              lambda: prediction_cache.stats()['hit_rate'])
+
 def model_status():
     """Return diagnostic information about model loading status"""
     return {
+        'state': _model_state,
+        'ready': _model_state == 'ready',
+        'load_seconds': _load_seconds,
+        'warmup_seconds': _warmup_seconds,
         'loaded': _model_loaded,
         'error': _model_error,
         'model_available': _model is not None,
         'class_count': len(CLASS_NAMES),
-        'classes': CLASS_NAMES
+        'classes': CLASS_NAMES,
+        'batching': {
+            'enabled': BATCHING_ENABLED,
+            **(_batcher.stats() if _batcher is not None else {
+                'max_batch_size': MAX_BATCH_SIZE,
+                'max_wait_ms': MAX_BATCH_WAIT_MS,
+            })
+        },
+        'cache': {
+            'enabled': PREDICTION_CACHE_ENABLED,
+            **prediction_cache.stats()
+        },
+        'timing': stage_timer.stats(),
+        'engine': _engine.stats() if _engine is not None else None
     }
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""Responsive, modern-format variants of the raster images under Frontend/.
+
+Every PNG and JPEG is resized to each of IMAGE_WIDTHS narrower than itself
+and encoded as AVIF (when Pillow was built with it), WebP and its own
+format. Variants are written to IMAGE_VARIANT_DIR under the hash of the
+source file (``<hash>-<width>.<ext>``), so they survive restarts, a
+changed image gets new variants and an unchanged one is never converted
+again. Variants of sources that no longer exist are removed.
+
+``GET /images/<name>?w=<width>`` serves the narrowest variant at least
+``w`` pixels wide (the full size without ``w``) in the smallest format the
+browser lists in its ``Accept`` header, so pages can use ``srcset``.
+"""
+import io
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import Response, send_file
+from PIL import Image, ImageOps, features
+
+from Backend import metrics
+from Backend.static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, content_version
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANT_DIR = os.getenv("IMAGE_VARIANT_DIR", os.path.join('cache', 'images'))
+# Widths generated for srcset; the source's own width is always available too
+IMAGE_WIDTHS = tuple(sorted({int(w) for w in os.getenv("IMAGE_WIDTHS", "320,480,720,1080").split(',') if w.strip()}))
+
+SOURCE_FORMATS = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+# Pillow format name, mimetype, file extension and encoder options per output format
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 'avif', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', 'image/webp', 'webp', {'quality': 80, 'method': 6}),
+    'png': ('PNG', 'image/png', 'png', {}),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg', {'quality': 85, 'progressive': True}),
+}
+# Formats only served to browsers that list them in Accept; a source's own format is always acceptable
+NEGOTIATED_FORMATS = tuple(f for f in ('avif', 'webp') if features.check(f))
+VARIANT_NAME_RE = re.compile(r'^(?P<version>[0-9a-f]{16})-(?P<width>\d+)\.(?P<ext>[a-z]+)$')
+
+IMAGE_BYTES = metrics.counter(
+    'fishai_image_bytes_total',
+    'Image bytes sent by the responsive image route, by format',
+    labelnames=('format',),
+)
+
+
+def _lock_file():
+    try:
+        import fcntl
+        return fcntl
+    except ImportError:
+        return None
+
+
+_fcntl = _lock_file()
+
+
+class Source:
+    """A source image and the variants generated from it, keyed by (width, format)"""
+
+    def __init__(self, path: str, filename: str, mtime_ns: int, version: str, size: Tuple[int, int], fmt: str):
+        self.path = path
+        self.filename = filename
+        self.mtime_ns = mtime_ns
+        self.version = version
+        self.width, self.height = size
+        self.format = fmt
+        self.widths = tuple(w for w in IMAGE_WIDTHS if w < self.width) + (self.width,)
+        # (width, format) -> (filename, bytes)
+        self.variants: Dict[Tuple[int, str], Tuple[str, int]] = {}
+
+    def formats(self):
+        return NEGOTIATED_FORMATS + (self.format,)
+
+    def width_for(self, requested: Optional[str]) -> int:
+        """The narrowest generated width at least as wide as requested, or the full width"""
+        try:
+            requested = int(requested)
+        except (TypeError, ValueError):
+            return self.width
+        return next((w for w in self.widths if w >= requested), self.width)
+
+
+class ImageVariants:
+    """Generates and serves the variants of every raster image under root"""
+
+    def __init__(self, root: str, cache_dir: str = IMAGE_VARIANT_DIR, watch: bool = False):
+        self.root = os.path.abspath(root)
+        self.cache_dir = cache_dir
+        self.watch = watch
+        self.sources: Dict[str, Source] = {}
+        # Guards sources, the variants published on them and _width_locks; never held while encoding
+        self._lock = threading.Lock()
+        # (version, width) -> lock held while that width is encoded, so each is encoded once
+        self._width_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _variant_filename(self, source: Source, width: int, fmt: str) -> str:
+        if width == source.width and fmt == source.format:
+            return source.filename
+        return os.path.join(self.cache_dir, f"{source.version}-{width}.{FORMATS[fmt][2]}")
+
+    def _load(self, path: str, filename: str, previous: Optional[Source]) -> Source:
+        mtime_ns = os.stat(filename).st_mtime_ns
+        if previous is not None and previous.mtime_ns == mtime_ns:
+            return previous
+        with open(filename, 'rb') as f:
+            body = f.read()
+        with Image.open(io.BytesIO(body)) as img:
+            size = ImageOps.exif_transpose(img).size if img.format == 'JPEG' else img.size
+        fmt = SOURCE_FORMATS[os.path.splitext(path)[1].lower()]
+        source = Source(path, filename, mtime_ns, content_version(body), size, fmt)
+        for width in source.widths:
+            for f in source.formats():
+                variant = self._variant_filename(source, width, f)
+                if os.path.exists(variant):
+                    source.variants[(width, f)] = (variant, os.path.getsize(variant))
+        return source
+
+    def scan(self):
+        """Hash new and changed sources; variants already on disk are picked up, missing ones are not generated"""
+        sources = {}
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.') or os.path.splitext(name)[1].lower() not in SOURCE_FORMATS:
+                    continue
+                filename = os.path.join(directory, name)
+                path = os.path.relpath(filename, self.root).replace(os.sep, '/')
+                try:
+                    sources[path] = self._load(path, filename, self.sources.get(path))
+                except (OSError, Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+                    logger.warning("Skipping image %s: %s", path, e)
+        self.sources = sources
+
+    def _width_lock(self, source: Source, width: int) -> threading.Lock:
+        with self._lock:
+            return self._width_locks.setdefault((source.version, width), threading.Lock())
+
+    def _missing(self, source: Source, width: int, formats) -> bool:
+        with self._lock:
+            return any((width, f) not in source.variants for f in formats)
+
+    def _generate(self, source: Source, width: int):
+        """Write every missing format of source at width, publishing each to source.variants"""
+        with Image.open(source.filename) as img:
+            img = ImageOps.exif_transpose(img) if source.format == 'jpeg' else img
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+            if width != source.width:
+                img = img.resize((width, max(1, round(source.height * width / source.width))), Image.LANCZOS)
+            for fmt in source.formats():
+                filename = self._variant_filename(source, width, fmt)
+                if not os.path.exists(filename):
+                    pillow_format, _, _, options = FORMATS[fmt]
+                    with metrics.stage_timer('image_variant'):
+                        tmp = f"{filename}.{os.getpid()}.tmp"
+                        (img.convert('RGB') if fmt == 'jpeg' else img).save(tmp, pillow_format, **options)
+                        os.replace(tmp, filename)
+                variant = (filename, os.path.getsize(filename))
+                with self._lock:
+                    source.variants[(width, fmt)] = variant
+
+    def _try_generate(self, source: Source, width: int):
+        try:
+            self._generate(source, width)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not generate %spx variants of %s: %s", width, source.path, e)
+            metrics.ERRORS.inc(source='image_variant')
+
+    def build(self):
+        """Generate the variants missing for any source and remove those of sources that are gone.
+
+        Processes sharing the cache directory take turns, so gunicorn
+        workers starting together convert each image only once.
+        """
+        started = time.perf_counter()
+        generated = 0
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as lock:
+            if _fcntl is not None:
+                _fcntl.flock(lock, _fcntl.LOCK_EX)
+            with self._lock:
+                self.scan()
+            for source in list(self.sources.values()):
+                for width in source.widths:
+                    # Only requests for this same width wait on it; everything else is served meanwhile
+                    with self._width_lock(source, width):
+                        if self._missing(source, width, source.formats()):
+                            self._try_generate(source, width)
+                            generated += 1
+            self._prune()
+        logger.info(
+            "Image variants ready: %d sources, %d widths generated, %.1f MB -> %.1f MB at full width (%s) in %.2fs",
+            len(self.sources), generated,
+            sum(os.path.getsize(s.filename) for s in self.sources.values()) / 1e6,
+            sum(min(size for (w, _), (_, size) in s.variants.items() if w == s.width)
+                for s in self.sources.values() if s.variants) / 1e6,
+            ', '.join(NEGOTIATED_FORMATS) or 'no modern formats', time.perf_counter() - started,
+        )
+
+    def _prune(self):
+        versions = {source.version for source in self.sources.values()}
+        with self._lock:
+            self._width_locks = {key: lock for key, lock in self._width_locks.items() if key[0] in versions}
+        for name in os.listdir(self.cache_dir):
+            match = VARIANT_NAME_RE.match(name)
+            if match and match.group('version') not in versions:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def start_build(self) -> threading.Thread:
+        """Build in a background thread; requests arriving meanwhile generate what they need"""
+        thread = threading.Thread(target=self.build, name='image-variants', daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, path: str) -> Optional[Source]:
+        if os.path.splitext(path)[1].lower() not in SOURCE_FORMATS:
+            return None
+        source = self.sources.get(path)
+        if source is None and not self.sources:
+            with self._lock:
+                if not self.sources:
+                    self.scan()
+            source = self.sources.get(path)
+        elif self.watch and source is not None:
+            try:
+                changed = os.stat(source.filename).st_mtime_ns != source.mtime_ns
+            except OSError:
+                changed = True
+            if changed:
+                with self._lock:
+                    self.scan()
+                source = self.sources.get(path)
+        return source
+
+    def _variant(self, source: Source, width: int, accept_mimetypes) -> Tuple[str, str, int]:
+        """(format, filename, bytes) of the smallest acceptable variant, generating the width if needed"""
+        accepted = {mimetype for mimetype, quality in accept_mimetypes if quality > 0}
+        formats = [f for f in NEGOTIATED_FORMATS if FORMATS[f][1] in accepted] + [source.format]
+        if self._missing(source, width, formats):
+            with self._width_lock(source, width):
+                if self._missing(source, width, formats):
+                    self._try_generate(source, width)
+        with self._lock:
+            available = {f: source.variants[(width, f)] for f in formats if (width, f) in source.variants}
+        if not available:
+            return source.format, source.filename, os.path.getsize(source.filename)
+        fmt = min(available, key=lambda f: available[f][1])
+        return (fmt,) + available[fmt]
+
+    def response(self, path: str, request) -> Optional[Response]:
+        """Serve an image for a Flask request, or return None if path is not a source image"""
+        source = self.get(path)
+        if source is None:
+            return None
+        width = source.width_for(request.args.get('w'))
+        fmt, filename, size = self._variant(source, width, request.accept_mimetypes)
+        etag = f"{source.version}-{width}-{fmt}"
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if request.args.get('v') == source.version
+            else REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept',
+        }
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+
+        response = send_file(filename, mimetype=FORMATS[fmt][1], etag=False, conditional=False)
+        response.headers.update(headers)
+        IMAGE_BYTES.inc(size, format=fmt)
+        return response
+
+
+def main():
+    """Generate missing variants ahead of time: python -m Backend.image_variants [root]"""
+    import sys
+    from Backend.logging_setup import configure_logging
+
+    configure_logging()
+    ImageVariants(sys.argv[1] if len(sys.argv) > 1 else 'Frontend').build()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+# Batch sizes the compiled graph is specialised for; other sizes are padded up to the next bucket
+DEFAULT_BUCKETS = tuple(sorted({
+    int(size) for size in os.getenv("INFERENCE_BUCKETS", "1,2,4,8,16,32").split(',') if size.strip()
+}))
+# Compile the traced function with XLA
+JIT_COMPILE = os.getenv("INFERENCE_JIT", "0") == "1"
+
+# 'keras' (compiled tf.function) or 'tflite' (quantized TFLite interpreter)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+# TFLite quantization: 'float16', 'dynamic' (int8 weights) or 'int8' (full post-training integer quantization)
+TFLITE_QUANTIZATION = os.getenv("TFLITE_QUANTIZATION", "dynamic")
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", str(os.cpu_count() or 1)))
+TFLITE_QUANTIZATIONS = ('none', 'float16', 'dynamic', 'int8')
+
+try:
+    # LiteRT is the maintained home of the TFLite interpreter; tf.lite.Interpreter is deprecated
+    from ai_edge_litert.interpreter import Interpreter as TFLiteInterpreter
+except ImportError:
+    TFLiteInterpreter = tf.lite.Interpreter
+
+
+class InferenceEngine:
+    """Run a Keras model through a traced ``tf.function`` instead of ``model.predict``.
+
+    ``model.predict`` builds a data adapter and predict loop on every call,
+    which dominates the cost of small batches. Here the forward pass is
+    traced once per bucketed batch size; inputs are zero-padded up to the
+    nearest bucket so arbitrary batch sizes never trigger a retrace.
+    """
+
+    backend = 'keras'
+
+    def __init__(self, model, buckets=DEFAULT_BUCKETS, jit_compile: bool = JIT_COMPILE):
+        self.model = model
+        self.buckets = tuple(sorted(buckets))
+        self.input_shape = tuple(model.input_shape[1:])
+        self._forward = tf.function(lambda x: model(x, training=False), jit_compile=jit_compile)
+        self._init_stats()
+
+    def _init_stats(self):
+        self._lock = threading.Lock()
+        self._traced = set()
+        self._calls = 0
+        self._items = 0
+        self._padded_items = 0
+        self._bucket_counts = {}
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+        self._last_ms = 0.0
+
+    def _bucket_for(self, n: int) -> int:
+        for bucket in self.buckets:
+            if n <= bucket:
+                return bucket
+        return self.buckets[-1]
+
+    def _run_bucket(self, chunk: np.ndarray) -> np.ndarray:
+        n = len(chunk)
+        bucket = self._bucket_for(n)
+        if n < bucket:
+            padded = np.zeros((bucket,) + self.input_shape, dtype=np.float32)
+            padded[:n] = chunk
+            chunk = padded
+        outputs = self._infer(chunk)[:n]
+        with self._lock:
+            self._traced.add(bucket)
+            self._bucket_counts[bucket] = self._bucket_counts.get(bucket, 0) + 1
+            self._padded_items += bucket - n
+        return outputs
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        return self._forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+    def predict(self, batch) -> np.ndarray:
+        """Return class probabilities for a (N, H, W, 3) batch as a NumPy array"""
+        batch = np.asarray(batch, dtype=np.float32)
+        started = time.perf_counter()
+        largest = self.buckets[-1]
+        if len(batch) <= largest:
+            outputs = self._run_bucket(batch)
+        else:
+            outputs = np.concatenate(
+                [self._run_bucket(batch[i:i + largest]) for i in range(0, len(batch), largest)], axis=0
+            )
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._calls += 1
+            self._items += len(batch)
+            self._total_ms += elapsed_ms
+            self._max_ms = max(self._max_ms, elapsed_ms)
+            self._last_ms = elapsed_ms
+        return outputs
+
+    def warm_up(self, batch_sizes):
+        """Trace the buckets that serve the given batch sizes"""
+        for size in sorted({self._bucket_for(size) for size in batch_sizes}):
+            self._run_bucket(np.zeros((size,) + self.input_shape, dtype=np.float32))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'buckets': list(self.buckets),
+                'traced_buckets': sorted(self._traced),
+                'calls': self._calls,
+                'items': self._items,
+                'padded_items': self._padded_items,
+                'bucket_counts': {str(k): v for k, v in sorted(self._bucket_counts.items())},
+                'avg_latency_ms': round(self._total_ms / self._calls, 3) if self._calls else 0.0,
+                'last_latency_ms': round(self._last_ms, 3),
+                'max_latency_ms': round(self._max_ms, 3),
+            }
+
+
+def _representative_dataset(image_paths, input_shape, limit=100):
+    """Yield calibration samples for full-integer quantization"""
+    from Backend.preprocessing import decode_image
+
+    def generate():
+        for path in list(image_paths)[:limit]:
+            sample = decode_image(path, (input_shape[1], input_shape[0])).astype(np.float32)
+            yield [sample[np.newaxis, ...]]
+    return generate
+
+
+def export_tflite(model, output_path, quantization: str = TFLITE_QUANTIZATION, representative_images=None):
+    """Convert a Keras model to a TFLite flatbuffer and write it to output_path.
+
+    quantization: 'none', 'float16', 'dynamic' (int8 weights, float activations)
+    or 'int8' (post-training integer quantization calibrated on
+    representative_images; float32 input and output are kept).
+    """
+    if quantization not in TFLITE_QUANTIZATIONS:
+        raise ValueError(f"Unknown TFLite quantization '{quantization}', expected one of {TFLITE_QUANTIZATIONS}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if not representative_images:
+            raise ValueError("int8 quantization needs representative_images for calibration")
+        converter.representative_dataset = _representative_dataset(representative_images, model.input_shape[1:])
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS
+        ]
+
+    flatbuffer = converter.convert()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(flatbuffer)
+    logger.info("Exported %s TFLite model to %s (%d bytes)", quantization, output_path, len(flatbuffer))
+    return output_path
+
+
+class TFLiteEngine(InferenceEngine):
+    """Run a TFLite flatbuffer on a multi-threaded CPU interpreter.
+
+    One interpreter is allocated per batch-size bucket, so tensors are never
+    resized between calls. Interpreters are not thread-safe; each bucket's
+    interpreter is guarded by its own lock.
+    """
+
+    def __init__(self, tflite_path, buckets=DEFAULT_BUCKETS, num_threads: int = TFLITE_THREADS, quantization: str = None):
+        self.model = None
+        self.tflite_path = tflite_path
+        self.num_threads = num_threads
+        self.buckets = tuple(sorted(buckets))
+        self.backend = f"tflite-{quantization}" if quantization else 'tflite'
+        self._interpreters = {}
+        self._interpreter_locks = {}
+
+        probe = TFLiteInterpreter(model_path=tflite_path)
+        self.input_shape = tuple(int(d) for d in probe.get_input_details()[0]['shape'][1:])
+        self._init_stats()
+
+    def _interpreter_for(self, bucket):
+        with self._lock:
+            if bucket not in self._interpreters:
+                interpreter = TFLiteInterpreter(model_path=self.tflite_path, num_threads=self.num_threads)
+                interpreter.resize_tensor_input(interpreter.get_input_details()[0]['index'], (bucket,) + self.input_shape)
+                interpreter.allocate_tensors()
+                self._interpreters[bucket] = interpreter
+                self._interpreter_locks[bucket] = threading.Lock()
+            return self._interpreters[bucket], self._interpreter_locks[bucket]
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        interpreter, lock = self._interpreter_for(len(batch))
+        with lock:
+            interpreter.set_tensor(interpreter.get_input_details()[0]['index'], np.ascontiguousarray(batch, dtype=np.float32))
+            interpreter.invoke()
+            return interpreter.get_tensor(interpreter.get_output_details()[0]['index']).copy()
+
+
+def tflite_path_for(model_path, quantization: str = TFLITE_QUANTIZATION) -> str:
+    """Default location of the exported TFLite artifact next to the Keras model"""
+    return f"{os.path.splitext(model_path)[0]}.{quantization}.tflite"
+
+
+def create_engine(model, model_path=None, backend: str = INFERENCE_BACKEND, quantization: str = TFLITE_QUANTIZATION,
+                  representative_images=None, load_model=None):
+    """Build the configured inference backend for a Keras model.
+
+    Pass model=None and a load_model callable to load the Keras model only
+    when it is needed. For the TFLite backend the artifact is read from
+    TFLITE_MODEL_PATH (or next to the Keras model) and re-exported when
+    missing or older than the Keras model file; the engine keeps no
+    reference to the Keras model, so it can be freed after the export.
+    """
+    if backend == 'keras':
+        return InferenceEngine(model if model is not None else load_model())
+    if backend != 'tflite':
+        raise ValueError(f"Unknown inference backend '{backend}', expected 'keras' or 'tflite'")
+
+    tflite_path = os.getenv("TFLITE_MODEL_PATH") or tflite_path_for(model_path, quantization)
+    stale = model_path is not None and os.path.exists(model_path) and os.path.exists(tflite_path) \
+        and os.path.getmtime(tflite_path) < os.path.getmtime(model_path)
+    if not os.path.exists(tflite_path) or stale:
+        export_tflite(model if model is not None else load_model(), tflite_path, quantization, representative_images)
+    return TFLiteEngine(tflite_path, quantization=quantization)
@@ -0,0 +1,122 @@
+"""Leveled, non-blocking structured logging.
+
+Request threads only filter a record and put it on a queue; a single
+listener thread formats it (plain text or JSON) and writes it to stdout.
+Every record carries the id of the request that produced it, and DEBUG
+output is sampled per request so verbose tracing can stay enabled under
+load.
+
+Configured from the environment when ``configure_logging()`` runs (so
+values from ``.env`` apply):
+    LOG_LEVEL               DEBUG, INFO (default), WARNING, ...
+    LOG_FORMAT              'text' (default) or 'json'
+    LOG_DEBUG_SAMPLE_RATE   fraction of requests whose DEBUG records are kept (default 0.01)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+DEBUG_SAMPLE_RATE = 1.0
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+_debug_sampled = contextvars.ContextVar('debug_sampled', default=True)
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def start_request(request_id: str = None) -> str:
+    """Bind a request id to the current context and decide whether its DEBUG output is sampled"""
+    if not request_id or not _VALID_REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    _debug_sampled.set(random.random() < DEBUG_SAMPLE_RATE)
+    return request_id
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request id and drop DEBUG records of unsampled requests"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return record.levelno > logging.DEBUG or _debug_sampled.get()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """A QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler merges ``msg % args`` on the calling thread; here the
+    record is queued as is, so log calls should pass immutable arguments.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        return super().format(record)
+
+
+def configure_logging(level: str = None, fmt: str = None, debug_sample_rate: float = None):
+    """Route the root logger through a queue to a background writer; safe to call more than once"""
+    global _listener, DEBUG_SAMPLE_RATE
+    if _listener is not None:
+        return
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+    DEBUG_SAMPLE_RATE = debug_sample_rate
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
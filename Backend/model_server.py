@@ -0,0 +1,384 @@
+"""Run classification in one shared process instead of in every web worker.
+
+With ``INFERENCE_MODE=server`` web workers never import TensorFlow. They
+decode and resize uploads themselves, write the pixels into a shared-memory
+buffer and send a small job (buffer name and file names) to the model
+server over a local socket. The server owns the only copy of the model,
+micro-batches jobs from all workers together and replies with the
+predictions, so adding workers adds request-handling capacity without
+another copy of TensorFlow and ConvNeXt. Start it with
+
+    python -m Backend.model_server
+
+or let ``gunicorn.conf.py`` start it alongside the workers. The functions
+below mirror the classification API of ``Backend/image_classification.py``
+for use in the web workers.
+"""
+import atexit
+import logging
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from Backend import metrics
+from Backend.class_names import CLASS_NAMES, fallback_classify
+from Backend.preprocessing import ImageTooLargeError, PreprocessPipeline, StageTimer, decode_image
+
+logger = logging.getLogger(__name__)
+
+# 'local' loads the model in every process that classifies; 'server' sends images to the model server
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local")
+# Unix socket the model server listens on
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS") or os.path.join(
+    tempfile.gettempdir(), "fishai-model-server.sock"
+)
+# Seconds a worker waits for a classification (the first one may wait for the model to load)
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "60"))
+# Seconds a worker waits for the model server's status
+MODEL_SERVER_STATUS_TIMEOUT = 5.0
+# Images per job on /api/classify/batch (same setting as Backend/image_classification.py)
+BULK_BATCH_SIZE = int(os.getenv("CLASSIFY_BULK_BATCH_SIZE", "32"))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Pixels are passed as uint8, a quarter of the size of the model's float32 input
+IMAGE_SHAPE = (224, 224, 3)
+IMAGE_BYTES = int(np.prod(IMAGE_SHAPE))
+
+# Decode timings of this worker (inference is timed in the model server)
+stage_timer = StageTimer(histogram=metrics.STAGE_SECONDS)
+
+
+class ModelServerError(RuntimeError):
+    """The model server received a job but failed to run it"""
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with this process's resource
+        # tracker, which would unlink the worker's buffer when the server exits
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def server_alive(address: str = MODEL_SERVER_ADDRESS) -> bool:
+    """Whether a model server is accepting connections at address"""
+    try:
+        Client(address, family='AF_UNIX').close()
+        return True
+    except OSError:
+        return False
+
+
+class ModelServer:
+    """Own the model and answer classification jobs from web workers, one thread per connection"""
+
+    def __init__(self, address: str = MODEL_SERVER_ADDRESS):
+        self.address = address
+        self.classifier = None
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.open_connections = 0
+        self.jobs = 0
+        self.images = 0
+
+    def serve_forever(self):
+        # Imported here so web workers, which only use the client functions, never load TensorFlow
+        from Backend import image_classification
+        self.classifier = image_classification
+
+        if os.path.exists(self.address):
+            if server_alive(self.address):
+                raise RuntimeError(f"A model server is already listening on {self.address}")
+            os.unlink(self.address)
+        # Requests are pickled, so only this user may connect
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family='AF_UNIX')
+        finally:
+            os.umask(umask)
+
+        image_classification.start_model_preload()
+        logger.info("Model server listening on %s", self.address)
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), name='model-server-conn',
+                                 daemon=True).start()
+        finally:
+            listener.close()
+
+    def _serve_connection(self, conn):
+        shm = None
+        with self._lock:
+            self.connections += 1
+            self.open_connections += 1
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    return
+                op = request[0]
+                try:
+                    if op in ('classify', 'classify_batch'):
+                        _, name, filenames, errors = request
+                        # A worker keeps one buffer per connection and only replaces it to grow it
+                        if shm is None or shm.name != name:
+                            if shm is not None:
+                                shm.close()
+                            shm = _attach(name)
+                        result = self._classify(op, shm, filenames, errors)
+                    elif op == 'status':
+                        result = self.status()
+                    else:
+                        raise ValueError(f"Unknown model server request '{op}'")
+                    conn.send(('ok', result))
+                except Exception as e:
+                    logger.exception("Model server request %s failed", op)
+                    conn.send(('error', str(e)))
+        except OSError as e:
+            logger.warning("Model server connection dropped: %s", e)
+        finally:
+            if shm is not None:
+                shm.close()
+            conn.close()
+            with self._lock:
+                self.open_connections -= 1
+
+    def _classify(self, op, shm, filenames, errors):
+        pixels = np.ndarray((len(filenames), *IMAGE_SHAPE), dtype=np.uint8, buffer=shm.buf)
+        # Copy out of the shared buffer (the worker reuses it for its next job) into the model's float32 input
+        batch = pixels.astype(np.float32)
+        del pixels
+        with self._lock:
+            self.jobs += 1
+            self.images += len(filenames)
+        if op == 'classify':
+            # Single uploads go through the micro-batcher, which combines them across workers
+            return self.classifier.classify_array(batch, filenames[0])
+        return self.classifier.classify_decoded(filenames, batch, errors)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'address': self.address,
+                'pid': os.getpid(),
+                'connections': self.connections,
+                'open_connections': self.open_connections,
+                'jobs': self.jobs,
+                'images': self.images,
+            }
+
+    def status(self) -> dict:
+        return {**self.classifier.model_status(), 'server': self.stats()}
+
+
+def spawn_model_server(timeout: float = 120.0) -> subprocess.Popen:
+    """Start ``python -m Backend.model_server`` and wait until it accepts connections"""
+    proc = subprocess.Popen([sys.executable, '-m', 'Backend.model_server'], cwd=ROOT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Model server exited with code {proc.returncode}")
+        if server_alive(MODEL_SERVER_ADDRESS):
+            return proc
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"Model server did not listen on {MODEL_SERVER_ADDRESS} within {timeout}s")
+
+
+# Web worker side
+
+class _Channel:
+    """A connection to the model server and the shared-memory buffer its images are passed in"""
+
+    def __init__(self, address: str):
+        self.conn = Client(address, family='AF_UNIX')
+        self.shm = None
+
+    def _images(self, count: int) -> np.ndarray:
+        if self.shm is None or self.shm.size < count * IMAGE_BYTES:
+            self._free()
+            self.shm = shared_memory.SharedMemory(create=True, size=count * IMAGE_BYTES)
+        return np.ndarray((count, *IMAGE_SHAPE), dtype=np.uint8, buffer=self.shm.buf)
+
+    def call(self, *request, timeout: float = MODEL_SERVER_TIMEOUT):
+        self.conn.send(request)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"No reply from the model server within {timeout}s")
+        status, result = self.conn.recv()
+        if status != 'ok':
+            raise ModelServerError(result)
+        return result
+
+    def classify(self, op: str, pixels: np.ndarray, filenames, errors):
+        """Copy (N, H, W, 3) pixels into the shared buffer and run op on them in the model server"""
+        self._images(len(pixels))[...] = pixels
+        return self.call(op, self.shm.name, list(filenames), list(errors))
+
+    def _free(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.conn.close()
+        self._free()
+
+
+_channels: "queue.LifoQueue" = queue.LifoQueue()
+_channels_pid = os.getpid()
+
+
+@contextmanager
+def _channel():
+    """Borrow an idle channel (one per concurrent request), connecting a new one if none is idle"""
+    global _channels, _channels_pid
+    if _channels_pid != os.getpid():
+        # Connections made before a fork belong to the parent
+        _channels, _channels_pid = queue.LifoQueue(), os.getpid()
+    try:
+        channel = _channels.get_nowait()
+    except queue.Empty:
+        channel = _Channel(MODEL_SERVER_ADDRESS)
+    try:
+        yield channel
+    except ModelServerError:
+        _channels.put(channel)
+        raise
+    except BaseException:
+        # The reply may still arrive; a channel out of step with the server cannot be reused
+        channel.close()
+        raise
+    else:
+        _channels.put(channel)
+
+
+@atexit.register
+def _close_channels():
+    # Unlink idle channels' shared buffers rather than leaving them to the resource tracker
+    if _channels_pid != os.getpid():
+        return
+    while True:
+        try:
+            _channels.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+def _server_unavailable(error):
+    metrics.ERRORS.inc(source='model_server')
+    logger.warning("Model server at %s unavailable, using fallback classifier: %r", MODEL_SERVER_ADDRESS, error)
+
+
+def classify_image(image_path, filename=None):
+    """classify_image for web workers: decode here and run the model in the model server"""
+    if filename is None:
+        filename = image_path if isinstance(image_path, (str, os.PathLike)) else getattr(image_path, 'filename', None) or ''
+
+    try:
+        started = time.perf_counter()
+        pixels = decode_image(image_path)
+        stage_timer.record('decode', (time.perf_counter() - started) * 1000.0)
+    except ImageTooLargeError:
+        raise
+    except Exception:
+        logger.exception("Decoding %s failed", filename)
+        return "Error", 0.0, 'error'
+
+    try:
+        with _channel() as channel:
+            label, confidence, method = channel.classify('classify', pixels[np.newaxis], [filename], [None])
+        return label, confidence, method
+    except ModelServerError as e:
+        logger.error("Prediction for %s failed in the model server: %s", filename, e)
+        return "Error", 0.0, 'error'
+    except (OSError, EOFError) as e:
+        _server_unavailable(e)
+        return fallback_classify(filename)
+
+
+def classify_images(items, batch_size=BULK_BATCH_SIZE):
+    """classify_images for web workers: batches are decoded here and classified in the model server"""
+    pipeline = PreprocessPipeline(decode_image, batch_size, timer=stage_timer)
+    for filenames, batch, errors in pipeline.run(items):
+        for i, error in enumerate(errors):
+            if error is not None:
+                # Rows that failed to decode hold stale buffer contents
+                batch[i] = 0
+        try:
+            with _channel() as channel:
+                results = channel.classify('classify_batch', batch, filenames, errors)
+        except ModelServerError as e:
+            logger.error("Batch prediction failed in the model server for %d image(s): %s", len(filenames), e)
+            results = [{'filename': name, 'label': 'Error', 'confidence': 0.0, 'method': 'error', 'error': str(e)}
+                       for name in filenames]
+        except (OSError, EOFError) as e:
+            _server_unavailable(e)
+            results = []
+            for name, error in zip(filenames, errors):
+                if error is not None:
+                    results.append({'filename': name, 'label': 'Error', 'confidence': 0.0, 'method': 'error',
+                                    'error': error})
+                    continue
+                label, confidence, method = fallback_classify(name)
+                results.append({'filename': name, 'label': label, 'confidence': confidence, 'method': method})
+        yield results
+
+
+def model_status():
+    """The model server's model_status(), or state 'unavailable' if it cannot be reached"""
+    try:
+        with _channel() as channel:
+            status = channel.call('status', timeout=MODEL_SERVER_STATUS_TIMEOUT)
+    except (OSError, EOFError, ModelServerError) as e:
+        status = {
+            'state': 'unavailable',
+            'ready': False,
+            'error': f"Model server at {MODEL_SERVER_ADDRESS} unavailable: {e!r}",
+            'class_count': len(CLASS_NAMES),
+            'classes': CLASS_NAMES,
+        }
+    status['inference_mode'] = 'server'
+    status['worker_timing'] = stage_timer.stats()
+    return status
+
+
+def model_state():
+    """Return the model server's model state, or 'unavailable'"""
+    return model_status()['state']
+
+
+def start_model_preload():
+    """The model server loads and warms up the model itself; nothing to do in a web worker"""
+    return None
+
+
+def main():
+    from Backend.logging_setup import configure_logging
+
+    configure_logging()
+    # Let SIGTERM from gunicorn or a process manager close the listener and remove the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        ModelServer().serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
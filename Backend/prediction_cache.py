@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_key(img_array) -> str:
+    """Hash the decoded, resized pixels so re-encoded copies of an image share a key"""
+    data = np.ascontiguousarray(img_array)
+    return hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+
+
+def perceptual_hash(img_array) -> int:
+    """64-bit difference hash (dHash) of a (1, H, W, 3) or (H, W, 3) image array"""
+    from PIL import Image
+
+    pixels = np.asarray(img_array)
+    if pixels.ndim == 4:
+        pixels = pixels[0]
+    gray = Image.fromarray(pixels.astype(np.uint8)).convert('L').resize((9, 8))
+    values = np.asarray(gray, dtype=np.int16)
+    bits = (values[:, 1:] > values[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def model_fingerprint(model_path: str, variant: str = '') -> str:
+    """Identify a model file by path, size and modification time, plus the backend variant serving it"""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return 'missing'
+    raw = f"{os.path.abspath(model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{variant}"
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+class PredictionCache:
+    """Two-tier cache of classification results keyed by image content.
+
+    The memory tier is an LRU bounded by ``max_entries``; the optional disk
+    tier is a SQLite file that survives restarts. Every entry is tagged with
+    the fingerprint of the model that produced it, so swapping the model file
+    invalidates both tiers.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, db_path: str = None,
+                 max_disk_entries: int = 100000, phash_distance: int = 0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.db_path = db_path
+        self.max_disk_entries = int(max_disk_entries)
+        self.phash_distance = int(phash_distance)
+        self.fingerprint = None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, label TEXT NOT NULL,"
+            " confidence REAL NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created)")
+        self._db.commit()
+
+    def set_model_fingerprint(self, fingerprint: str):
+        """Bind the cache to a model; entries from any other model are dropped"""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            if self.fingerprint is not None:
+                self.invalidations += 1
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions WHERE fingerprint != ?", (fingerprint,))
+                self._db.commit()
+
+    def invalidate(self):
+        """Drop every cached prediction"""
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def get(self, key: str, phash: int = None):
+        """Return a cached (label, confidence) or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry[2], now):
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], entry[1]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT label, confidence, created FROM predictions WHERE key = ? AND fingerprint = ?",
+                    (key, self.fingerprint),
+                ).fetchone()
+                if row is not None and not self._expired(row[2], now):
+                    self._store(key, row[0], row[1], row[2], phash)
+                    self.disk_hits += 1
+                    return row[0], row[1]
+
+            if phash is not None and self.phash_distance > 0:
+                for entry in reversed(self._entries.values()):
+                    if entry[3] is not None and bin(entry[3] ^ phash).count('1') <= self.phash_distance \
+                            and not self._expired(entry[2], now):
+                        self.near_duplicate_hits += 1
+                        return entry[0], entry[1]
+
+            self.misses += 1
+            return None
+
+    def _store(self, key, label, confidence, created, phash):
+        self._entries[key] = (label, confidence, created, phash)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, label: str, confidence: float, phash: int = None):
+        """Store a prediction in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._store(key, label, confidence, now, phash)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, fingerprint, label, confidence, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, self.fingerprint, label, float(confidence), now),
+                )
+                self._disk_writes += 1
+                # Periodically trim the disk tier by age and size
+                if self._disk_writes % 100 == 0:
+                    self._trim_disk(now)
+                self._db.commit()
+
+    def _trim_disk(self, now):
+        if self.ttl_seconds > 0:
+            cursor = self._db.execute("DELETE FROM predictions WHERE created < ?", (now - self.ttl_seconds,))
+            self.expirations += cursor.rowcount
+        cursor = self._db.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            " SELECT key FROM predictions ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self.evictions += cursor.rowcount
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.near_duplicate_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_enabled': self._db is not None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'near_duplicate_hits': self.near_duplicate_hits,
+                'misses': self.misses,
+                'hit_rate': round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_fingerprint': self.fingerprint,
+            }
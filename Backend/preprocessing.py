@@ -0,0 +1,239 @@
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Upload limits enforced before any pixel data is decoded
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(64_000_000)))
+# 'full' decodes at native resolution, as in training; 'draft' lets JPEG decode at a reduced scale close
+# to the target size (see benchmarks/decode_benchmark.py for its effect on predictions)
+DECODE_MODE = os.getenv("IMAGE_DECODE_MODE", "full")
+
+# PIL warns above this and raises DecompressionBombError above twice this
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Decode workers for bulk classification; PIL releases the GIL while decoding and resizing
+DECODE_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Number of decoded batches allowed to queue up ahead of inference
+PIPELINE_DEPTH = int(os.getenv("PREPROCESS_PIPELINE_DEPTH", "2"))
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured byte or pixel limits"""
+
+
+def _source_size(source):
+    """Return the size in bytes of a path, buffer or seekable stream, or None if unknown"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    stream = getattr(source, 'stream', source)
+    if hasattr(stream, 'seek') and hasattr(stream, 'tell'):
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        return size
+    return None
+
+
+def check_image_limits(img, nbytes=None):
+    """Reject images whose encoded size or pixel count exceeds the configured limits"""
+    if nbytes is not None and nbytes > MAX_UPLOAD_BYTES:
+        raise ImageTooLargeError(f"Image is {nbytes} bytes; the limit is {MAX_UPLOAD_BYTES} bytes")
+    if img is not None:
+        width, height = img.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageTooLargeError(
+                f"Image is {width}x{height} ({width * height} pixels); the limit is {MAX_IMAGE_PIXELS} pixels"
+            )
+
+
+def open_image(source):
+    """Open an image from a path, raw bytes or a file-like object (e.g. a werkzeug FileStorage).
+
+    Only the header is read here; byte and pixel limits are checked before
+    any pixel data is decoded.
+    """
+    check_image_limits(None, _source_size(source))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        stream = io.BytesIO(source)
+    else:
+        # FileStorage proxies its underlying stream; read from that directly
+        stream = getattr(source, 'stream', source)
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+    try:
+        img = Image.open(stream)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    check_image_limits(img)
+    return img
+
+
+def load_resized_image(source, target_size=(224, 224)):
+    """Open an image, convert it to RGB and resize it to the model input size"""
+    img = open_image(source)
+
+    if DECODE_MODE == 'draft' and img.format == 'JPEG':
+        # Let the decoder downscale by 1/2, 1/4 or 1/8 while staying >= target_size
+        img.draft('RGB', target_size)
+
+    # Convert to RGB if necessary
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Resize to target size
+    return img.resize(target_size)
+
+
+def decode_image(source, target_size=(224, 224)):
+    """Decode and resize an image into a uint8 array of shape (H, W, 3)"""
+    return np.asarray(load_resized_image(source, target_size))
+
+
+class StageTimer:
+    """Thread-safe running totals of how long each pipeline stage takes.
+
+    If a histogram is given, every call is also observed on it (in seconds)
+    under a ``stage`` label.
+    """
+
+    def __init__(self, histogram=None):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.histogram = histogram
+
+    def record(self, stage: str, elapsed_ms: float, items: int = 1):
+        if self.histogram is not None:
+            self.histogram.observe(elapsed_ms / 1000.0, stage=stage)
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'calls': 0, 'items': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['calls'] += 1
+            entry['items'] += items
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                stage: {
+                    'calls': entry['calls'],
+                    'items': entry['items'],
+                    'total_ms': round(entry['total_ms'], 3),
+                    'avg_ms': round(entry['total_ms'] / entry['calls'], 3),
+                    'avg_ms_per_item': round(entry['total_ms'] / entry['items'], 3) if entry['items'] else 0.0,
+                    'max_ms': round(entry['max_ms'], 3),
+                }
+                for stage, entry in self._stages.items()
+            }
+
+
+class BatchBufferPool:
+    """A fixed set of preallocated float32 batch buffers that are reused across batches"""
+
+    def __init__(self, batch_size: int, target_size=(224, 224), count: int = 3):
+        self.batch_size = batch_size
+        self._free: "queue.Queue" = queue.Queue()
+        for _ in range(count):
+            self._free.put(np.empty((batch_size, target_size[1], target_size[0], 3), dtype=np.float32))
+
+    def acquire(self) -> np.ndarray:
+        return self._free.get()
+
+    def release(self, buffer: np.ndarray):
+        self._free.put(buffer)
+
+
+class PreprocessPipeline:
+    """Producer/consumer pipeline that decodes the next batch while the current one is in inference.
+
+    A producer thread pulls ``(filename, source)`` items, decodes them on a
+    thread pool straight into a reusable batch buffer and queues the filled
+    buffer. The caller iterates over ``run()`` and runs inference on each
+    buffer while the producer is already filling the next one.
+    """
+
+    def __init__(self, decode_fn, batch_size: int, target_size=(224, 224), workers: int = DECODE_WORKERS,
+                 depth: int = PIPELINE_DEPTH, timer: StageTimer = None):
+        self.decode_fn = decode_fn
+        self.batch_size = batch_size
+        self.target_size = target_size
+        self.workers = max(1, workers)
+        self.depth = max(1, depth)
+        self.timer = timer or StageTimer()
+        # One buffer per queued batch, plus one being filled and one in inference
+        self.buffers = BatchBufferPool(batch_size, target_size, count=self.depth + 2)
+
+    def _decode_one(self, source, out):
+        # Items rejected before decoding carry their error in place of the source
+        if isinstance(source, Exception):
+            return str(source)
+        try:
+            out[...] = self.decode_fn(source, self.target_size)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def _produce(self, items, ready, executor, stop):
+        chunk = []
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                chunk.append(item)
+                if len(chunk) == self.batch_size:
+                    ready.put(self._fill(chunk, executor))
+                    chunk = []
+            if chunk and not stop.is_set():
+                ready.put(self._fill(chunk, executor))
+        except Exception as e:
+            ready.put(e)
+        finally:
+            ready.put(None)
+
+    def _fill(self, chunk, executor):
+        buffer = self.buffers.acquire()
+        started = time.perf_counter()
+        futures = [executor.submit(self._decode_one, source, buffer[i]) for i, (_, source) in enumerate(chunk)]
+        errors = [f.result() for f in futures]
+        self.timer.record('decode_batch', (time.perf_counter() - started) * 1000.0, len(chunk))
+        return [name for name, _ in chunk], buffer, errors
+
+    def run(self, items):
+        """Yield ``(filenames, batch, errors)`` per batch; ``batch`` is only valid until the next iteration"""
+        ready: "queue.Queue" = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='decode') as executor:
+            producer = threading.Thread(
+                target=self._produce, args=(items, ready, executor, stop), name='preprocess-producer', daemon=True
+            )
+            producer.start()
+            try:
+                while True:
+                    entry = ready.get()
+                    if entry is None:
+                        break
+                    if isinstance(entry, Exception):
+                        raise entry
+                    filenames, buffer, errors = entry
+                    try:
+                        yield filenames, buffer[:len(filenames)], errors
+                    finally:
+                        self.buffers.release(buffer)
+            finally:
+                stop.set()
+                # Drain so a producer blocked on a full queue can finish
+                while producer.is_alive():
+                    try:
+                        entry = ready.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if isinstance(entry, tuple):
+                        self.buffers.release(entry[1])
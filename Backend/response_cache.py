@@ -0,0 +1,287 @@
+"""Cache of chatbot answers keyed by the normalized question.
+
+Questions are lowercased, stripped of punctuation and whitespace-collapsed,
+so "What are the common small fishes in Bangladesh?" and "what are the
+common small fishes in bangladesh" share an entry. A follow-up that leans on
+the conversation ("how is it cooked?", "আর এটা?") is keyed together with a
+fingerprint of the preceding exchange, or bypasses the cache entirely when
+context_turns is 0. Concurrent misses for the same key share one upstream
+call.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional
+
+PUNCTUATION_RE = re.compile(r"[?!.,;:'\"()\[\]{}\-–—।“”‘’/\\*]")
+# Questions longer than this are almost never repeated verbatim
+MAX_QUESTION_CHARS = 300
+
+# Words that make a question refer back to the conversation
+CONTEXT_WORDS = frozenset("""
+it its this that these those they them their he she his her
+one ones same above previous earlier else another other more also again
+এটা এটি এটার এর ওটা ওটি ওর সেটা সেটি সেই তার তাদের এগুলো ওগুলো ওই আরও আরো আবার
+""".split())
+# Openers of elliptical follow-ups ("and mola?", "what about tengra?")
+CONTEXT_OPENERS = ('and ', 'what about ', 'how about ', 'then ', 'so ', 'আর ', 'তাহলে ')
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ' '.join(PUNCTUATION_RE.sub(' ', text).split())
+
+
+def is_context_dependent(normalized: str) -> bool:
+    """Whether a normalized question refers to earlier turns of the conversation"""
+    words = normalized.split()
+    if len(words) <= 2:
+        return True
+    return normalized.startswith(CONTEXT_OPENERS) or any(word in CONTEXT_WORDS for word in words)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def response_cache_key(question: str, history: List[Dict], namespace: str = '', context_turns: int = 1) -> Optional[str]:
+    """Cache key for a question asked after the given history, or None to bypass the cache.
+
+    history is the conversation before the question. namespace should identify
+    the model and system prompt, so changing either misses the old entries.
+    """
+    normalized = normalize_question(question)
+    if not normalized or len(normalized) > MAX_QUESTION_CHARS:
+        return None
+    context = ''
+    recent = [msg for msg in history if msg['role'] != 'system']
+    if recent and is_context_dependent(normalized):
+        if context_turns <= 0:
+            return None
+        context = _digest(*(f"{msg['role']}:{normalize_question(msg['content'])}"
+                            for msg in recent[-2 * context_turns:]))
+    return _digest(namespace, context, normalized)
+
+
+class ResponseCache:
+    """Two-tier cache of chatbot answers with in-flight coalescing.
+
+    The memory tier is an LRU bounded by ``max_entries``; the optional disk
+    tier is a SQLite file that survives restarts. Entries expire after
+    ``ttl_seconds`` in both tiers.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 86400, db_path: str = None,
+                 max_disk_entries: int = 10000):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.db_path = db_path
+        self.max_disk_entries = int(max_disk_entries)
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Keys being computed, so concurrent identical questions wait for one upstream call
+        self._pending: Dict[str, Future] = {}
+        self._db = None
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._db.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def _lookup(self, key: str, now: float) -> Optional[str]:
+        """Return a cached response or None (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._expired(entry[1], now):
+                del self._entries[key]
+                self.expirations += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self._db is not None:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and not self._expired(row[1], now):
+                self._store(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+        return None
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """Return a cached response or None. A key of None bypasses the cache."""
+        with self._lock:
+            if key is None:
+                self.bypassed += 1
+                return None
+            response = self._lookup(key, time.time())
+            if response is None:
+                self.misses += 1
+            return response
+
+    def _store(self, key, response, created):
+        self._entries[key] = (response, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key: str, response: str):
+        """Store a response in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._store(key, response, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                    (key, response, now),
+                )
+                self._disk_writes += 1
+                # Periodically trim the disk tier by age and size
+                if self._disk_writes % 100 == 0:
+                    self._trim_disk(now)
+                self._db.commit()
+
+    def _trim_disk(self, now):
+        if self.ttl_seconds > 0:
+            cursor = self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self.expirations += cursor.rowcount
+        cursor = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self.evictions += cursor.rowcount
+
+    def _claim(self, key: str):
+        """Return (cached response, None, False), or a Future and whether the caller must compute it"""
+        with self._lock:
+            response = self._lookup(key, time.time())
+            if response is not None:
+                return response, None, False
+            future = self._pending.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            future = self._pending[key] = Future()
+            self.misses += 1
+            return None, future, True
+
+    def _settle(self, key: str, future: Future, response: str = None, error: BaseException = None):
+        """Publish the leader's result to the waiters, caching it unless computing failed"""
+        if error is None:
+            self.put(key, response)
+        with self._lock:
+            del self._pending[key]
+        if error is None:
+            future.set_result(response)
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, key: Optional[str], compute: Callable[[], str]) -> str:
+        """Return the cached response for key, or compute, cache and return it.
+
+        If another thread is already computing the same key, wait for its
+        result instead of calling compute. Exceptions from compute are raised
+        to every waiter and nothing is cached. A key of None bypasses the cache.
+        """
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return compute()
+
+        response, future, leader = self._claim(key)
+        if future is None:
+            return response
+        if not leader:
+            return future.result()
+
+        try:
+            response = compute()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, response)
+        return response
+
+    async def get_or_compute_async(self, key: Optional[str], compute: Callable[[], Awaitable[str]]) -> str:
+        """get_or_compute for a coroutine function; waiters await instead of blocking the event loop.
+
+        Coalescing is shared with get_or_compute, so async and threaded callers
+        wait on the same upstream call.
+        """
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return await compute()
+
+        response, future, leader = self._claim(key)
+        if future is None:
+            return response
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            response = await compute()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, response)
+        return response
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_enabled': self._db is not None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'in_flight': len(self._pending),
+            }
@@ -0,0 +1,225 @@
+"""Serve Frontend/ from a manifest built in memory at start-up.
+
+Every file is read once, hashed, and compressed with gzip (and brotli when
+the ``brotli`` package is installed) if that makes it meaningfully smaller.
+References from pages and scripts to other assets (``src="chatbot.js"``,
+``fetch('header.html')``, images and ``srcset`` candidates) are rewritten
+to content-hashed URLs (``chatbot.js?v=<hash>``). Those URLs never change
+meaning, so they are served as immutable for a year. Pages and unversioned URLs are served with
+``no-cache`` and a strong ETag, so a browser revalidates them and gets a
+304 that is answered from the manifest without touching disk.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import unquote
+
+from flask import Response
+from werkzeug.utils import get_content_type
+
+from Backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cache-Control for URLs whose ?v= matches the file's current hash
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Everything else may be stored but must be revalidated (a cheap 304) before reuse
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+# Smaller files are not worth compressing
+MIN_COMPRESS_BYTES = 256
+# Keep a compressed variant only if it saves at least this fraction
+MIN_COMPRESS_SAVING = 0.1
+# Content codings in order of preference
+ENCODINGS = ('br', 'gzip')
+
+# Local references in src/href attributes and fetch() calls; URLs with a scheme or template are left alone
+REFERENCE_RE = re.compile(
+    r'''(?P<prefix>\b(?P<attr>src|href)=["']|\bfetch\(\s*["'])(?P<url>[^"'?#:${}\s]+)(?P<query>\?[^"'#${}\s]*)?(?=["'])'''
+)
+# srcset lists "url descriptor" candidates separated by commas
+SRCSET_RE = re.compile(r'''(?P<prefix>\bsrcset=["'])(?P<candidates>[^"']*)(?=["'])''')
+SRCSET_CANDIDATE_RE = re.compile(r'(?P<url>[^\s,?#:]+)(?P<query>\?[^\s,#]*)?(?P<descriptor>\s+[^,]*)?')
+REWRITE_TYPES = ('text/html', 'application/javascript', 'text/javascript', 'text/css')
+
+STATIC_BYTES = metrics.counter(
+    'fishai_static_bytes_total',
+    'Static asset body bytes sent, by content coding',
+    labelnames=('encoding',),
+)
+
+
+def content_version(body: bytes) -> str:
+    """The ?v= value of a file: a short hash of its content"""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _load_brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+_brotli = _load_brotli()
+
+
+class Asset:
+    """One file of the manifest with its precompressed variants"""
+
+    def __init__(self, path: str, filename: str, mtime_ns: int, body: bytes):
+        self.path = path
+        self.filename = filename
+        self.mtime_ns = mtime_ns
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.set_body(body)
+
+    def set_body(self, body: bytes):
+        self.body = body
+        self.version = content_version(body)
+        self.variants: Dict[str, bytes] = {}
+        if len(body) < MIN_COMPRESS_BYTES or not self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            return
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if _brotli is not None:
+            compressed['br'] = _brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            if len(data) <= len(body) * (1 - MIN_COMPRESS_SAVING):
+                self.variants[encoding] = data
+
+    def etag(self, encoding: str = None) -> str:
+        # Each content coding is a different representation and needs its own strong ETag
+        return f"{self.version}-{encoding}" if encoding else self.version
+
+    def select(self, accept_encodings) -> Optional[str]:
+        """The content coding to send for a request's Accept-Encoding, or None for identity"""
+        for encoding in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+
+class StaticAssets:
+    """In-memory manifest of a static directory, rebuilt when a file changes if watch is set"""
+
+    def __init__(self, root: str, blocked=(), watch: bool = False):
+        self.root = os.path.abspath(root)
+        self.blocked = set(blocked)
+        self.watch = watch
+        self.assets: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+        self.build()
+
+    def _scan(self) -> Dict[str, Asset]:
+        assets = {}
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+            for name in filenames:
+                if name.startswith('.') or name.endswith(('.py', '.pyc')):
+                    continue
+                filename = os.path.join(directory, name)
+                path = os.path.relpath(filename, self.root).replace(os.sep, '/')
+                if path in self.blocked:
+                    continue
+                with open(filename, 'rb') as f:
+                    body = f.read()
+                assets[path] = Asset(path, filename, os.stat(filename).st_mtime_ns, body)
+        return assets
+
+    def _rewrite(self, asset: Asset, raw: bytes, assets: Dict[str, Asset]) -> bytes:
+        base = posixpath.dirname(asset.path)
+
+        def versioned(url, query, navigation=False):
+            target = unquote(url.lstrip('/') if url.startswith('/') else posixpath.normpath(posixpath.join(base, url)))
+            referenced = assets.get(target)
+            # Links to other pages are navigation; only embedded resources get versioned URLs
+            if referenced is None or (navigation and referenced.mimetype == 'text/html'):
+                return None
+            return f"{url}{query}&v={referenced.version}" if query else f"{url}?v={referenced.version}"
+
+        def reference(match):
+            url = versioned(match.group('url'), match.group('query'), navigation=match.group('attr') == 'href')
+            return match.group(0) if url is None else match.group('prefix') + url
+
+        def candidate(match):
+            url = versioned(match.group('url'), match.group('query'))
+            return match.group(0) if url is None else url + (match.group('descriptor') or '')
+
+        def srcset(match):
+            return match.group('prefix') + SRCSET_CANDIDATE_RE.sub(candidate, match.group('candidates'))
+
+        text = REFERENCE_RE.sub(reference, raw.decode('utf-8'))
+        return SRCSET_RE.sub(srcset, text).encode('utf-8')
+
+    def build(self):
+        """Read, hash, compress and rewrite every file under root"""
+        started = time.perf_counter()
+        assets = self._scan()
+        raw = {path: asset.body for path, asset in assets.items() if asset.mimetype in REWRITE_TYPES}
+        # A rewritten file's hash changes its referrers' URLs; repeat until no hash moves
+        for _ in range(len(raw) + 1):
+            changed = False
+            for path, body in raw.items():
+                rewritten = self._rewrite(assets[path], body, assets)
+                if rewritten != assets[path].body:
+                    assets[path].set_body(rewritten)
+                    changed = True
+            if not changed:
+                break
+        with self._lock:
+            self.assets = assets
+        logger.info(
+            "Static manifest built: %d files, %.1f KB (%.1f KB compressible -> %.1f KB gzip, %s br) in %.2fs",
+            len(assets), sum(len(a.body) for a in assets.values()) / 1024,
+            sum(len(a.body) for a in assets.values() if a.variants) / 1024,
+            sum(len(a.variants.get('gzip', a.body)) for a in assets.values() if a.variants) / 1024,
+            f"{sum(len(a.variants.get('br', a.body)) for a in assets.values() if a.variants) / 1024:.1f} KB"
+            if _brotli is not None else 'no', time.perf_counter() - started,
+        )
+
+    def _changed(self, path: str, asset: Optional[Asset]) -> bool:
+        filename = os.path.join(self.root, *path.split('/'))
+        try:
+            return asset is None or os.stat(filename).st_mtime_ns != asset.mtime_ns
+        except OSError:
+            return asset is not None
+
+    def get(self, path: str) -> Optional[Asset]:
+        asset = self.assets.get(path)
+        if self.watch and path not in self.blocked and self._changed(path, asset):
+            if asset is not None or os.path.isfile(os.path.join(self.root, *path.split('/'))):
+                self.build()
+                asset = self.assets.get(path)
+        return asset
+
+    def response(self, path: str, request) -> Optional[Response]:
+        """Serve path for a Flask request, or return None if it is not in the manifest"""
+        asset = self.get(path)
+        if asset is None:
+            return None
+        encoding = asset.select(request.accept_encodings)
+        etag = asset.etag(encoding)
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if request.args.get('v') == asset.version
+            else REVALIDATE_CACHE_CONTROL,
+        }
+        if asset.variants:
+            headers['Vary'] = 'Accept-Encoding'
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers=headers)
+
+        body = asset.variants[encoding] if encoding else asset.body
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        STATIC_BYTES.inc(len(body), encoding=encoding or 'identity')
+        return Response(body, content_type=get_content_type(asset.mimetype, 'utf-8'), headers=headers)
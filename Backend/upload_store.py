@@ -0,0 +1,308 @@
+"""Content-addressed storage for uploaded images.
+
+Each upload is stored once under the SHA-256 of its bytes
+(``<UPLOAD_DIR>/blobs/<first two hex digits>/<hash><ext>``), so the same
+photo uploaded again, by any session, costs an index row and no disk.
+Callers hand the bytes to ``put`` and return immediately; hashing and
+writing happen on a writer thread. A SQLite index in WAL mode, shared by
+all worker processes, maps sessions to the blobs they uploaded.
+
+A sweeper thread removes blobs not uploaded again within
+``UPLOAD_MAX_AGE_DAYS`` and then the least recently uploaded ones until the
+store is under ``UPLOAD_MAX_BYTES``. Files saved by earlier versions
+directly in ``UPLOAD_DIR`` are left alone.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from Backend import metrics
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_DB = os.getenv("UPLOAD_DB") or os.path.join(UPLOAD_DIR, "index.sqlite3")
+# Retention limits enforced by the sweeper; 0 disables a limit
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_MAX_AGE_DAYS = float(os.getenv("UPLOAD_MAX_AGE_DAYS", "30"))
+UPLOAD_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SWEEP_INTERVAL", "600"))
+
+_EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,5}$')
+
+UPLOADS = metrics.counter(
+    'fishai_uploads_total',
+    'Uploads saved, by whether the content was new or already stored',
+    labelnames=('result',),
+)
+EVICTIONS = metrics.counter(
+    'fishai_upload_evictions_total',
+    'Stored uploads removed by the sweeper, by limit (age or size)',
+    labelnames=('reason',),
+)
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or '')[1].lower()
+    return ext if _EXTENSION_RE.match(ext) else ''
+
+
+class UploadStore:
+    """Deduplicating upload store with a background writer and sweeper"""
+
+    def __init__(self, directory: str = UPLOAD_DIR, db_path: str = UPLOAD_DB, max_bytes: int = UPLOAD_MAX_BYTES,
+                 max_age_days: float = UPLOAD_MAX_AGE_DAYS, sweep_interval: float = UPLOAD_SWEEP_INTERVAL,
+                 max_batch: int = 64):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, 'blobs')
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400.0
+        self.sweep_interval = sweep_interval
+        self.max_batch = max(1, max_batch)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        self._write_db = self._connect()
+        with self._write_db:
+            self._write_db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " hash TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL,"
+                " first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._write_db.execute("CREATE INDEX IF NOT EXISTS blobs_last_seen ON blobs (last_seen)")
+            self._write_db.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, hash TEXT NOT NULL,"
+                " filename TEXT, uploaded REAL NOT NULL)"
+            )
+            self._write_db.execute("CREATE INDEX IF NOT EXISTS uploads_session ON uploads (session_id, id)")
+            self._write_db.execute("CREATE INDEX IF NOT EXISTS uploads_hash ON uploads (hash)")
+        self._read_db = self._connect()
+        self._read_lock = threading.Lock()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='upload-writer', daemon=True)
+        self._thread.start()
+        self._sweeper = None
+        if sweep_interval > 0 and (self.max_bytes > 0 or self.max_age > 0):
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='upload-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # Public API
+
+    def put(self, session_id: str, filename: str, data: bytes):
+        """Queue an upload for storage; returns immediately"""
+        self._queue.put(('put', (session_id, filename, data, time.time())))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far has been written"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            self._closed = True
+            self._stop.set()
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def session_uploads(self, session_id: str) -> List[Dict]:
+        """Uploads of a session, oldest first, with the path of each stored blob"""
+        self.flush()
+        with self._read_lock:
+            rows = self._read_db.execute(
+                "SELECT u.hash, u.filename, u.uploaded, b.path, b.size FROM uploads u JOIN blobs b ON b.hash = u.hash"
+                " WHERE u.session_id = ? ORDER BY u.id", (session_id,)
+            ).fetchall()
+        return [
+            {'hash': digest, 'filename': filename, 'uploaded': uploaded,
+             'path': os.path.join(self.directory, path), 'size': size}
+            for digest, filename, uploaded, path, size in rows
+        ]
+
+    def usage(self) -> Dict[str, int]:
+        """Bytes and number of blobs currently stored (across all processes sharing the index)"""
+        with self._read_lock:
+            count, total = self._read_db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {'blobs': count, 'bytes': total}
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            op = self._queue.get()
+            if op is None:
+                return
+            batch = [op]
+            # Drain whatever else is already queued into the same transaction
+            while op[0] != 'flush' and len(batch) < self.max_batch:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._queue.put(None)
+                    break
+                batch.append(op)
+            self._process(batch)
+
+    def _process(self, batch):
+        puts = [payload for kind, payload in batch if kind == 'put']
+        if puts:
+            # Hashing is done here too, off the request thread
+            hashed = [(hashlib.sha256(data).hexdigest(), session_id, filename, data, uploaded)
+                      for session_id, filename, data, uploaded in puts]
+            try:
+                with metrics.stage_timer('file_save'):
+                    self._write(hashed)
+            except Exception:
+                metrics.ERRORS.inc(source='file_save')
+                logger.exception("Saving %d upload(s) failed", len(puts))
+        for kind, payload in batch:
+            if kind == 'flush':
+                payload.set()
+
+    def _write(self, hashed):
+        stored = deduplicated = 0
+        db = self._write_db
+        # IMMEDIATE takes the write lock up front, so a sweeper in another process cannot remove
+        # a blob between checking for it here and recording the new upload
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for digest, session_id, filename, data, uploaded in hashed:
+                row = db.execute("SELECT path FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                if row is not None and os.path.exists(os.path.join(self.directory, row[0])):
+                    db.execute("UPDATE blobs SET last_seen = ? WHERE hash = ?", (uploaded, digest))
+                    deduplicated += 1
+                else:
+                    path = f"blobs/{digest[:2]}/{digest}{_extension(filename)}"
+                    full_path = os.path.join(self.directory, path)
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    tmp = f"{full_path}.tmp"
+                    with open(tmp, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp, full_path)
+                    db.execute(
+                        "INSERT OR REPLACE INTO blobs (hash, path, size, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)",
+                        (digest, path, len(data), uploaded, uploaded),
+                    )
+                    stored += 1
+                db.execute("INSERT INTO uploads (session_id, hash, filename, uploaded) VALUES (?, ?, ?, ?)",
+                           (session_id, digest, filename, uploaded))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        UPLOADS.inc(stored, result='stored')
+        UPLOADS.inc(deduplicated, result='deduplicated')
+
+    # Sweeper
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Sweeping uploads failed")
+
+    def sweep(self, now: float = None) -> Dict[str, int]:
+        """Remove blobs past the age limit, then the least recently uploaded until under the size limit"""
+        now = time.time() if now is None else now
+        db = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        removed = {'age': 0, 'size': 0}
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                victims = []
+                if self.max_age > 0:
+                    victims += [(row, 'age') for row in db.execute(
+                        "SELECT hash, path, size FROM blobs WHERE last_seen < ?", (now - self.max_age,)
+                    ).fetchall()]
+                if self.max_bytes > 0:
+                    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+                    total -= sum(row[2] for row, _ in victims)
+                    aged = {row[0] for row, _ in victims}
+                    if total > self.max_bytes:
+                        for row in db.execute("SELECT hash, path, size FROM blobs ORDER BY last_seen, hash"):
+                            if total <= self.max_bytes:
+                                break
+                            if row[0] not in aged:
+                                victims.append((row, 'size'))
+                                total -= row[2]
+                for (digest, path, _), reason in victims:
+                    db.execute("DELETE FROM uploads WHERE hash = ?", (digest,))
+                    db.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+                    full_path = os.path.join(self.directory, path)
+                    try:
+                        os.remove(full_path)
+                        # Drop the fan-out directory once its last blob is gone
+                        os.rmdir(os.path.dirname(full_path))
+                    except OSError:
+                        pass
+                    removed[reason] += 1
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+        for reason, count in removed.items():
+            if count:
+                EVICTIONS.inc(count, reason=reason)
+        if any(removed.values()):
+            logger.info("Upload sweep removed %d blob(s) past the age limit and %d over the size limit",
+                        removed['age'], removed['size'])
+        return removed
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the process-wide store configured by the UPLOAD_* environment variables"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = UploadStore()
+            # Write out whatever is still queued when the process exits
+            atexit.register(_default_store.close)
+            metrics.gauge('fishai_upload_store_bytes', 'Bytes of uploads stored (deduplicated)',
+                          lambda: _default_store.usage()['bytes'])
+            metrics.gauge('fishai_upload_store_blobs', 'Distinct uploads stored',
+                          lambda: _default_store.usage()['blobs'])
+            metrics.gauge('fishai_upload_queue_depth', 'Uploads waiting to be written',
+                          lambda: _default_store._queue.qsize())
+    return _default_store
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] not in (['stats'], ['sweep']):
+        sys.exit("Usage: python -m Backend.upload_store stats|sweep")
+    store = UploadStore(sweep_interval=0)
+    if sys.argv[1] == 'sweep':
+        removed = store.sweep()
+        print(f"Removed {removed['age']} upload(s) past the age limit and {removed['size']} over the size limit")
+    usage = store.usage()
+    store.close()
+    print(f"{usage['blobs']} upload(s) stored, {usage['bytes'] / 1e6:.1f} MB")
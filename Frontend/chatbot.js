@@ -204,35 +204,10 @@ async function sendChatMessage() {
     const typingIndicator = addTypingIndicator();
 
     try {
-        console.log('[Chatbot] Sending request to /api/chat...');
-        const requestBody = {
-            message: message,
-            session_id: getSessionId()
-        };
-        console.log('[Chatbot] Request body:', requestBody);
-        
-        // Send message to backend API
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(requestBody)
-        });
-
-        console.log('[Chatbot] Response status:', response.status);
-        console.log('[Chatbot] Response ok:', response.ok);
-
-        const data = await response.json();
-        console.log('[Chatbot] Response data:', data);
-
-        // Remove typing indicator
-        typingIndicator.remove();
+        const data = await requestChatReply(message, typingIndicator);
 
         if (data.success) {
             console.log('[Chatbot] Success! AI response:', data.response);
-            // Add AI response
-            addChatMessage(data.response, 'ai');
         } else {
             console.error('[Chatbot] API returned error:', data.error);
             addChatMessage('Sorry, I encountered an error: ' + (data.error || 'Unknown error'), 'ai');
@@ -247,7 +222,86 @@ async function sendChatMessage() {
     }
 }
 
-// Add message to chat
+// Send a message to the chatbot and show the reply as it is generated.
+// Reads server-sent events from /api/chat/stream, falling back to /api/chat
+// if streaming is unavailable. Removes the typing indicator once the reply
+// starts and resolves to {success, response} or {success: false, error}.
+async function requestChatReply(message, typingIndicator) {
+    const requestBody = JSON.stringify({
+        message: message,
+        session_id: getSessionId()
+    });
+    const headers = { 'Content-Type': 'application/json' };
+
+    console.log('[Chatbot] Sending request to /api/chat/stream...');
+    const response = await fetch('/api/chat/stream', { method: 'POST', headers, body: requestBody });
+    console.log('[Chatbot] Response status:', response.status);
+
+    if (!response.body || response.status === 404 || response.status === 405) {
+        console.warn('[Chatbot] Streaming unavailable, using /api/chat');
+        const fallback = await fetch('/api/chat', { method: 'POST', headers, body: requestBody });
+        const data = await fallback.json();
+        typingIndicator.remove();
+        if (data.success) {
+            addChatMessage(data.response, 'ai');
+        }
+        return data;
+    }
+    if (!response.ok) {
+        typingIndicator.remove();
+        return await response.json();
+    }
+
+    const chatMessages = document.getElementById('chatMessages');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let textElement = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+            const payload = JSON.parse(data);
+
+            if (eventName === 'error') {
+                typingIndicator.remove();
+                return { success: false, error: payload.error };
+            }
+            if (eventName === 'done') {
+                text = payload.response;
+            } else {
+                text += payload.delta;
+            }
+            if (!textElement) {
+                typingIndicator.remove();
+                textElement = addChatMessage('', 'ai');
+            }
+            textElement.textContent = text;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        }
+    }
+
+    typingIndicator.remove();
+    return { success: true, response: text };
+}
+
+// Add message to chat; returns the element holding the message text
 function addChatMessage(text, sender) {
     console.log('[Chatbot] Adding message:', sender, '-', text.substring(0, 50) + '...');
     
@@ -264,13 +318,14 @@ function addChatMessage(text, sender) {
             </div>
             <div class="${sender === 'user' ? 'text-right' : ''}">
                 <p class="font-medium ${sender === 'user' ? 'text-blue-100' : 'text-dark'} mb-1">${sender === 'user' ? 'You' : 'FishAI Assistant'}</p>
-                <p class="${sender === 'user' ? 'text-blue-100' : 'text-gray-700'}">${text}</p>
+                <p class="chat-text ${sender === 'user' ? 'text-blue-100' : 'text-gray-700'}">${text}</p>
             </div>
         </div>
     `;
     
     chatMessages.appendChild(messageDiv);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv.querySelector('.chat-text');
 }
 
 // Add typing indicator
@@ -375,24 +430,11 @@ async function sendImageForClassification(file) {
             
             console.log('[Chatbot] Sending classification result to LLM:', classificationMessage);
             
-            // Send classification result to chatbot API
-            const chatResp = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    message: classificationMessage,
-                    session_id: getSessionId()
-                })
-            });
-
-            const chatData = await chatResp.json();
+            // Send classification result to chatbot API, streaming the reply
+            const chatData = await requestChatReply(classificationMessage, addTypingIndicator());
             console.log('[Chatbot] LLM response:', chatData);
 
-            if (chatData.success) {
-                addChatMessage(chatData.response, 'ai');
-            } else {
+            if (!chatData.success) {
                 addChatMessage('Sorry, I encountered an error getting information about this fish.', 'ai');
             }
         } else {
@@ -0,0 +1,317 @@
+"""ASGI entry point: chat on the event loop, everything else on the Flask app.
+
+``POST /api/chat`` and ``POST /api/chat/stream`` are served natively with the
+async Groq client, so a slow upstream holds a coroutine rather than a worker
+thread. Every other route (classification, history, pages, /metrics) runs
+on the unchanged Flask app in a bounded thread pool, keeping CPU-bound
+classification off the event loop. Request and response formats are the
+same as under the WSGI server.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend import metrics
+from Backend.logging_setup import start_request
+from main import BULK_MAX_CONTENT_LENGTH, chat_manager, create_app, parse_chat_request, sse_event
+
+logger = logging.getLogger('asgi_app')
+
+# Threads running Flask routes (classification, history, static files)
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "8"))
+# Serve the chat endpoints on the event loop; 0 sends them through Flask like every other route
+ASGI_ASYNC_CHAT = os.getenv("ASGI_ASYNC_CHAT", "1") != "0"
+
+
+def _json_body(payload) -> bytes:
+    # Same encoding as Flask's jsonify
+    return (json.dumps(payload, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+
+class BodyTooLarge(Exception):
+    """A request body is over the limit it is read with"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Request body is larger than the limit of {limit} bytes")
+        self.limit = limit
+
+
+async def read_body(receive, limit=None, headers=()) -> bytes:
+    """Read a request body, raising BodyTooLarge as soon as it is over ``limit`` bytes"""
+    if limit is not None:
+        for name, value in headers:
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                raise BodyTooLarge(limit)
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise BodyTooLarge(limit)
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def wsgi_environ(scope, body: bytes) -> dict:
+    """Build a WSGI environ for an ASGI HTTP scope whose body has been read"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class AsgiApp:
+    """Route chat requests to async handlers and the rest to a WSGI app in a thread pool"""
+
+    def __init__(self, wsgi_app, chat_manager, wsgi_threads: int = ASGI_WSGI_THREADS, async_chat: bool = ASGI_ASYNC_CHAT):
+        self.wsgi_app = wsgi_app
+        self.chat_manager = chat_manager
+        self.executor = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix='wsgi')
+        # Same limits as the WSGI path: MAX_CONTENT_LENGTH for chat, and nothing larger than
+        # the bulk classification limit is buffered for Flask, which applies its per-route limit
+        self.max_content_length = wsgi_app.config['MAX_CONTENT_LENGTH']
+        self.max_wsgi_body = max(self.max_content_length, BULK_MAX_CONTENT_LENGTH)
+        self.routes = {
+            '/api/chat': self.chat,
+            '/api/chat/stream': self.chat_stream,
+        } if async_chat else {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            handler = self.routes.get(scope['path']) if scope['method'] == 'POST' else None
+            if handler is None:
+                await self.call_wsgi(scope, receive, send)
+            else:
+                await self.call_native(handler, scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def call_wsgi(self, scope, receive, send):
+        """Run the WSGI app in the thread pool, streaming its body back chunk by chunk"""
+        try:
+            body = await read_body(receive, self.max_wsgi_body, scope['headers'])
+        except BodyTooLarge as e:
+            logger.warning("%s rejected: %s", scope['path'], e)
+            await self.send_json(send, {'success': False, 'error': str(e)}, 413)
+            return
+        environ = wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        def begin():
+            result = self.wsgi_app(environ, start_response)
+            iterator = iter(result)
+            return result, iterator, next(iterator, None)
+
+        result, iterator, chunk = await loop.run_in_executor(self.executor, begin)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+
+    async def call_native(self, handler, scope, receive, send):
+        """Run an async handler with the request id and latency bookkeeping of the Flask hooks"""
+        started = time.perf_counter()
+        headers = dict(scope['headers'])
+        request_id = start_request(headers.get(b'x-request-id', b'').decode('latin-1') or None)
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-request-id', request_id.encode('latin-1')),
+                    # flask-cors allows every origin for the Flask routes
+                    (b'access-control-allow-origin', b'*'),
+                ]
+            await send(message)
+
+        try:
+            await handler(scope, receive, send_with_headers)
+        finally:
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint=handler.__name__, method=scope['method'], status=status,
+            )
+
+    async def send_json(self, send, payload, status: int = 200):
+        body = _json_body(payload)
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def acquire_session(self, session_id):
+        """chat_manager.acquire off the event loop; a hold taken after the caller was cancelled is released"""
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.chat_manager.acquire, session_id))
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            def release(future):
+                if not future.cancelled() and future.exception() is None:
+                    self.chat_manager.release(session_id)
+            acquiring.add_done_callback(release)
+            raise
+
+    async def read_message(self, scope, receive):
+        """Return (message, session_id, error, status) from a chat request body, validated like the Flask routes"""
+        try:
+            body = await read_body(receive, self.max_content_length, scope['headers'])
+        except BodyTooLarge as e:
+            return None, None, str(e), 413
+        try:
+            data = json.loads(body or b'null')
+        except ValueError:
+            data = None
+        return parse_chat_request(data) + (400,)
+
+    async def chat(self, scope, receive, send):
+        """POST /api/chat on the async client (same contract as main.chat)"""
+        user_message, session_id, error, status = await self.read_message(scope, receive)
+        if error is not None:
+            logger.warning("/api/chat rejected: %s", error)
+            await self.send_json(send, {'success': False, 'error': error}, status)
+            return
+        logger.debug("/api/chat session=%s message_chars=%d", session_id, len(user_message))
+
+        try:
+            # Creating a session may load its history from the store
+            session = await self.acquire_session(session_id)
+            try:
+                bot_response = await session.get_response_async(user_message)
+            finally:
+                self.chat_manager.release(session_id)
+        except Exception as e:
+            logger.exception("/api/chat failed")
+            metrics.ERRORS.inc(source='chat')
+            await self.send_json(send, {'success': False, 'error': str(e)}, 500)
+            return
+        logger.debug("/api/chat session=%s response_chars=%d", session_id, len(bot_response))
+        await self.send_json(send, {'success': True, 'response': bot_response, 'session_id': session_id})
+
+    async def chat_stream(self, scope, receive, send):
+        """POST /api/chat/stream on the async client (same events as main.chat_stream)"""
+        user_message, session_id, error, status = await self.read_message(scope, receive)
+        if error is not None:
+            logger.warning("/api/chat/stream rejected: %s", error)
+            await self.send_json(send, {'success': False, 'error': error}, status)
+            return
+        logger.debug("/api/chat/stream session=%s message_chars=%d", session_id, len(user_message))
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        async def relay():
+            session = None
+            pieces = None
+            parts = []
+            try:
+                session = await self.acquire_session(session_id)
+                pieces = session.stream_response_async(user_message)
+                async for piece in pieces:
+                    parts.append(piece)
+                    await send({'type': 'http.response.body', 'body': sse_event({'delta': piece}).encode('utf-8'),
+                                'more_body': True})
+                done = {'success': True, 'response': ''.join(parts), 'session_id': session_id}
+                await send({'type': 'http.response.body', 'body': sse_event(done, event='done').encode('utf-8'),
+                            'more_body': True})
+            except Exception as e:
+                logger.exception("/api/chat/stream failed")
+                metrics.ERRORS.inc(source='chat_stream')
+                await send({'type': 'http.response.body',
+                            'body': sse_event({'success': False, 'error': str(e)}, event='error').encode('utf-8'),
+                            'more_body': True})
+            finally:
+                # Closes the upstream stream too when the relay is cancelled by a disconnect
+                if pieces is not None:
+                    await pieces.aclose()
+                if session is not None:
+                    self.chat_manager.release(session_id)
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        relay_task = asyncio.ensure_future(relay())
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({relay_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnect_task.cancel()
+            if not relay_task.done():
+                relay_task.cancel()
+                await asyncio.gather(relay_task, return_exceptions=True)
+                return
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+def create_asgi_app(wsgi_threads: int = ASGI_WSGI_THREADS, async_chat: bool = ASGI_ASYNC_CHAT) -> AsgiApp:
+    """ASGI application serving the Flask app in main.py (for uvicorn --factory)"""
+    return AsgiApp(create_app(), chat_manager, wsgi_threads=wsgi_threads, async_chat=async_chat)
+
+
+app = create_asgi_app()
@@ -0,0 +1,197 @@
+"""Chat concurrency of the ASGI server with a slow Groq upstream.
+
+Starts ``uvicorn asgi:app`` in a subprocess against the local Groq stub
+(``benchmarks/stub_groq.py``) with a long ``--groq-delay-ms``, then drives
+``/api/chat`` from ``--concurrency`` clients while one more client keeps
+classifying images. Each run is done twice on the same server and thread
+pool size:
+
+- ``threaded``: ASGI_ASYNC_CHAT=0, so chat goes through the Flask app in the
+  ``--threads`` pool, as under a threaded WSGI server
+- ``async``: chat runs on the event loop with the async Groq client
+
+Reports chat throughput and latency, and classification latency while the
+chat load runs. Response caching and the FISH_DATA fast path are disabled
+so every chat turn reaches the stub. The stub runs in its own process and
+the load is generated with aiohttp, so neither competes with the client for
+the GIL or caps the request rate. Needs uvicorn and aiohttp
+(``pip install uvicorn 'groq[aiohttp]'``).
+
+Usage:
+    python benchmarks/asgi_benchmark.py [--concurrency 8,64,256] [--requests 512]
+        [--threads 8] [--groq-delay-ms 1000] [--model auto|real|stub] [--output results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, latency_summary, write_results
+from benchmarks.load_test import IMAGE_DIR, build_stand_in_model, free_port, real_model_available, wait_until_ready
+
+MODES = ('threaded', 'async')
+
+
+class Process:
+    """A server on a free local port, running in a subprocess"""
+
+    def __init__(self, args, env: dict = None):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, *args(self.port)],
+            env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def wait_for_port(self, timeout: float = 30.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"Nothing listening on port {self.port} after {timeout}s")
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait(timeout=10)
+
+
+async def drive(url: str, concurrency: int, requests: int, timeout: float, images):
+    import aiohttp
+
+    counter = itertools.count()
+    chat_latencies = []
+    classify_latencies = []
+    errors = 0
+    finished = asyncio.Event()
+
+    connector = aiohttp.TCPConnector(limit=concurrency + 2)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as client:
+        async def chat_worker(worker):
+            nonlocal errors
+            while True:
+                i = next(counter)
+                if i >= requests:
+                    return
+                started = time.perf_counter()
+                try:
+                    async with client.post(f"{url}/api/chat", json={
+                        # Unique questions, so nothing is served from a cache
+                        'message': f"How are small fishes farmed in district {i} of Bangladesh?",
+                        'session_id': f"asgi-bench-{worker}",
+                    }) as response:
+                        ok = response.status == 200 and (await response.json()).get('success')
+                except Exception:
+                    ok = False
+                chat_latencies.append((time.perf_counter() - started) * 1000.0)
+                if not ok:
+                    errors += 1
+
+        async def classify_probe():
+            nonlocal errors
+            for name, data in itertools.cycle(images):
+                if finished.is_set():
+                    return
+                started = time.perf_counter()
+                form = aiohttp.FormData()
+                form.add_field('image', data, filename=name)
+                try:
+                    async with client.post(f"{url}/api/classify", data=form) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except Exception:
+                    ok = False
+                classify_latencies.append((time.perf_counter() - started) * 1000.0)
+                if not ok:
+                    errors += 1
+
+        probe = asyncio.ensure_future(classify_probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(chat_worker(w) for w in range(concurrency)))
+        wall = time.perf_counter() - started
+        finished.set()
+        await probe
+
+    return {
+        'chat': latency_summary(chat_latencies),
+        'chat_rps': round(len(chat_latencies) / wall, 2) if wall else 0.0,
+        'classify': latency_summary(classify_latencies),
+        'classify_requests': len(classify_latencies),
+        'errors': errors,
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='8,64,256', help='comma-separated concurrent chat clients')
+    parser.add_argument('--requests', type=int, default=512, help='chat requests per concurrency level')
+    parser.add_argument('--threads', type=int, default=8, help='ASGI_WSGI_THREADS for the server')
+    parser.add_argument('--groq-delay-ms', type=float, default=1000.0, help='latency of the stub Groq API')
+    parser.add_argument('--model', choices=('auto', 'real', 'stub'), default='auto')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    import httpx
+
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    images = sorted(
+        (name, open(os.path.join(IMAGE_DIR, name), 'rb').read())
+        for name in os.listdir(IMAGE_DIR) if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+
+    stub = Process(lambda port: [os.path.join(ROOT, 'benchmarks', 'stub_groq.py'), '--port', str(port),
+                                 '--delay-ms', str(args.groq_delay_ms)])
+    stub.wait_for_port()
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(os.environ, GROQ_API_KEY='stub-key', GROQ_BASE_URL=stub.url, SAVE_UPLOADS='0',
+               PREDICTION_CACHE='0', RESPONSE_CACHE='0', CHAT_FAST_PATH='0', CHAT_SUMMARY_MODE='extractive',
+               CHAT_HISTORY_DIR=os.path.join(tmp.name, 'chat'), ASGI_WSGI_THREADS=str(args.threads),
+               GROQ_MAX_CONNECTIONS=str(max(levels) + 8), GROQ_MAX_KEEPALIVE=str(max(levels) + 8),
+               LOG_LEVEL='WARNING')
+    use_real = args.model == 'real' or (args.model == 'auto' and real_model_available())
+    model = 'convnextnet_model.h5' if use_real else 'stand-in'
+    if not use_real:
+        env['MODEL_PATH'] = os.path.join(tmp.name, 'stand_in.h5')
+        build_stand_in_model(env['MODEL_PATH'])
+
+    results = []
+    try:
+        for mode in MODES:
+            server = Process(lambda port: ['-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                                           '--log-level', 'warning', '--no-access-log'],
+                             dict(env, ASGI_ASYNC_CHAT='1' if mode == 'async' else '0'))
+            try:
+                with httpx.Client(timeout=args.timeout) as client:
+                    wait_until_ready(client, server.url)
+                for concurrency in levels:
+                    row = asyncio.run(drive(server.url, concurrency, args.requests, args.timeout, images))
+                    row = {'mode': mode, 'concurrency': concurrency, 'threads': args.threads, **row}
+                    results.append(row)
+                    print(f"{mode:>9} c={concurrency:<4} chat p50={row['chat']['p50_ms']:.0f}ms "
+                          f"p95={row['chat']['p95_ms']:.0f}ms {row['chat_rps']:.1f} req/s | "
+                          f"classify p50={row['classify']['p50_ms']:.0f}ms p95={row['classify']['p95_ms']:.0f}ms "
+                          f"(n={row['classify_requests']}) errors={row['errors']}")
+            finally:
+                server.stop()
+    finally:
+        stub.stop()
+        tmp.cleanup()
+
+    if args.output:
+        write_results(args.output, 'asgi_benchmark', results, model=model, groq_delay_ms=args.groq_delay_ms,
+                      requests=args.requests)
+
+
+if __name__ == '__main__':
+    main()
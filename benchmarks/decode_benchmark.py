@@ -0,0 +1,208 @@
+"""Compare full-resolution and draft (reduced-scale) decoding of large JPEG uploads.
+
+Generates synthetic phone-camera sized JPEGs, then decodes each one to the
+224x224 model input in a fresh subprocess per mode so peak RSS is measured
+in isolation.
+
+Then checks that draft decoding does not change predictions: every bundled
+image (``Frontend/images``) is re-encoded as a JPEG, as a phone upload
+would be, decoded in both modes and compared pixel by pixel. When the real
+model is available (not just its Git LFS pointer) both inputs are also
+classified and the top-1 labels and confidences compared; the script exits
+non-zero if top-1 agreement falls below --min-agreement.
+
+Usage:
+    python benchmarks/decode_benchmark.py [--sizes 12,24,48] [--repeat 5] [--images DIR] [--model PATH]
+        [--min-agreement 1.0] [--output results.json]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, peak_rss_mb, write_results
+
+MODES = ('full', 'draft')
+DEFAULT_IMAGES = os.path.join(ROOT, 'Frontend', 'images')
+DEFAULT_MODEL = os.path.join(ROOT, 'Backend', 'model', 'convnextnet_model.h5')
+
+
+def make_jpeg(megapixels: float, path: str):
+    """Write a smooth, photo-like JPEG of roughly the given size"""
+    import numpy as np
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 8, (height, width)).astype(np.float32)
+    r = (x + noise) % 256
+    g = (y + noise) % 256
+    b = ((x + y) / 2 + noise) % 256
+    pixels = np.stack([np.broadcast_to(c, (height, width)) for c in (r, g, b)], axis=-1).astype(np.uint8)
+    Image.fromarray(pixels).save(path, 'JPEG', quality=90)
+    return width, height
+
+
+def run_worker(path: str, repeat: int):
+    """Decode one file `repeat` times with the mode selected by IMAGE_DECODE_MODE"""
+    from Backend.preprocessing import decode_image
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    baseline = peak_rss_mb()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode_image(io.BytesIO(data))
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    print(json.dumps({
+        'median_ms': round(statistics.median(latencies), 2),
+        'max_ms': round(max(latencies), 2),
+        'peak_rss_delta_mb': round(peak_rss_mb() - baseline, 1),
+    }))
+
+
+def run_parity_worker(spec):
+    """Decode every image with the mode selected by IMAGE_DECODE_MODE; save the inputs and, with a model, predict"""
+    import numpy as np
+    from Backend.preprocessing import decode_image
+
+    batch = np.stack([decode_image(path) for path in spec['images']])
+    np.save(spec['output'], batch)
+    probabilities = None
+    if spec['model']:
+        from Backend.image_classification import load_custom_model
+        from Backend.inference import InferenceEngine
+
+        probabilities = InferenceEngine(load_custom_model(spec['model'])).predict(batch.astype(np.float32)).tolist()
+    print(json.dumps({'probabilities': probabilities}))
+
+
+def model_available(path: str) -> bool:
+    """The checked-in model is a Git LFS pointer until `git lfs pull` has run"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(8) == b'\x89HDF\r\n\x1a\n'
+    except OSError:
+        return False
+
+
+def parity(images_dir: str, model: str, tmp: str) -> list:
+    """Per-image comparison of draft against full decoding of the bundled images, re-encoded as JPEGs"""
+    import numpy as np
+    from PIL import Image
+
+    names, paths = [], []
+    for name in sorted(os.listdir(images_dir)):
+        if os.path.splitext(name)[1].lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        path = os.path.join(tmp, os.path.splitext(name)[0] + '.jpg')
+        with Image.open(os.path.join(images_dir, name)) as img:
+            img.convert('RGB').save(path, 'JPEG', quality=90)
+        names.append(name)
+        paths.append(path)
+
+    runs = {}
+    for mode in MODES:
+        spec_path = os.path.join(tmp, f'parity-{mode}.json')
+        with open(spec_path, 'w') as f:
+            json.dump({'images': paths, 'model': model, 'output': os.path.join(tmp, f'parity-{mode}.npy')}, f)
+        out = subprocess.run([sys.executable, __file__, '--parity-worker', spec_path],
+                             env=dict(os.environ, IMAGE_DECODE_MODE=mode), capture_output=True, text=True, check=True)
+        runs[mode] = (np.load(os.path.join(tmp, f'parity-{mode}.npy')).astype(np.int16),
+                      json.loads(out.stdout.strip().splitlines()[-1])['probabilities'])
+
+    from Backend.class_names import CLASS_NAMES
+
+    rows = []
+    for i, name in enumerate(names):
+        diff = np.abs(runs['draft'][0][i] - runs['full'][0][i])
+        row = {'image': name, 'mean_abs_pixel_diff': round(float(diff.mean()), 3), 'max_abs_pixel_diff': int(diff.max())}
+        if model:
+            for mode in MODES:
+                probs = runs[mode][1][i]
+                top1 = int(np.argmax(probs))
+                row[f'{mode}_label'] = CLASS_NAMES[top1] if top1 < len(CLASS_NAMES) else str(top1)
+                row[f'{mode}_confidence'] = round(float(probs[top1]), 4)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='12,24,48', help='comma-separated megapixel sizes to test')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--images', default=DEFAULT_IMAGES, help='images to check draft vs full predictions on')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='Keras model to compare predictions with')
+    parser.add_argument('--min-agreement', type=float, default=1.0, help='minimum top-1 agreement of draft with full')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--parity-worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeat)
+        return
+    if args.parity_worker:
+        with open(args.parity_worker) as f:
+            run_parity_worker(json.load(f))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in (float(s) for s in args.sizes.split(',')):
+            path = os.path.join(tmp, f'{mp:g}mp.jpg')
+            width, height = make_jpeg(mp, path)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            for mode in MODES:
+                env = dict(os.environ, IMAGE_DECODE_MODE=mode,
+                           MAX_UPLOAD_BYTES=str(1 << 30), MAX_IMAGE_PIXELS=str(1 << 30))
+                out = subprocess.run(
+                    [sys.executable, __file__, '--worker', path, '--repeat', str(args.repeat)],
+                    env=env, capture_output=True, text=True, check=True,
+                )
+                row = {'megapixels': mp, 'resolution': f'{width}x{height}', 'file_mb': round(size_mb, 2),
+                       'mode': mode, **json.loads(out.stdout.strip().splitlines()[-1])}
+                results.append(row)
+        model = args.model if model_available(args.model) else None
+        parity_rows = parity(args.images, model, tmp)
+
+    print(f"{'input':>22} {'mode':>6} {'median ms':>10} {'max ms':>8} {'peak RSS +MB':>13}")
+    for row in results:
+        label = f"{row['resolution']} ({row['file_mb']} MB)"
+        print(f"{label:>22} {row['mode']:>6} {row['median_ms']:>10} {row['max_ms']:>8} {row['peak_rss_delta_mb']:>13}")
+
+    print()
+    print(f"{'image (as JPEG)':>18} {'mean |diff|':>12} {'max |diff|':>11}" +
+          (f" {'full label':>12} {'conf':>6} {'draft label':>12} {'conf':>6}" if model else ''))
+    for row in parity_rows:
+        line = f"{row['image']:>18} {row['mean_abs_pixel_diff']:>12} {row['max_abs_pixel_diff']:>11}"
+        if model:
+            line += (f" {row['full_label']:>12} {row['full_confidence']:>6.3f}"
+                     f" {row['draft_label']:>12} {row['draft_confidence']:>6.3f}")
+        print(line)
+    agreement = None
+    if model:
+        agreement = sum(row['full_label'] == row['draft_label'] for row in parity_rows) / len(parity_rows)
+        print(f"Top-1 agreement of draft with full decoding: {agreement:.3f}")
+    else:
+        print(f"{args.model} is not available (Git LFS pointer?); labels and confidences were not compared")
+
+    if args.output:
+        write_results(args.output, 'decode', results, parity=parity_rows, top1_agreement=agreement)
+    if agreement is not None and agreement < args.min_agreement:
+        sys.exit(f"Top-1 agreement of draft decoding is {agreement:.3f}, below {args.min_agreement}")
+
+
+if __name__ == '__main__':
+    main()
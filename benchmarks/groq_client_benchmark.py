@@ -0,0 +1,121 @@
+"""Connection reuse and per-turn latency of per-session vs shared Groq clients.
+
+Runs chat turns for many sessions from concurrent threads against the
+local Groq stub (``benchmarks/stub_groq.py``), once with a fresh client per
+session (the original behaviour) and once with the shared pooled client
+from ``Backend/groq_client.py``. The stub counts TCP connections and
+charges ``--handshake-ms`` on each new one, standing in for TLS setup.
+
+Exits non-zero if the shared client opens more connections than its pool
+allows, i.e. if connections are not being reused.
+
+Usage:
+    python benchmarks/groq_client_benchmark.py [--sessions 200] [--turns 3] [--threads 16]
+        [--delay-ms 50] [--handshake-ms 30] [--output results.json]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import latency_summary, write_results
+from benchmarks.stub_groq import start_stub_server
+
+MODES = ('per-session', 'shared')
+
+
+def run(mode, stub, sessions, turns, threads):
+    from groq import Groq
+    from Backend.groq_client import GROQ_MAX_CONNECTIONS, create_groq_client
+
+    shared = create_groq_client(api_key='stub-key') if mode == 'shared' else None
+    clients = {}
+    clients_lock = threading.Lock()
+
+    def client_for(session):
+        if shared is not None:
+            return shared
+        with clients_lock:
+            if session not in clients:
+                clients[session] = Groq(api_key='stub-key', base_url=stub.url)
+            return clients[session]
+
+    latencies = []
+    lock = threading.Lock()
+
+    def turn(session):
+        client = client_for(session)
+        started = time.perf_counter()
+        client.chat.completions.create(
+            model='llama-3.1-8b-instant',
+            messages=[{'role': 'user', 'content': 'Tell me about Puti fish'}],
+            max_tokens=512,
+        )
+        elapsed = (time.perf_counter() - started) * 1000.0
+        with lock:
+            latencies.append(elapsed)
+
+    # Round-robin over sessions, as users take turns
+    plan = [session for _ in range(turns) for session in range(sessions)]
+    stub.reset_stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(turn, plan))
+    wall = time.perf_counter() - started
+    counts = stub.stats()
+
+    for client in [shared, *clients.values()]:
+        if client is not None:
+            client.close()
+    return {
+        'mode': mode,
+        'sessions': sessions,
+        'turns': len(plan),
+        'threads': threads,
+        **latency_summary(latencies),
+        'connections': counts['connections'],
+        'requests': counts['requests'],
+        'requests_per_connection': round(counts['requests'] / counts['connections'], 1) if counts['connections'] else 0.0,
+        'max_pool_connections': GROQ_MAX_CONNECTIONS if mode == 'shared' else None,
+        'throughput_rps': round(len(plan) / wall, 1) if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=3, help='turns per session')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--delay-ms', type=float, default=50.0, help='stub completion latency')
+    parser.add_argument('--handshake-ms', type=float, default=30.0, help='stub cost of each new connection')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    stub = start_stub_server(delay_ms=args.delay_ms, handshake_ms=args.handshake_ms)
+    os.environ['GROQ_BASE_URL'] = stub.url
+    try:
+        results = [run(mode, stub, args.sessions, args.turns, args.threads) for mode in MODES]
+    finally:
+        stub.shutdown()
+
+    print(f"{'mode':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'conns':>6} {'req/conn':>9} {'req/s':>7}")
+    for row in results:
+        print(f"{row['mode']:>12} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['connections']:>6} "
+              f"{row['requests_per_connection']:>9} {row['throughput_rps']:>7}")
+
+    if args.output:
+        write_results(args.output, 'groq_client_benchmark', results,
+                      delay_ms=args.delay_ms, handshake_ms=args.handshake_ms)
+
+    shared = next(row for row in results if row['mode'] == 'shared')
+    if shared['connections'] > min(shared['max_pool_connections'], args.threads):
+        sys.exit(f"Shared client opened {shared['connections']} connections for {args.threads} threads; "
+                 "connections are not being reused")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Per-turn chat history persistence cost of each history store backend.
+
+Simulates chat traffic: `--threads` workers each play turns (one user and
+one assistant message) across `--sessions` sessions whose histories are
+already at the retention window. Reports the time a request thread spends
+persisting a turn, the time until everything is on disk, throughput and
+bytes on disk. ``legacy`` is the original behaviour (a synchronous
+``indent=2`` rewrite of the whole session file per message) for reference.
+
+Usage:
+    python benchmarks/history_benchmark.py [--backends legacy,json,jsonl,sqlite]
+        [--sessions 100,1000] [--turns 5] [--threads 8] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import latency_summary, write_results
+
+BACKENDS = ('legacy', 'json', 'jsonl', 'sqlite')
+SYSTEM = {'role': 'system', 'content': 'You are an expert on small fishes in Bangladesh. ' * 20}
+ANSWER = ('Puti (Puntius sophore) is one of the most common small fishes in Bangladesh. ' * 6).strip()
+
+
+class LegacyStore:
+    """The pre-store persistence: rewrite the whole JSON file on every message"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.histories = {}
+        self.locks = {}
+
+    def append(self, session_id, message):
+        history = self.histories.setdefault(session_id, [SYSTEM])
+        history.append(message)
+        if len(history) > 16:
+            self.histories[session_id] = history = [history[0]] + history[-15:]
+        with open(os.path.join(self.directory, f"chat_history_{session_id}.json"), 'w') as f:
+            json.dump({'session_id': session_id, 'last_updated': datetime.now().isoformat(),
+                       'messages': history}, f, indent=2)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_store(backend, directory):
+    if backend == 'legacy':
+        return LegacyStore(directory)
+    from Backend.history_store import create_history_store
+
+    kwargs = {'db_path': os.path.join(directory, 'history.sqlite3')} if backend == 'sqlite' else {}
+    return create_history_store(backend, directory=directory, **kwargs)
+
+
+def message(role, content):
+    return {'role': role, 'content': content, 'timestamp': datetime.now().isoformat()}
+
+
+def disk_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def run(backend, sessions, turns, threads):
+    with tempfile.TemporaryDirectory() as directory:
+        store = make_store(backend, directory)
+        ids = [f"bench-{i}" for i in range(sessions)]
+        # Start every session at the retention window, as a long-running site would be
+        for session_id in ids:
+            for i in range(8):
+                store.append(session_id, message('user', f"Question {i} about Puti fish?"))
+                store.append(session_id, message('assistant', ANSWER))
+        store.flush()
+
+        plan = [session_id for session_id in ids for _ in range(turns)]
+        random.Random(0).shuffle(plan)
+        latencies = []
+        lock = threading.Lock()
+
+        def turn(session_id):
+            started = time.perf_counter()
+            store.append(session_id, message('user', 'Tell me about Puti fish'))
+            store.append(session_id, message('assistant', ANSWER))
+            elapsed = (time.perf_counter() - started) * 1000.0
+            with lock:
+                latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(turn, plan))
+        submitted = time.perf_counter() - started
+        store.flush()
+        durable = time.perf_counter() - started
+        size = disk_bytes(directory)
+        store.close()
+
+    return {
+        'backend': backend,
+        'sessions': sessions,
+        'turns': len(plan),
+        'threads': threads,
+        'per_turn': latency_summary(latencies),
+        'submit_seconds': round(submitted, 3),
+        'durable_seconds': round(durable, 3),
+        'turns_per_second': round(len(plan) / durable, 1) if durable else 0.0,
+        'disk_kb': round(size / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--sessions', default='100,1000', help='comma-separated session counts')
+    parser.add_argument('--turns', type=int, default=5, help='turns per session')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent request threads')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'backend':>8} {'sessions':>9} {'turn p50 ms':>12} {'turn p95 ms':>12} {'turn p99 ms':>12} "
+          f"{'durable s':>10} {'turns/s':>9} {'disk KB':>9}")
+    for sessions in [int(s) for s in args.sessions.split(',') if s.strip()]:
+        for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+            row = run(backend, sessions, args.turns, args.threads)
+            results.append(row)
+            print(f"{backend:>8} {sessions:>9} {row['per_turn']['p50_ms']:>12} {row['per_turn']['p95_ms']:>12} "
+                  f"{row['per_turn']['p99_ms']:>12} {row['durable_seconds']:>10} {row['turns_per_second']:>9} "
+                  f"{row['disk_kb']:>9}")
+
+    if args.output:
+        write_results(args.output, 'history_benchmark', results, turns_per_session=args.turns, threads=args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Load test for the classify, chat, chat-history and static-page endpoints.
+
+Starts the Flask app in a subprocess (threaded werkzeug server) against a
+local stub of the Groq chat-completions API, and uses a small stand-in
+model when the real ``convnextnet_model.h5`` is not available (e.g. a Git
+LFS pointer). Each endpoint is driven at each concurrency level; p50/p95/p99
+latency, throughput, error count and the server's peak RSS during the run
+are printed and saved as JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/load_test.py [--endpoints classify,chat,history,static]
+        [--concurrency 1,8,32] [--requests 200] [--model auto|real|stub]
+        [--groq-delay-ms 300] [--output results.json] [--compare previous.json]
+    python benchmarks/load_test.py --url http://host:5000   # drive an already running server
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, latency_summary, rss_mb, write_results
+
+ENDPOINTS = ('classify', 'chat', 'history', 'static')
+STATIC_PATHS = ('/', '/fish-database.html', '/chatbot.js', '/header.html', '/images/Puti.png')
+IMAGE_DIR = os.path.join(ROOT, 'Frontend', 'images')
+REAL_MODEL = os.path.join(ROOT, 'Backend', 'model', 'convnextnet_model.h5')
+DEFAULT_RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def real_model_available() -> bool:
+    """The checked-in model is a Git LFS pointer until `git lfs pull` has run"""
+    try:
+        with open(REAL_MODEL, 'rb') as f:
+            return f.read(8) == b'\x89HDF\r\n\x1a\n'
+    except OSError:
+        return False
+
+
+def build_stand_in_model(path: str):
+    """Save a tiny CNN with the production input/output shapes"""
+    import tensorflow as tf
+
+    inputs = tf.keras.Input((224, 224, 3))
+    x = tf.keras.layers.Rescaling(1.0 / 255)(inputs)
+    x = tf.keras.layers.Conv2D(16, 7, strides=4, activation='relu')(x)
+    x = tf.keras.layers.Conv2D(32, 3, strides=2, activation='relu')(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(10, activation='softmax')(x)
+    tf.keras.Model(inputs, outputs).save(path)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int):
+    """Run the Flask app on a threaded werkzeug server (used inside the server subprocess)"""
+    from werkzeug.serving import make_server
+
+    os.chdir(ROOT)
+    import main
+
+    server = make_server('127.0.0.1', port, main.create_app(), threaded=True)
+    print(f"READY {port}", flush=True)
+    server.serve_forever()
+
+
+class ServerProcess:
+    """The app under test, running in its own process so its memory can be sampled"""
+
+    def __init__(self, env: dict):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve', str(self.port)],
+            env=env, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for line in self.proc.stdout:
+            if line.startswith('READY'):
+                break
+        else:
+            raise RuntimeError('Server process exited before becoming ready')
+        # Keep draining stdout so a chatty server never blocks on a full pipe
+        threading.Thread(target=lambda: [None for _ in self.proc.stdout], daemon=True).start()
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait(timeout=10)
+
+
+class MemorySampler:
+    """Track the peak RSS of a process while a block runs"""
+
+    def __init__(self, pid, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = rss_mb(self.pid)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb(self.pid))
+
+
+def wait_until_ready(client, url, timeout: float = 300.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.get(f"{url}/health").status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url}/health did not become ready within {timeout}s")
+
+
+def request_factory(endpoint: str, url: str):
+    """Return a function(client, i) that performs one request against the endpoint"""
+    images = sorted(
+        (name, open(os.path.join(IMAGE_DIR, name), 'rb').read())
+        for name in os.listdir(IMAGE_DIR) if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+    questions = [
+        'What are the common small fishes in Bangladesh?',
+        'Tell me about Puti fish',
+        'How are small fishes farmed in Bangladesh?',
+        'Which small fish is used for Kachki Jhaal?',
+    ]
+
+    if endpoint == 'classify':
+        def call(client, i):
+            name, data = images[i % len(images)]
+            return client.post(f"{url}/api/classify", files={'image': (name, data)},
+                               data={'session_id': f"bench-{i % 16}"})
+    elif endpoint == 'chat':
+        def call(client, i):
+            return client.post(f"{url}/api/chat", json={
+                'message': questions[i % len(questions)], 'session_id': f"bench-{i % 16}"
+            })
+    elif endpoint == 'history':
+        def call(client, i):
+            return client.get(f"{url}/api/chat/history", params={'session_id': f"bench-{i % 16}"})
+    elif endpoint == 'static':
+        def call(client, i):
+            return client.get(f"{url}{STATIC_PATHS[i % len(STATIC_PATHS)]}")
+    else:
+        raise ValueError(f"Unknown endpoint '{endpoint}'")
+    return call
+
+
+def run_phase(call, requests: int, concurrency: int, timeout: float):
+    """Issue `requests` calls from `concurrency` threads, each with its own keep-alive client"""
+    import httpx
+
+    local = threading.local()
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = httpx.Client(timeout=timeout)
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                ok = call(client, i).status_code < 400
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000.0
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+    return {
+        **latency_summary(latencies),
+        'errors': errors,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+
+
+def compare(previous_path: str, results):
+    """Print p50/p95/throughput changes against an earlier results file"""
+    with open(previous_path) as f:
+        previous = {(r['endpoint'], r['concurrency']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {previous_path}:")
+    print(f"{'endpoint':>10} {'conc':>5} {'p50 Δ%':>8} {'p95 Δ%':>8} {'rps Δ%':>8}")
+    for row in results:
+        old = previous.get((row['endpoint'], row['concurrency']))
+        if not old:
+            continue
+
+        def delta(key):
+            return f"{(row[key] - old[key]) / old[key] * 100:+.1f}" if old[key] else 'n/a'
+        print(f"{row['endpoint']:>10} {row['concurrency']:>5} {delta('p50_ms'):>8} {delta('p95_ms'):>8} "
+              f"{delta('throughput_rps'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint per concurrency level')
+    parser.add_argument('--model', choices=('auto', 'real', 'stub'), default='auto')
+    parser.add_argument('--groq-delay-ms', type=float, default=300.0, help='latency of the stub Groq API')
+    parser.add_argument('--keep-prediction-cache', action='store_true',
+                        help='leave the prediction cache on (repeat images are then served from cache)')
+    parser.add_argument('--url', help='benchmark an already running server instead of starting one')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    import httpx
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    server = stub = None
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+            model = 'external'
+        else:
+            from benchmarks.stub_groq import start_stub_server
+
+            stub = start_stub_server(delay_ms=args.groq_delay_ms)
+            env = dict(os.environ, GROQ_API_KEY='stub-key', GROQ_BASE_URL=stub.url, SAVE_UPLOADS='0')
+            if not args.keep_prediction_cache:
+                env['PREDICTION_CACHE'] = '0'
+            use_real = args.model == 'real' or (args.model == 'auto' and real_model_available())
+            if use_real:
+                model = 'convnextnet_model.h5'
+            else:
+                model = 'stand-in'
+                env['MODEL_PATH'] = os.path.join(tmp.name, 'stand_in.h5')
+                build_stand_in_model(env['MODEL_PATH'])
+            print(f"Starting server (model: {model}, stub Groq delay: {args.groq_delay_ms} ms)...")
+            server = ServerProcess(env)
+            url = server.url
+
+        with httpx.Client(timeout=args.timeout) as client:
+            wait_until_ready(client, url)
+
+        results = []
+        for endpoint in endpoints:
+            call = request_factory(endpoint, url)
+            for concurrency in levels:
+                if server:
+                    with MemorySampler(server.proc.pid) as memory:
+                        row = run_phase(call, args.requests, concurrency, args.timeout)
+                    row['server_peak_rss_mb'] = round(memory.peak, 1)
+                else:
+                    row = run_phase(call, args.requests, concurrency, args.timeout)
+                row = {'endpoint': endpoint, 'concurrency': concurrency, **row}
+                results.append(row)
+                print(f"{endpoint:>10} c={concurrency:<3} p50={row['p50_ms']:.1f}ms p95={row['p95_ms']:.1f}ms "
+                      f"p99={row['p99_ms']:.1f}ms {row['throughput_rps']:.1f} req/s errors={row['errors']} "
+                      f"peak RSS={row.get('server_peak_rss_mb', '-')} MB")
+    finally:
+        if server:
+            server.stop()
+        if stub:
+            stub.shutdown()
+        tmp.cleanup()
+
+    from benchmarks.common import git_commit
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"load_test-{git_commit()}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    write_results(output, 'load_test', results, model=model, requests=args.requests,
+                  groq_delay_ms=None if args.url else args.groq_delay_ms)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
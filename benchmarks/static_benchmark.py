@@ -0,0 +1,180 @@
+"""Bytes and requests of a page load, served from disk vs the static manifest and image variants.
+
+Loads each ``--pages`` page like a browser would: the page, then every
+script, image and fragment it references (``src=``, ``fetch('...')`` and
+non-page ``href=``), recursively. For an ``<img>`` with a ``srcset`` only
+the narrowest candidate at least ``--image-width`` pixels wide is fetched.
+The repeat visit reuses the browser cache: responses marked ``immutable``
+with a ``max-age`` are not requested again, everything else is revalidated
+with ``If-None-Match`` / ``If-Modified-Since``. Runs in-process against the
+Flask app in three modes:
+
+- ``disk``: files sent from disk (``STATIC_MANIFEST=0 IMAGE_VARIANTS=0``)
+- ``manifest``: the static manifest, images as stored (``IMAGE_VARIANTS=0``)
+- ``variants``: the static manifest and resized AVIF/WebP image variants,
+  generated before the run
+
+Bytes are response bodies plus response headers as they would be sent on
+the wire; brotli variants are only produced when the ``brotli`` package is
+installed.
+
+Usage:
+    python benchmarks/static_benchmark.py [--pages index.html,fish-database.html] [--image-width 480]
+        [--accept-encoding "gzip, deflate, br"] [--accept-image "image/avif,image/webp,*/*"]
+        [--output results.json]
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import write_results
+
+MODES = ('disk', 'manifest', 'variants')
+
+EMBEDDED_RE = re.compile(r'''(?:\bsrc=|\bfetch\(\s*)["'](?P<url>[^"'#:${}\s]+)["']''')
+LINK_RE = re.compile(r'''\bhref=["'](?P<url>[^"'#:${}\s]+)["']''')
+IMG_RE = re.compile(r'<img\b[^>]*>')
+SRCSET_RE = re.compile(r'''\bsrcset=["'](?P<candidates>[^"']*)["']''')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg')
+
+
+def pick_candidate(candidates: str, image_width: int) -> str:
+    """The srcset URL a browser picks for an image displayed image_width device pixels wide"""
+    parsed = []
+    for candidate in candidates.split(','):
+        url, _, descriptor = candidate.strip().partition(' ')
+        parsed.append((int(descriptor.strip()[:-1]) if descriptor.strip().endswith('w') else 0, url))
+    parsed.sort()
+    return next((url for width, url in parsed if width >= image_width), parsed[-1][1])
+
+
+def references(body: str, image_width: int):
+    """Local URLs a browser fetches while rendering body; links to other pages are not followed"""
+    urls = []
+
+    def responsive(match):
+        srcset = SRCSET_RE.search(match.group(0))
+        if srcset is None:
+            return match.group(0)
+        urls.append(pick_candidate(srcset.group('candidates'), image_width))
+        return ''
+
+    body = IMG_RE.sub(responsive, body)
+    urls += [m.group('url') for m in EMBEDDED_RE.finditer(body)]
+    urls += [m.group('url') for m in LINK_RE.finditer(body) if not m.group('url').split('?')[0].endswith('.html')]
+    return [url.lstrip('/') for url in urls if not url.lstrip('/').startswith('api/')]
+
+
+def header_bytes(response) -> int:
+    status = f"HTTP/1.1 {response.status}\r\n"
+    return len(status) + sum(len(f"{name}: {value}\r\n") for name, value in response.headers.items()) + 2
+
+
+def decode(response) -> bytes:
+    data = response.get_data()
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(data)
+    return data
+
+
+def load_page(client, page: str, cache: dict, accept_encoding: str, accept_image: str, image_width: int) -> dict:
+    """Fetch page and everything it references once, updating cache; returns request and byte counts"""
+    stats = {'requests': 0, 'not_modified': 0, 'from_cache': 0, 'body_bytes': 0, 'header_bytes': 0}
+    pending, seen = [page], set()
+    while pending:
+        url = pending.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        cached = cache.get(url)
+        if cached is not None and cached['immutable']:
+            stats['from_cache'] += 1
+            body = cached['body']
+        else:
+            headers = {'Accept-Encoding': accept_encoding}
+            if url.split('?')[0].lower().endswith(IMAGE_EXTENSIONS):
+                headers['Accept'] = accept_image
+            if cached is not None and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached is not None and cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+            response = client.get(f"/{url}", headers=headers)
+            stats['requests'] += 1
+            stats['header_bytes'] += header_bytes(response)
+            # The test client decodes nothing, so this is the (possibly compressed) size on the wire
+            stats['body_bytes'] += len(response.get_data())
+            if response.status_code == 304:
+                stats['not_modified'] += 1
+                body = cached['body']
+            elif response.status_code == 200:
+                cache_control = response.headers.get('Cache-Control', '')
+                body = decode(response)
+                cache[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'immutable': 'immutable' in cache_control and 'max-age' in cache_control,
+                    'body': body,
+                }
+            else:
+                continue
+            response.close()
+        if url.split('?')[0].endswith(('.html', '.js', '.css')):
+            pending.extend(references(body.decode('utf-8', errors='replace'), image_width))
+    stats['total_bytes'] = stats['body_bytes'] + stats['header_bytes']
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default='index.html,fish-database.html', help='comma-separated pages to load')
+    parser.add_argument('--accept-encoding', default='gzip, deflate, br', help='Accept-Encoding sent by the browser')
+    parser.add_argument('--accept-image', default='image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+                        help='Accept sent for images')
+    parser.add_argument('--image-width', type=int, default=480,
+                        help='device pixels an image with a srcset is displayed at (a 3-column card on a 1440px screen)')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main as app_module
+
+    manifest = app_module.static_assets
+    if manifest is None:
+        from Backend.static_assets import StaticAssets
+        manifest = StaticAssets('Frontend', blocked=app_module.BLOCKED_PAGES)
+    variants = app_module.image_variants
+    if variants is None:
+        from Backend.image_variants import ImageVariants
+        variants = ImageVariants('Frontend')
+    variants.build()
+    client = app_module.app.test_client()
+
+    results = []
+    for mode in MODES:
+        app_module.static_assets = manifest if mode != 'disk' else None
+        app_module.image_variants = variants if mode == 'variants' else None
+        for page in [p.strip() for p in args.pages.split(',') if p.strip()]:
+            cache = {}
+            for visit in ('first', 'repeat'):
+                stats = load_page(client, page, cache, args.accept_encoding, args.accept_image, args.image_width)
+                results.append({'mode': mode, 'page': page, 'visit': visit, **stats})
+                print(f"{mode:>8} {page:<20} {visit:<6} requests={stats['requests']:<3} "
+                      f"304={stats['not_modified']:<3} cached={stats['from_cache']:<3} "
+                      f"body={stats['body_bytes'] / 1024:8.1f} KB headers={stats['header_bytes'] / 1024:5.1f} KB "
+                      f"total={stats['total_bytes'] / 1024:8.1f} KB")
+
+    if args.output:
+        write_results(args.output, 'static_assets', results, accept_encoding=args.accept_encoding,
+                      accept_image=args.accept_image, image_width=args.image_width)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Local stand-in for the Groq chat-completions API.
+
+Answers ``POST /openai/v1/chat/completions`` with a canned completion after a
+configurable delay, so the chat endpoints can be benchmarked without a real
+API key. Point the app at it with ``GROQ_BASE_URL=http://127.0.0.1:<port>``.
+Requests with ``"stream": true`` get the reply word by word as server-sent
+events, ``token_ms`` apart; streams the client closes early are counted.
+
+``handshake_ms`` delays the first response on every new connection, to
+stand in for the TCP + TLS setup a fresh connection to the real API pays.
+
+Usage:
+    python benchmarks/stub_groq.py [--port 8765] [--delay-ms 300] [--token-ms 20] [--handshake-ms 0]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Puti (Puntius sophore) is one of the most common small fishes in Bangladesh. "
+    "It lives in ponds, canals and beels, eats both plants and small animals, and is "
+    "usually fried whole or cooked in a light curry."
+)
+
+
+class StubGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of new connections from highly concurrent clients
+    request_queue_size = 256
+
+    def __init__(self, address, delay_ms: float = 0.0, reply: str = REPLY, handshake_ms: float = 0.0,
+                 token_ms: float = 0.0):
+        super().__init__(address, StubGroqHandler)
+        self.delay_ms = delay_ms
+        self.handshake_ms = handshake_ms
+        self.token_ms = token_ms
+        self.reply = reply
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.streams = 0
+        self.streams_aborted = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'connections': self.connections, 'requests': self.requests,
+                    'streams': self.streams, 'streams_aborted': self.streams_aborted}
+
+    def reset_stats(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+            self.streams = 0
+            self.streams_aborted = 0
+
+
+class StubGroqHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY the body waits
+    # for the client's delayed ACK (~40 ms) on every reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        if self.server.handshake_ms:
+            time.sleep(self.server.handshake_ms / 1000.0)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        with self.server.lock:
+            self.server.requests += 1
+
+        if not self.path.endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        time.sleep(self.server.delay_ms / 1000.0)
+        if body.get('stream'):
+            self._stream(body)
+            return
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in body.get('messages', []))
+        self._send_json(200, {
+            'id': f"chatcmpl-stub-{self.server.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.server.reply},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(self.server.reply.split()),
+                'total_tokens': prompt_tokens + len(self.server.reply.split()),
+            },
+        })
+
+    def _stream(self, body):
+        with self.server.lock:
+            self.server.streams += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        created = int(time.time())
+        words = self.server.reply.split(' ')
+
+        def chunk(delta, finish_reason=None):
+            return {
+                'id': f"chatcmpl-stub-{self.server.requests}",
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': body.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+
+        events = [chunk({'role': 'assistant', 'content': ''})]
+        events += [chunk({'content': word if i == 0 else ' ' + word}) for i, word in enumerate(words)]
+        events.append(chunk({}, 'stop'))
+        try:
+            for i, event in enumerate(events):
+                if i > 1 and self.server.token_ms:
+                    time.sleep(self.server.token_ms / 1000.0)
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            with self.server.lock:
+                self.server.streams_aborted += 1
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(port: int = 0, delay_ms: float = 0.0, handshake_ms: float = 0.0,
+                      token_ms: float = 0.0) -> StubGroqServer:
+    """Start the stub on a background thread and return it (port 0 picks a free port)"""
+    server = StubGroqServer(('127.0.0.1', port), delay_ms=delay_ms, handshake_ms=handshake_ms, token_ms=token_ms)
+    threading.Thread(target=server.serve_forever, name='stub-groq', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=int(os.getenv('STUB_GROQ_PORT', '8765')))
+    parser.add_argument('--delay-ms', type=float, default=300.0, help='simulated upstream latency')
+    parser.add_argument('--token-ms', type=float, default=20.0, help='delay between streamed words')
+    parser.add_argument('--handshake-ms', type=float, default=0.0, help='simulated connection setup cost')
+    args = parser.parse_args()
+
+    server = StubGroqServer(('127.0.0.1', args.port), delay_ms=args.delay_ms, handshake_ms=args.handshake_ms,
+                            token_ms=args.token_ms)
+    print(f"Stub Groq API listening on {server.url} (delay {args.delay_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
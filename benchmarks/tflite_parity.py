@@ -0,0 +1,180 @@
+"""Accuracy parity and latency/memory comparison of the Keras and TFLite inference backends.
+
+Exports the Keras model to each requested TFLite quantization, runs every
+backend over a labelled image set in its own subprocess (so memory is
+measured in isolation) and compares predictions against the Keras backend.
+
+Images are labelled either by sub-directory (``<dir>/<Class Name>/*.jpg``)
+or by a class name appearing in the file name (``Frontend/images/Puti.png``).
+Unlabelled images still count towards agreement with the Keras backend.
+
+Exits non-zero if any backend's top-1 agreement with Keras falls below
+--min-agreement.
+
+Usage:
+    python benchmarks/tflite_parity.py [--model PATH] [--images DIR]
+        [--quantizations float16,dynamic,int8] [--repeat 20] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, latency_summary, peak_rss_mb, write_results
+
+DEFAULT_IMAGES = os.path.join(ROOT, 'Frontend', 'images')
+DEFAULT_MODEL = os.path.join(ROOT, 'Backend', 'model', 'convnextnet_model.h5')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def labelled_images(directory, class_names):
+    """Return [(path, label or None)] for every image under directory"""
+    images = []
+    for dirpath, _, filenames in os.walk(directory):
+        folder = os.path.basename(dirpath)
+        for name in sorted(filenames):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            label = next((c for c in class_names if c.lower() == folder.lower()), None)
+            if label is None:
+                stem = os.path.splitext(name)[0].lower()
+                label = next((c for c in class_names if c.lower() in stem), None)
+            images.append((os.path.join(dirpath, name), label))
+    return images
+
+
+def run_worker(spec):
+    """Load one backend, predict every image and report probabilities, latency and memory"""
+    import numpy as np
+    from Backend.preprocessing import decode_image
+    # Imports TensorFlow, so its import cost is excluded from the memory baseline
+    from Backend.inference import InferenceEngine, TFLiteEngine
+
+    batch = np.stack([decode_image(path).astype(np.float32) for path in spec['images']])
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    if spec['backend'] == 'keras':
+        from Backend.image_classification import load_custom_model
+        engine = InferenceEngine(load_custom_model(spec['model']))
+    else:
+        engine = TFLiteEngine(spec['artifact'], quantization=spec['backend'])
+    load_seconds = time.perf_counter() - started
+
+    probabilities = engine.predict(batch)
+
+    single = []
+    for i in range(spec['repeat']):
+        row = batch[i % len(batch):i % len(batch) + 1]
+        started = time.perf_counter()
+        engine.predict(row)
+        single.append((time.perf_counter() - started) * 1000.0)
+
+    batch_size = min(8, len(batch))
+    batched = []
+    for _ in range(max(1, spec['repeat'] // 4)):
+        started = time.perf_counter()
+        engine.predict(batch[:batch_size])
+        batched.append((time.perf_counter() - started) * 1000.0)
+
+    print(json.dumps({
+        'load_seconds': round(load_seconds, 3),
+        'rss_delta_mb': round(peak_rss_mb() - baseline, 1),
+        'batch1': latency_summary(single[1:] or single),
+        f'batch{batch_size}': latency_summary(batched),
+        'probabilities': probabilities.tolist(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='Keras model to compare against')
+    parser.add_argument('--images', default=DEFAULT_IMAGES, help='labelled image directory')
+    parser.add_argument('--quantizations', default='float16,dynamic,int8')
+    parser.add_argument('--repeat', type=int, default=20, help='timed single-image inferences per backend')
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.worker) as f:
+            run_worker(json.load(f))
+        return
+
+    from Backend.image_classification import CLASS_NAMES, load_custom_model
+    from Backend.inference import export_tflite
+
+    images = labelled_images(args.images, CLASS_NAMES)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+    paths = [path for path, _ in images]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = load_custom_model(args.model)
+        backends = [('keras', None, os.path.getsize(args.model))]
+        for quantization in [q.strip() for q in args.quantizations.split(',') if q.strip()]:
+            artifact = os.path.join(tmp, f'model.{quantization}.tflite')
+            export_tflite(model, artifact, quantization, representative_images=paths)
+            backends.append((quantization, artifact, os.path.getsize(artifact)))
+        del model
+
+        runs = {}
+        for backend, artifact, _ in backends:
+            spec_path = os.path.join(tmp, f'{backend}.json')
+            with open(spec_path, 'w') as f:
+                json.dump({'backend': backend, 'artifact': artifact, 'model': args.model,
+                           'images': paths, 'repeat': args.repeat}, f)
+            out = subprocess.run([sys.executable, __file__, '--worker', spec_path],
+                                 capture_output=True, text=True, check=True)
+            runs[backend] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    import numpy as np
+
+    reference = np.array(runs['keras']['probabilities'])
+    reference_top1 = reference.argmax(axis=1)
+    labels = [CLASS_NAMES.index(label) if label else None for _, label in images]
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+
+    results = []
+    failed = False
+    for backend, _, size in backends:
+        run = runs[backend]
+        probs = np.array(run.pop('probabilities'))
+        top1 = probs.argmax(axis=1)
+        agreement = float((top1 == reference_top1).mean())
+        accuracy = float(np.mean([top1[i] == labels[i] for i in labelled])) if labelled else None
+        results.append({
+            'backend': backend,
+            'artifact_mb': round(size / (1024 * 1024), 2),
+            'images': len(images),
+            'labelled_images': len(labelled),
+            'top1_agreement_with_keras': round(agreement, 4),
+            'accuracy': round(accuracy, 4) if accuracy is not None else None,
+            'max_abs_prob_diff': round(float(np.abs(probs - reference).max()), 6),
+            **run,
+        })
+        if agreement < args.min_agreement:
+            failed = True
+
+    print(f"{'backend':>8} {'size MB':>8} {'agree':>6} {'acc':>6} {'max diff':>9} "
+          f"{'b1 p50 ms':>10} {'b1 p95 ms':>10} {'RSS +MB':>8}")
+    for row in results:
+        accuracy = '-' if row['accuracy'] is None else f"{row['accuracy']:.3f}"
+        print(f"{row['backend']:>8} {row['artifact_mb']:>8} {row['top1_agreement_with_keras']:>6.3f} {accuracy:>6} "
+              f"{row['max_abs_prob_diff']:>9.4f} {row['batch1']['p50_ms']:>10} {row['batch1']['p95_ms']:>10} "
+              f"{row['rss_delta_mb']:>8}")
+
+    if args.output:
+        write_results(args.output, 'tflite_parity', results, model=os.path.basename(args.model))
+    if failed:
+        sys.exit(f"Top-1 agreement below {args.min_agreement} for at least one backend")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Memory and classification throughput against the number of gunicorn workers.
+
+Starts ``gunicorn`` (configured by ``gunicorn.conf.py``) once per
+``--workers`` count in each inference mode:
+
+- ``local``: every worker loads TensorFlow and the model (INFERENCE_MODE=local)
+- ``server``: workers decode uploads and send them to one shared model
+  server process (INFERENCE_MODE=server)
+
+and drives ``/api/classify`` from ``--concurrency`` clients. Memory is the
+proportional set size (PSS) of the master, the workers and the model
+server, so pages shared between forked processes are counted once. The
+prediction cache is disabled so every request runs the model. Needs
+gunicorn (Linux/macOS).
+
+Usage:
+    python benchmarks/worker_scaling.py [--workers 1,2,4] [--concurrency 16] [--requests 400]
+        [--threads 8] [--model auto|real|stub] [--output results.json]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT, pss_mb, write_results
+from benchmarks.load_test import build_stand_in_model, free_port, real_model_available, request_factory, run_phase
+
+MODES = ('local', 'server')
+
+
+def children(pid: int):
+    """Direct child process ids of pid"""
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return found
+
+
+def cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return ''
+
+
+def memory(master: int) -> dict:
+    """PSS in MB of the gunicorn master, its workers, the model server and their helper processes"""
+    workers, model_server, other = [], 0.0, 0.0
+    pending = children(master)
+    while pending:
+        pid = pending.pop()
+        pending.extend(children(pid))
+        command = cmdline(pid)
+        if 'Backend.model_server' in command:
+            model_server += pss_mb(pid)
+        elif 'gunicorn' in command:
+            workers.append(pss_mb(pid))
+        else:
+            # e.g. the multiprocessing resource tracker of each worker
+            other += pss_mb(pid)
+    master_mb = pss_mb(master)
+    return {
+        'total_mb': round(master_mb + sum(workers) + model_server + other, 1),
+        'master_mb': round(master_mb, 1),
+        'per_worker_mb': round(sum(workers) / len(workers), 1) if workers else 0.0,
+        'model_server_mb': round(model_server, 1),
+        'workers_found': len(workers),
+    }
+
+
+def wait_for_workers(client, url: str, workers: int, timeout: float = 300.0):
+    """Wait until /health answers 200 many times in a row, so every worker has loaded (requests land on any worker)"""
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline:
+        try:
+            ok = client.get(f"{url}/health").status_code == 200
+        except Exception:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= 4 * workers + 4:
+            return
+        if not ok:
+            time.sleep(0.5)
+    raise RuntimeError(f"{url}/health did not become ready on all workers within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated gunicorn worker counts')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent classification clients')
+    parser.add_argument('--requests', type=int, default=400, help='classification requests per run')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--model', choices=('auto', 'real', 'stub'), default='auto')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    args = parser.parse_args()
+
+    import httpx
+
+    levels = [int(w) for w in args.workers.split(',') if w.strip()]
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(os.environ, SAVE_UPLOADS='0', PREDICTION_CACHE='0', GUNICORN_THREADS=str(args.threads),
+               CHAT_HISTORY_DIR=os.path.join(tmp.name, 'chat'), LOG_LEVEL='WARNING',
+               MODEL_SERVER_ADDRESS=os.path.join(tmp.name, 'model-server.sock'))
+    use_real = args.model == 'real' or (args.model == 'auto' and real_model_available())
+    model = 'convnextnet_model.h5' if use_real else 'stand-in'
+    if not use_real:
+        env['MODEL_PATH'] = os.path.join(tmp.name, 'stand_in.h5')
+        build_stand_in_model(env['MODEL_PATH'])
+
+    results = []
+    try:
+        for mode in MODES:
+            for workers in levels:
+                port = free_port()
+                url = f"http://127.0.0.1:{port}"
+                proc = subprocess.Popen(
+                    [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py')],
+                    env=dict(env, INFERENCE_MODE=mode, WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}"),
+                    cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                try:
+                    started = time.perf_counter()
+                    with httpx.Client(timeout=args.timeout) as client:
+                        wait_for_workers(client, url, workers)
+                    ready_seconds = time.perf_counter() - started
+                    call = request_factory('classify', url)
+                    # Every worker's first classifications pay for lazy set-up; keep them out of the numbers
+                    run_phase(call, 8 * workers, min(args.concurrency, 4 * workers), args.timeout)
+                    idle = memory(proc.pid)
+                    phase = run_phase(call, args.requests, args.concurrency, args.timeout)
+                    loaded = memory(proc.pid)
+                finally:
+                    proc.send_signal(signal.SIGTERM)
+                    proc.wait(timeout=60)
+                row = {
+                    'mode': mode, 'workers': workers, 'threads': args.threads, 'concurrency': args.concurrency,
+                    'ready_seconds': round(ready_seconds, 2), 'memory_idle': idle, 'memory': loaded, **phase,
+                }
+                results.append(row)
+                print(f"{mode:>6} workers={workers:<2} total={loaded['total_mb']:.0f}MB "
+                      f"per_worker={loaded['per_worker_mb']:.0f}MB model_server={loaded['model_server_mb']:.0f}MB | "
+                      f"{phase['throughput_rps']:.1f} req/s p50={phase['p50_ms']:.0f}ms p95={phase['p95_ms']:.0f}ms "
+                      f"errors={phase['errors']} (ready in {ready_seconds:.1f}s)")
+    finally:
+        tmp.cleanup()
+
+    if args.output:
+        write_results(args.output, 'worker_scaling', results, model=model, requests=args.requests)
+
+
+if __name__ == '__main__':
+    main()
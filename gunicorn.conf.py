@@ -0,0 +1,39 @@
+"""Gunicorn settings for production serving (Linux/macOS).
+
+Run from the project root with just ``gunicorn``; this file is picked up
+automatically. Every worker imports the app and calls ``main.create_app()``
+after forking, so no model, thread or connection pool is shared across a
+fork. With ``INFERENCE_MODE=server`` the model server process is started
+before the workers and stopped with the master.
+"""
+import os
+
+from Backend.model_server import INFERENCE_MODE, MODEL_SERVER_ADDRESS, spawn_model_server
+
+wsgi_app = 'main:create_app()'
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Threads per worker; chat requests hold a thread for the whole Groq round-trip
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = 'gthread'
+# Loading the model on a worker's first classification can take longer than gunicorn's default 30 s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Importing main.py starts the chat history writer thread, which must run in each worker, not the master
+preload_app = False
+
+# Set to 0 when the model server is run separately (python -m Backend.model_server)
+MODEL_SERVER_SPAWN = os.getenv("MODEL_SERVER_SPAWN", "1") != "0"
+
+
+def on_starting(server):
+    server.model_server = None
+    if INFERENCE_MODE == 'server' and MODEL_SERVER_SPAWN:
+        server.log.info("Starting model server on %s", MODEL_SERVER_ADDRESS)
+        server.model_server = spawn_model_server()
+
+
+def on_exit(server):
+    proc = getattr(server, 'model_server', None)
+    if proc is not None:
+        proc.terminate()
+        proc.wait(timeout=30)
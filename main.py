@@ -1,112 +1,204 @@
-from flask import Flask, render_template, send_from_directory, request, jsonify
+from flask import Flask, Request, render_template, send_from_directory, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 import os
+import json
+import time
+import zipfile
+import logging
 from dotenv import load_dotenv
+
+# Load environment variables from .env before the Backend modules read their settings on import
+load_dotenv()
+
 from Backend.backend import ChatSessionManager
-from Backend.image_classification import classify_image, model_status
+from Backend.preprocessing import ImageTooLargeError, MAX_UPLOAD_BYTES, open_image
 from Backend.database.fish_data import get_fish_data
+from Backend.database import fish_search
+from Backend import metrics
+from Backend.logging_setup import configure_logging, start_request
+from Backend.static_assets import StaticAssets
+from Backend.upload_store import get_upload_store
+from Backend.image_variants import ImageVariants
+from Backend.model_server import INFERENCE_MODE
 
-# Load environment variables from .env file
-load_dotenv()
+if INFERENCE_MODE == 'server':
+    # The model lives in the model server process (Backend/model_server.py); this process never loads TensorFlow
+    from Backend.model_server import classify_image, classify_images, model_status, model_state, start_model_preload
+    metrics.gauge('fishai_model_ready', 'Whether the model server has the model loaded and warmed up',
+                  lambda: int(model_state() == 'ready'))
+else:
+    from Backend.image_classification import classify_image, classify_images, model_status, model_state, start_model_preload
 
-print("\n" + "="*60)
-print("[Flask] Starting Fish Classification Website")
-print("="*60)
-api_key = os.getenv("GROQ_API_KEY")
-print(f"[Flask] GROQ_API_KEY loaded: {bool(api_key)}")
-if api_key:
-    print(f"[Flask] API Key length: {len(api_key)} characters")
-    print(f"[Flask] API Key starts with: {api_key[:10]}...")
+configure_logging()
+logger = logging.getLogger('flask_app')
+
+logger.info("Starting Fish Classification Website")
+if os.getenv("GROQ_API_KEY"):
+    logger.info("GROQ_API_KEY loaded")
 else:
-    print("[Flask] WARNING: GROQ_API_KEY not found!")
-print("="*60 + "\n")
+    logger.warning("GROQ_API_KEY not found; the chatbot will not work")
+
+# Uploads are classified from memory; persisting them is an optional background task
+SAVE_UPLOADS = os.getenv("SAVE_UPLOADS", "1") != "0"
+
+# Frontend/ is served from an in-memory manifest with precompressed variants and content-hashed URLs;
+# STATIC_MANIFEST=0 serves files straight from disk as before
+BLOCKED_PAGES = ('fish-classification-website.html',)
+static_assets = StaticAssets('Frontend', blocked=BLOCKED_PAGES) if os.getenv("STATIC_MANIFEST", "1") != "0" else None
+# Images under Frontend/ are served as resized AVIF/WebP variants (?w=<width>, negotiated by Accept)
+image_variants = ImageVariants('Frontend') if os.getenv("IMAGE_VARIANTS", "1") != "0" else None
+
+# Request bodies are capped before Werkzeug parses and spools them: one image plus room for the multipart
+# boundaries and form fields, except for /api/classify/batch, which takes many images or a zip archive
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+BULK_MAX_CONTENT_LENGTH = int(os.getenv("BULK_MAX_CONTENT_LENGTH", str(512 * 1024 * 1024)))
+
+
+class UploadLimitRequest(Request):
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'classify_batch':
+            return BULK_MAX_CONTENT_LENGTH
+        return super().max_content_length
+
 
 app = Flask(__name__, 
             template_folder='Frontend',
             static_folder='Frontend')
+app.request_class = UploadLimitRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
 CORS(app)  # Enable CORS for all routes
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Tag every log line of this request; callers may pass their own id through
+    g.request_id = start_request(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched', method=request.method, status=response.status_code,
+        )
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
 # Initialize chat session manager
-print("[Flask] Initializing ChatSessionManager...")
 try:
     chat_manager = ChatSessionManager()
-    print("[Flask] ChatSessionManager initialized successfully\n")
-except Exception as e:
-    print(f"[Flask] ERROR initializing ChatSessionManager: {e}\n")
+    logger.debug("ChatSessionManager initialized")
+    metrics.gauge('fishai_chat_sessions', 'Chat sessions held in memory', lambda: chat_manager.stats()['sessions'])
+except Exception:
+    logger.exception("Initializing ChatSessionManager failed")
     raise
 
+_started = False
+
+def create_app():
+    """Return the Flask app, starting this process's background work on the first call.
+
+    Pre-fork servers call this in every worker after forking
+    (gunicorn 'main:create_app()', see gunicorn.conf.py), so each worker
+    starts its own threads and nothing is loaded in the master process.
+    """
+    global _started
+    if not _started:
+        _started = True
+        # Under the debug reloader only the serving child process starts background work
+        serving = __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+        # Load and warm up the model in the background so the first request doesn't pay for it.
+        if os.getenv("MODEL_PRELOAD", "1") != "0" and serving:
+            logger.info("Starting background model preload (inference mode: %s)", INFERENCE_MODE)
+            start_model_preload()
+        # Convert new or changed images ahead of the first page load that needs them
+        if image_variants is not None and serving:
+            image_variants.start_build()
+        # Start the upload writer and its retention sweeper
+        if SAVE_UPLOADS and serving:
+            get_upload_store()
+    return app
+
 @app.route('/')
 def index():
     """Serve the main index.html page"""
+    if static_assets is not None:
+        return static_assets.response('index.html', request)
     return send_from_directory('Frontend', 'index.html')
 
 @app.route('/<path:filename>')
 def serve_html(filename):
     """Serve HTML files from Frontend folder (except fish-classification-website.html)"""
     # Block access to fish-classification-website.html
-    if filename == 'fish-classification-website.html':
+    if filename in BLOCKED_PAGES:
         return "File not found", 404
     
+    if image_variants is not None:
+        response = image_variants.response(filename, request)
+        if response is not None:
+            return response
+
+    if static_assets is not None:
+        response = static_assets.response(filename, request)
+        return response if response is not None else ("File not found", 404)
+
     # Serve other HTML and static files
     if os.path.exists(os.path.join('Frontend', filename)):
         return send_from_directory('Frontend', filename)
     return "File not found", 404
 
+def parse_chat_request(data):
+    """Return (message, session_id, error) for a chat request's JSON body; error is None if it is valid"""
+    if not isinstance(data, dict) or 'message' not in data:
+        return None, None, 'No message provided'
+    message, session_id = data['message'], data.get('session_id', 'default')
+    if not isinstance(message, str) or not message.strip():
+        return None, None, 'Message must be a non-empty string'
+    if not isinstance(session_id, str) or not session_id:
+        return None, None, 'session_id must be a non-empty string'
+    return message, session_id, None
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """
     Handle chat requests from the frontend chatbot
     Expected JSON format: {"message": "user message", "session_id": "optional_session_id"}
     """
-    print("\n" + "="*60)
-    print("[Flask] /api/chat endpoint called")
-    print("="*60)
-    
     try:
         data = request.get_json()
-        print(f"[Flask] Request data received: {data}")
-        
-        if not data or 'message' not in data:
-            print("[Flask] ERROR: No message in request data")
+        user_message, session_id, error = parse_chat_request(data)
+        if error is not None:
+            logger.warning("/api/chat rejected: %s", error)
             return jsonify({
                 'success': False,
-                'error': 'No message provided'
+                'error': error
             }), 400
         
-        user_message = data['message']
-        session_id = data.get('session_id', 'default')
-        
-        print(f"[Flask] User message: {user_message}")
-        print(f"[Flask] Session ID: {session_id}")
+        logger.debug("/api/chat session=%s message_chars=%d", session_id, len(user_message))
         
-        # Get or create chat session
-        print(f"[Flask] Getting chat session...")
-        session = chat_manager.get_session(session_id)
-        print(f"[Flask] Chat session obtained: {session}")
-        
-        # Get response from the chatbot
-        print(f"[Flask] Calling get_response...")
-        bot_response = session.get_response(user_message)
-        print(f"[Flask] Bot response received: {bot_response[:100]}...")
+        # Get or create chat session, held until the reply is saved
+        with chat_manager.use_session(session_id) as session:
+            # Get response from the chatbot
+            bot_response = session.get_response(user_message)
+        logger.debug("/api/chat session=%s response_chars=%d", session_id, len(bot_response))
         
         response_data = {
             'success': True,
             'response': bot_response,
             'session_id': session_id
         }
-        print(f"[Flask] Sending successful response")
-        print("="*60 + "\n")
         
         return jsonify(response_data)
     
     except Exception as e:
-        print(f"[Flask] ERROR in /api/chat: {str(e)}")
-        print(f"[Flask] Exception type: {type(e).__name__}")
-        print(f"[Flask] Full error: {repr(e)}")
-        import traceback
-        print(f"[Flask] Traceback:")
-        traceback.print_exc()
-        print("="*60 + "\n")
+        logger.exception("/api/chat failed")
+        metrics.ERRORS.inc(source='chat')
         
         return jsonify({
             'success': False,
@@ -114,61 +206,100 @@ def chat():
         }), 500
 
 
+def sse_event(payload, event=None):
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream the chatbot's reply as server-sent events while it is generated
+    Expected JSON format: {"message": "user message", "session_id": "optional_session_id"}
+    Emits {"delta": "..."} events, then a 'done' event with the full response
+    (or an 'error' event). The reply is saved to history once complete.
+    """
+    user_message, session_id, error = parse_chat_request(request.get_json(silent=True))
+    if error is not None:
+        logger.warning("/api/chat/stream rejected: %s", error)
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    
+    logger.debug("/api/chat/stream session=%s message_chars=%d", session_id, len(user_message))
+    
+    def generate():
+        session = None
+        pieces = None
+        parts = []
+        try:
+            session = chat_manager.acquire(session_id)
+            pieces = session.stream_response(user_message)
+            for piece in pieces:
+                parts.append(piece)
+                yield sse_event({'delta': piece})
+            yield sse_event({'success': True, 'response': ''.join(parts), 'session_id': session_id}, event='done')
+        except Exception as e:
+            logger.exception("/api/chat/stream failed")
+            metrics.ERRORS.inc(source='chat_stream')
+            yield sse_event({'success': False, 'error': str(e)}, event='error')
+        finally:
+            # On client disconnect the server closes this generator; close the upstream stream with it
+            if pieces is not None:
+                pieces.close()
+            # Closing the stream saves the reply, so the session is held until then
+            if session is not None:
+                chat_manager.release(session_id)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/api/classify', methods=['POST'])
 def classify():
     """Handle image classification requests.
     Expects multipart/form-data with field 'image' and optional 'session_id'.
     """
-    print("\n" + "="*60)
-    print("[Flask] /api/classify endpoint called")
-    print("[Flask] Request method:", request.method)
-    print("[Flask] Request content type:", request.content_type)
-    print("[Flask] Request files:", list(request.files.keys()))
-    print("[Flask] Request form:", dict(request.form))
-    print("="*60)
-
     try:
         if 'image' not in request.files:
-            print("[Flask] ERROR: No image file in request")
-            print("[Flask] Available files:", list(request.files.keys()))
+            logger.warning("/api/classify called without an image (files: %s)", tuple(request.files.keys()))
             return jsonify({'success': False, 'error': 'No image file provided'}), 400
 
         img = request.files['image']
-        print(f"[Flask] Image file received: {img.filename}")
-        print(f"[Flask] Image content type: {img.content_type}")
-        print(f"[Flask] Image file object: {img}")
-        
         session_id = request.form.get('session_id', 'default')
-        print(f"[Flask] Session ID: {session_id}")
 
-        uploads_dir = os.path.join(os.getcwd(), 'uploads')
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
-            print(f"[Flask] Created uploads directory: {uploads_dir}")
-        else:
-            print(f"[Flask] Using existing uploads directory: {uploads_dir}")
+        # Read the upload once (never more than the limit) and classify straight from memory
+        image_bytes = img.read(MAX_UPLOAD_BYTES + 1)
+        # Receiving covers the multipart parse plus the read, measured from the start of the request
+        metrics.observe_stage('upload_receive', time.perf_counter() - g.request_started)
+        logger.debug("/api/classify file=%s type=%s bytes=%d session=%s",
+                     img.filename, img.content_type, len(image_bytes), session_id)
 
-        # Save uploaded file
-        filename = f"{session_id}_{int(__import__('time').time())}_{img.filename}"
-        file_path = os.path.join(uploads_dir, filename)
-        print(f"[Flask] Saving file to: {file_path}")
-        img.save(file_path)
-        print(f"[Flask] File saved successfully")
-        print(f"[Flask] File exists: {os.path.exists(file_path)}")
-        print(f"[Flask] File size: {os.path.getsize(file_path)} bytes")
+        # Reject oversized files and decompression bombs from the header alone, before decoding
+        try:
+            open_image(image_bytes)
+        except ImageTooLargeError as e:
+            logger.warning("Rejecting upload %s: %s", img.filename, e)
+            return jsonify({'success': False, 'error': str(e)}), 413
+        except Exception:
+            # Undecodable uploads are reported by classify_image as before
+            pass
+
+        if SAVE_UPLOADS:
+            get_upload_store().put(session_id, secure_filename(img.filename or 'upload'), image_bytes)
 
         # Classify
-        print(f"[Flask] Starting classification...")
-        label, confidence, method = classify_image(file_path)
-        print(f"[Flask] Classification complete!")
-        print(f"[Flask] Result - Label: {label}, Confidence: {confidence}, Method: {method}")
+        label, confidence, method = classify_image(image_bytes, filename=img.filename)
+        metrics.CLASSIFICATIONS.inc(method=method)
 
         # Get static fish data if available
-        print(f"[Flask] Fetching fish data for label: {label}")
-        fish_info = get_fish_data(label)
-        print(f"[Flask] Fish data retrieved: {bool(fish_info)}")
-        if fish_info:
-            print(f"[Flask] Fish name: {fish_info.get('name_en', 'N/A')}")
+        with metrics.stage_timer('fish_data_lookup'):
+            fish_info = get_fish_data(label)
+        logger.info("Classified %s as %s (%.4f, %s)", img.filename, label, confidence, method)
 
         response = {
             'success': True,
@@ -177,26 +308,94 @@ def classify():
             'method': method,
             'fish': fish_info
         }
-        print(f"[Flask] Sending response with success=True")
-        print(f"[Flask] Response keys: {list(response.keys())}")
-        print(f"[Flask] /api/classify completed successfully")
-        print("="*60 + "\n")
-        
-        # Also print model status for debug
-        status = model_status()
-        print(f"[Flask] Model status: {status}")
         return jsonify(response)
 
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
-        print(f"[Flask] ERROR in /api/classify: {e}")
-        print(f"[Flask] Exception type: {type(e).__name__}")
-        import traceback
-        print(f"[Flask] Full traceback:")
-        traceback.print_exc()
-        print("="*60 + "\n")
+        logger.exception("/api/classify failed")
+        metrics.ERRORS.inc(source='classify')
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff')
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "5000"))
+
+def iter_bulk_images(files):
+    """Yield (filename, bytes) for each uploaded image, expanding zip archives.
+
+    Files and archive entries over MAX_UPLOAD_BYTES are yielded with an
+    ImageTooLargeError instead, without being read into memory, and are
+    reported as errors.
+    """
+    count = 0
+    for upload in files:
+        name = upload.filename or 'upload'
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    count += 1
+                    if count > BULK_MAX_FILES:
+                        return
+                    # The declared size can be forged, so the read is capped as well
+                    if info.file_size > MAX_UPLOAD_BYTES:
+                        yield info.filename, ImageTooLargeError(
+                            f"Image is {info.file_size} bytes; the limit is {MAX_UPLOAD_BYTES} bytes")
+                        continue
+                    with archive.open(info) as entry:
+                        yield info.filename, _within_limit(entry.read(MAX_UPLOAD_BYTES + 1))
+        else:
+            count += 1
+            if count > BULK_MAX_FILES:
+                return
+            yield name, _within_limit(upload.read(MAX_UPLOAD_BYTES + 1))
+
+
+def _within_limit(data):
+    """data read with a cap of MAX_UPLOAD_BYTES + 1, or the error to report if it hit the cap"""
+    if len(data) > MAX_UPLOAD_BYTES:
+        return ImageTooLargeError(f"Image is larger than the limit of {MAX_UPLOAD_BYTES} bytes")
+    return data
+
+
+@app.route('/api/classify/batch', methods=['POST'])
+def classify_batch():
+    """Classify many images in batched forward passes.
+    Expects multipart/form-data with one or more 'images' files and/or an
+    'archive' zip file. Streams one NDJSON line per image as each batch
+    completes, followed by a summary line.
+    """
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({'success': False, 'error': 'No image files provided'}), 400
+    logger.info("/api/classify/batch called with %d upload(s)", len(files))
+
+    def generate():
+        index = 0
+        try:
+            for results in classify_images(iter_bulk_images(files)):
+                for result in results:
+                    metrics.CLASSIFICATIONS.inc(method=result['method'])
+                    result['index'] = index
+                    result['success'] = result['method'] != 'error'
+                    if result['success']:
+                        with metrics.stage_timer('fish_data_lookup'):
+                            result['fish'] = get_fish_data(result['label'])
+                    else:
+                        result['fish'] = None
+                    index += 1
+                    yield json.dumps(result) + '\n'
+            yield json.dumps({'done': True, 'success': True, 'count': index}) + '\n'
+        except Exception as e:
+            logger.exception("/api/classify/batch failed after %d image(s)", index)
+            metrics.ERRORS.inc(source='classify_batch')
+            yield json.dumps({'done': True, 'success': False, 'count': index, 'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @app.route('/api/model-status', methods=['GET'])
 def model_status_endpoint():
     """Return model loading diagnostics"""
@@ -204,9 +403,7 @@ def model_status_endpoint():
         status = model_status()
         return jsonify({'success': True, 'status': status})
     except Exception as e:
-        print(f"[Flask] ERROR in /api/model-status: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("/api/model-status failed")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/chat/clear', methods=['POST'])
@@ -219,8 +416,8 @@ def clear_chat():
         data = request.get_json()
         session_id = data.get('session_id', 'default')
         
-        session = chat_manager.get_session(session_id)
-        session.clear_history()
+        with chat_manager.use_session(session_id) as session:
+            session.clear_history()
         
         return jsonify({
             'success': True,
@@ -258,19 +455,75 @@ def get_history():
             'error': str(e)
         }), 500
 
+# Seconds clients may reuse /api/fish responses before revalidating them with their ETag
+FISH_API_MAX_AGE = int(os.getenv("FISH_API_MAX_AGE", "300"))
+
+def cached_json(body, etag):
+    """Serve a pre-serialized JSON body with its ETag, or a 304 if the client already has it"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={FISH_API_MAX_AGE}'
+    return response.make_conditional(request)
+
+@app.route('/api/fish', methods=['GET'])
+def fish_list():
+    """List every fish in the dataset with river, habitat and diet facet counts"""
+    return cached_json(*fish_search.listing())
+
+@app.route('/api/fish/search', methods=['GET'])
+def search_fish():
+    """Search fish by any name, misspelled name or prefix, or by river, habitat or diet.
+    Query parameters: q, and optional river, habitat, diet and limit.
+    """
+    q = request.args.get('q', '')
+    filters = {facet: request.args.get(facet, '') for facet in fish_search.FACETS}
+    if not q.strip() and not any(value.strip() for value in filters.values()):
+        return jsonify({'success': False, 'error': 'Provide q or a river, habitat or diet filter'}), 400
+    limit = request.args.get('limit', fish_search.DEFAULT_LIMIT, type=int)
+    with metrics.stage_timer('fish_search'):
+        body, etag = fish_search.search_response(q, limit=limit, **filters)
+    return cached_json(body, etag)
+
 @app.route('/health')
 def health():
-    """Health check endpoint"""
+    """Health check endpoint.
+    Returns 503 while the model is loading or warming up so load balancers
+    only route traffic to warm workers. If the model failed to load the
+    worker still serves (using the fallback classifier) and reports 'degraded'.
+    Under INFERENCE_MODE=server the state is the model server's, and
+    'unavailable' while the model server cannot be reached.
+    """
+    state = model_state()
+    if state in ('loading', 'warming'):
+        status, code = 'starting', 503
+    elif state == 'unavailable':
+        status, code = 'unavailable', 503
+    elif state == 'failed':
+        status, code = 'degraded', 200
+    else:
+        status, code = 'healthy', 200
     return jsonify({
-        'status': 'healthy',
+        'status': status,
+        'model_state': state,
         'service': 'Fish Classification Website'
-    })
+    }), code
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of the in-process request metrics"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.errorhandler(404)
 def not_found(e):
     """Handle 404 errors"""
     return jsonify({'error': 'Resource not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(e):
+    """Handle request bodies over MAX_CONTENT_LENGTH (or BULK_MAX_CONTENT_LENGTH for bulk classification)"""
+    limit = request.max_content_length
+    return jsonify({'success': False, 'error': f"Request body is larger than the limit of {limit} bytes"}), 413
+
 @app.errorhandler(500)
 def server_error(e):
     """Handle 500 errors"""
@@ -294,8 +547,21 @@ if __name__ == '__main__':
     print("  - http://localhost:5000/fish-database.html")
     print("API endpoints:")
     print("  - POST /api/chat (send chatbot messages)")
+    print("  - POST /api/chat/stream (stream chatbot replies as server-sent events)")
     print("  - POST /api/chat/clear (clear chat history)")
     print("  - GET /api/chat/history (get chat history)")
+    print("  - POST /api/classify (classify one fish image)")
+    print("  - POST /api/classify/batch (classify many images or a zip, streamed as JSON lines)")
+    print("  - GET /api/model-status (model loading status)")
+    print("  - GET /api/fish (fish database)")
+    print("  - GET /api/fish/search (search the fish database)")
+    print("  - GET /health (readiness check)")
+    print("  - GET /metrics (Prometheus metrics)")
     print("=" * 60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if static_assets is not None:
+        # Pick up edits to Frontend/ without restarting the debug server
+        static_assets.watch = True
+    if image_variants is not None:
+        image_variants.watch = True
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
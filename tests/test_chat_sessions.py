@@ -0,0 +1,35 @@
+"""Sessions held by an in-flight request stay cached, so nobody reloads a second copy.
+
+Uses a one-session cache, so every new session evicts the least recently
+used one unless a request is holding it.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_held_session_is_not_evicted(tmp_path):
+    from Backend.backend import ChatSessionManager
+    from Backend.groq_client import create_groq_client
+    from Backend.history_store import create_history_store
+
+    # Never called: the test sends no messages
+    client = create_groq_client(api_key='unused-key')
+    store = create_history_store('jsonl', directory=str(tmp_path))
+    manager = ChatSessionManager(store=store, client=client, max_sessions=1, idle_ttl=0.001)
+    try:
+        with manager.use_session('a') as held:
+            manager.get_session('b')
+            manager.get_session('c')
+            # Over the limit and past the idle time, but still in use
+            assert manager.get_session('a') is held
+            assert manager.stats()['in_use'] == 1
+        stats = manager.stats()
+        assert stats['sessions'] == 1
+        assert stats['in_use'] == 0
+        assert manager.get_session('b') is not held
+        assert manager.get_session('a') is not held
+    finally:
+        client.close()
+        store.close()
@@ -0,0 +1,51 @@
+"""Chat sessions share one pooled Groq connection instead of opening their own.
+
+Runs several sessions through ChatSessionManager against the local Groq
+stub (``benchmarks/stub_groq.py``), which counts the TCP connections it
+accepts.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_groq import start_stub_server
+
+SESSIONS = 4
+TURNS = 3
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = start_stub_server()
+    # Read by the Groq SDK when a client is constructed
+    monkeypatch.setenv('GROQ_BASE_URL', server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_sessions_reuse_pooled_connections(stub, tmp_path):
+    from Backend.backend import ChatSessionManager
+    from Backend.groq_client import create_groq_client
+    from Backend.history_store import create_history_store
+
+    client = create_groq_client(api_key='stub-key')
+    store = create_history_store('jsonl', directory=str(tmp_path))
+    manager = ChatSessionManager(store=store, client=client)
+    try:
+        for turn in range(TURNS):
+            for session in range(SESSIONS):
+                # Distinct questions, so neither the local answers nor the response cache can skip the API
+                reply = manager.get_session(f"session-{session}").get_response(
+                    f"How are small fishes farmed in district {session} in season {turn}?")
+                assert reply == stub.reply
+    finally:
+        client.close()
+        store.close()
+
+    stats = stub.stats()
+    assert stats['requests'] >= SESSIONS * TURNS
+    assert stats['connections'] < SESSIONS * TURNS
@@ -0,0 +1,61 @@
+"""Several worker processes writing the same session through the jsonl store lose nothing.
+
+Two writer processes append to one session, flushing after every message
+so their appends and compactions interleave. In the writers, compaction
+keeps every message instead of the retention window, so any message lost
+by a compaction shows up as a gap, and it pauses between reading the file
+and replacing it, which is where an append from the other process would
+be lost without the directory lock.
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('fcntl')
+
+SESSION = 'shared-session'
+MESSAGES = 100
+MAX_MESSAGES = 10
+
+
+def write_messages(directory, writer, start):
+    from Backend import history_store
+
+    rewrite = history_store.JsonlHistoryStore._rewrite
+
+    def slow_rewrite(self, path, messages):
+        time.sleep(0.005)
+        return rewrite(self, path, messages)
+
+    history_store.JsonlHistoryStore._rewrite = slow_rewrite
+    history_store.trim_messages = lambda messages, max_messages: messages
+    store = history_store.create_history_store('jsonl', directory=directory, max_messages=MAX_MESSAGES,
+                                               compact_factor=2, flush_interval_ms=0)
+    start.wait()
+    for i in range(MESSAGES):
+        store.append(SESSION, {'role': 'user', 'content': f"{writer}:{i}"})
+        store.flush()
+    store.close()
+
+
+def test_two_writers_share_a_session(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    start = context.Barrier(2)
+    writers = [context.Process(target=write_messages, args=(str(tmp_path), writer, start)) for writer in ('a', 'b')]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(60)
+    assert [process.exitcode for process in writers] == [0, 0]
+
+    with open(tmp_path / f"chat_history_{SESSION}.jsonl") as f:
+        messages = [json.loads(line) for line in f]
+    for writer in ('a', 'b'):
+        assert [m['content'] for m in messages if m['content'].startswith(f"{writer}:")] == \
+            [f"{writer}:{i}" for i in range(MESSAGES)]